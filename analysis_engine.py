@@ -1,7 +1,23 @@
 import os
+import csv
+import json
+import math
 import random
 import re
+import hashlib
+import itertools
+import secrets
+import threading
+import time
+import multiprocessing
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Optional: NumPy powers the vectorized simulation engine
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # ReportLab Imports
 from reportlab.lib.pagesizes import letter
@@ -10,6 +26,8 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 
+from card_registry import CardRegistry, TYPE_CODES
+
 # Local Import (Requires card_database.py)
 try:
     from card_database import CARD_POOL, CARD_TYPES
@@ -23,11 +41,44 @@ except ImportError:
 MIN_DECK_SIZE = 40
 MAX_DECK_SIZE = 60
 MAX_CARD_COPIES = 3
+REPORT_DIR = "analysis_reports"
+REPORT_MAX_TABLE_ROWS = 40 # Rows kept in folded report tables; the rest fold into an "Other" row and a CSV side file
+REPORT_SECTIONS = ( # (result key, title, row label, row order, fold the long tail) of the report's frequency tables
+    ("card_counts", "Individual Card Frequency", "Card", "share", False),
+    ("combo_counts", "Combo Frequency", "Combo", "share", False),
+    ("duplicate_counts", "Duplicate Card Frequency (Opening Hand)", "Card", "share", False),
+    ("hand_composition_counts", "Opening Hand Composition (M/S/T)", "Composition", "share", False),
+    ("category_counts", "Individual Category Frequency (Avg per Hand)", "Category", "name", False),
+    ("hand_category_composition_counts", "Hand Category Composition", "Category Composition", "share", True),
+)
+
+# --- Simulation Engine Settings ---
+SIMULATION_ENGINES = ("python", "numpy", "exact")
+DEFAULT_ENGINE = "python"
+NUMPY_BATCH_SIZE = 50000 # Hands drawn per vectorized batch
+SEED_SHARD_SIZE = 50000 # Hands per RNG stream; fixed so a seed deals the same hands on any number of workers
+ADAPTIVE_MIN_BATCH = 10000 # Smallest batch in precision-targeted runs
+WILSON_Z = 1.96 # 95% confidence
+PRECISION_METRIC_KEYS = ("combo_counts", "duplicate_counts", "hand_composition_counts") # Per-hand proportions tracked for early stopping
+INCREMENTAL_MAX_CHANGED = 0.4 # Past this share of re-evaluated hands a fresh run is about as fast
+DEFAULT_DRAW_SCHEDULE = {"opening_hand": 5, "draws_per_turn": 1, "turns": 1}
+DEFAULT_CARD_EFFECTS = { # Card -> declarative effect resolved before combo checks (see compile_card_effects)
+    "Pot of Extravagance": {"draw": 2}, # The Extra Deck banish cost is not modelled
+    "Big Welcome Labrynth": {"search": ["Lady Labrynth of the Silver Castle", "Lovely Labrynth of the Silver Castle", "Arianna the Labrynth Servant", "Arias the Labrynth Butler"]},
+}
+PROGRESS_UPDATES_PER_SECOND = 4 # Cap on progress messages per run (and per worker shard)
+PROGRESS_CHECK_HANDS = 5000 # The python engine offers progress (and checks pause/cancel) this often
+CHECKPOINT_INTERVAL = 60 # Seconds between checkpoint writes of long runs
+RESULT_COUNTER_KEYS = ("card_counts", "combo_counts", "duplicate_counts", "hand_composition_counts", "category_counts", "hand_category_composition_counts")
 
 # --- Helper Functions ---
 
 def get_unique_filename(base_filename):
-    """Generates a unique filename by appending _N if the file exists."""
+    """
+    Generates a unique filename by appending _N if the file exists. The name
+    is reserved by creating it empty (exclusively), so concurrent report
+    workers never pick the same one; the caller then overwrites it.
+    """
     directory = os.path.dirname(base_filename)
     name_part, ext = os.path.splitext(os.path.basename(base_filename))
 
@@ -41,40 +92,20 @@ def get_unique_filename(base_filename):
 
     counter = 0
     new_filename = base_filename
-    while os.path.exists(new_filename):
-        counter += 1
-        new_filename = os.path.join(directory, f"{name_part}_{counter}{ext}")
-    return new_filename
+    while True:
+        try:
+            os.close(os.open(new_filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+            return new_filename
+        except FileExistsError:
+            counter += 1
+            new_filename = os.path.join(directory, f"{name_part}_{counter}{ext}")
+        except OSError:
+            return new_filename # Can't reserve it here; the caller's write reports the problem
 
 def _define_combos():
-    """Defines the hardcoded combo checking logic (lambdas)."""
+    """Returns the hardcoded default combos in their structured (compilable) form."""
     # These serve as defaults if no custom combos are loaded or defined
-    furniture_cards = {"Labrynth Stovie Torbie", "Labrynth Chandraglier"}
-    welcome_cards = {"Welcome Labrynth", "Big Welcome Labrynth"}
-    disruption_traps = {"Trap Trick", "Destructive Daruma Karma Cannon", "Dimensional Barrier"}
-
-    return {
-        "Furniture + Back Jack": lambda hand_set: ( # Lambdas now accept hand_set
-            any(card in furniture_cards for card in hand_set) and "Absolute King Back Jack" in hand_set
-        ),
-        "Arias + Disruption Trap": lambda hand_set: (
-            "Arias the Labrynth Butler" in hand_set and any(card in disruption_traps for card in hand_set)
-        ),
-        "Rollback Combo": lambda hand_set: (
-            "Dominus Impulse" in hand_set and "Transaction Rollback" in hand_set and any(card in furniture_cards for card in hand_set)
-        ),
-        "Access to Furniture + Back Jack": lambda hand_set: (
-            "Arias the Labrynth Butler" in hand_set and
-            ("Arianna the Labrynth Servant" in hand_set or any(card in welcome_cards for card in hand_set)) and
-            "Absolute King Back Jack" in hand_set
-        ),
-        "Furniture Combo": lambda hand_set: (
-            any(card in furniture_cards for card in hand_set) and "Labrynth Cooclock" in hand_set
-        ),
-        "Lady Combo": lambda hand_set: (
-            "Lady Labrynth of the Silver Castle" in hand_set and "Arias the Labrynth Butler" in hand_set and any(card in welcome_cards for card in hand_set)
-        ),
-    }
+    return _get_hardcoded_combo_definitions()
 
 def _define_combo_card_map():
     """Maps HARDCODED combo names to the set of cards involved for recommendations."""
@@ -90,7 +121,6 @@ def _define_combo_card_map():
 
 def _get_hardcoded_combo_definitions():
     """Returns the hardcoded combo logic in the structured dictionary format."""
-    # Manual translation of the lambda logic from _define_combos()
     return {
         "Furniture + Back Jack": {
             "must_have": ["Absolute King Back Jack"],
@@ -164,92 +194,516 @@ def evaluate_custom_combo(hand_set, combo_definition):
     return True
 # <<< END NEW FUNCTION >>>
 
+def compile_combos(card_combos, card_bits):
+    """
+    Compiles combo definitions into bitmask predicates.
+
+    Args:
+        card_combos (dict): Combo name -> structured definition (or legacy callable).
+        card_bits (dict): Card name -> single-bit int for every card in the deck.
+
+    Returns:
+        list: (combo_name, must_mask, group_masks) tuples. A hand given as the OR
+              of its card bits meets the combo when (hand & must_mask) == must_mask
+              and hand & mask is non-zero for every group mask. Combos the deck
+              can never meet are left out; callables come back as
+              (combo_name, callable, None) and need the hand's card set.
+    """
+    compiled = []
+    for combo_name, definition in card_combos.items():
+        if callable(definition):
+            compiled.append((combo_name, definition, None)); continue
+        if not isinstance(definition, dict):
+            print(f"Warning: Unknown combo definition type for '{combo_name}'"); continue
+        must_have = definition.get("must_have", [])
+        if any(card not in card_bits for card in must_have): continue
+        must_mask = 0
+        for card in must_have: must_mask |= card_bits[card]
+        group_masks = []
+        for group in definition.get("need_one_groups", []):
+            group_mask = 0
+            for card in group: group_mask |= card_bits.get(card, 0)
+            group_masks.append(group_mask)
+        if 0 in group_masks: continue
+        compiled.append((combo_name, must_mask, tuple(group_masks)))
+    return compiled
+
+def _hand_meets_combo(hand_mask, hand_set, must_mask, group_masks):
+    """Evaluates one compiled combo for one hand."""
+    if group_masks is None: return must_mask(hand_set) # Legacy callable
+    if hand_mask & must_mask != must_mask: return False
+    for group_mask in group_masks:
+        if not hand_mask & group_mask: return False
+    return True
+
+def combo_requirement_terms(combo_definition):
+    """
+    Inclusion-exclusion terms of a structured combo. The combo needs each
+    must_have card and one card of each need_one group, i.e. it must hit every
+    requirement set, so the number of k-card hands meeting it is
+    sum(sign * C(N - copies of the cards in union, k)) over the returned
+    (sign, union) pairs.
+    """
+    requirements = {frozenset([card]) for card in combo_definition.get("must_have", [])} | {frozenset(group) for group in combo_definition.get("need_one_groups", [])}
+    terms = []
+    for size in range(len(requirements) + 1):
+        for subset in itertools.combinations(requirements, size):
+            terms.append((-1 if size % 2 else 1, frozenset().union(*subset)))
+    return terms
+
+def combo_hit_terms(combo_definition):
+    """
+    combo_requirement_terms with equal unions merged: {union: coefficient},
+    zero coefficients dropped. Overlapping requirements give many subsets the
+    same union, so a hand count needs fewer C(N - copies, k) terms.
+    """
+    terms = Counter()
+    for sign, union in combo_requirement_terms(combo_definition): terms[union] += sign
+    return {union: coefficient for union, coefficient in terms.items() if coefficient}
+
+def normalize_draw_schedule(draw_schedule):
+    """Fills in DEFAULT_DRAW_SCHEDULE; returns None for the plain 5-card opening hand."""
+    if not draw_schedule: return None
+    schedule = dict(DEFAULT_DRAW_SCHEDULE); schedule.update(draw_schedule)
+    return None if schedule == DEFAULT_DRAW_SCHEDULE else schedule
+
+def turn_hand_sizes(draw_schedule):
+    """Cards seen by each turn of a schedule: the opening hand, then draws_per_turn more per turn."""
+    schedule = draw_schedule or DEFAULT_DRAW_SCHEDULE
+    return [schedule["opening_hand"] + schedule["draws_per_turn"] * turn for turn in range(schedule["turns"])]
+
+def _new_turn_totals(cards_seen):
+    """Empty per-turn accumulators: hands, combo hits and card sightings (hands with at least one copy seen) per turn."""
+    return {"cards_seen": list(cards_seen), "totals": [0] * len(cards_seen), "combo_counts": [Counter() for _ in cards_seen], "card_counts": [Counter() for _ in cards_seen]}
+
+def _add_turn_totals(turns, other):
+    """Adds other's per-turn counts into turns."""
+    for turn in range(len(turns["cards_seen"])):
+        turns["totals"][turn] += other["totals"][turn]
+        turns["combo_counts"][turn].update(other["combo_counts"][turn]); turns["card_counts"][turn].update(other["card_counts"][turn])
+
+# --- Card Effects ---
+
+def compile_card_effects(card_effects, card_index):
+    """
+    Precompiles declarative card effects into a per-card table for one deck.
+
+    card_effects maps a card to {"search": [cards], "draw": n}: search adds
+    the first listed card with a copy left in the deck to the hand, then draw
+    adds the top n cards. card_index maps the deck's cards to their indices
+    (the card's bit is 1 << index); effects of cards not in the deck, and
+    search targets not in it, are left out.
+    Returns (card index, draw count, search target indices) tuples in
+    card_effects order, which is the order effects resolve in.
+    """
+    table = []
+    for card, effect in (card_effects or {}).items():
+        if card not in card_index: continue
+        if not isinstance(effect, dict) or set(effect) - {"search", "draw"} or not isinstance(effect.get("draw", 0), int) or effect.get("draw", 0) < 0:
+            print(f"Warning: Invalid effect definition for '{card}', skipping."); continue
+        targets = tuple(card_index[target] for target in effect.get("search", []) if target in card_index)
+        if effect.get("draw", 0) or targets: table.append((card_index[card], effect.get("draw", 0), targets))
+    return table
+
+def describe_card_effect(effect):
+    """Short text for an effect definition, e.g. "Search: A / B; Draw 2"."""
+    parts = []
+    if effect.get("search"): parts.append("Search: " + " / ".join(effect["search"]))
+    if effect.get("draw"): parts.append(f"Draw {effect['draw']}")
+    return "; ".join(parts) or "No effect"
+
+def _resolve_effects_python(hand_mask, deck_rest, effect_table, rng):
+    """
+    Resolves a compiled effect table over one hand. deck_rest holds the rest
+    of the deck in draw order, as card indices, and is consumed. Every effect card in the hand,
+    including cards added by effects, resolves once: passes over the table
+    repeat until nothing new resolves. A search takes a random remaining copy
+    of its target, so the draws after it stay uniform.
+    Returns (resolved hand mask, added cards, indices of the effect cards resolved).
+    """
+    added, resolved = [], []
+    pending = True
+    while pending:
+        pending = False
+        for card, draws, targets in effect_table:
+            if card in resolved or not hand_mask >> card & 1: continue
+            resolved.append(card); pending = True
+            for target in targets:
+                positions = [k for k, deck_card in enumerate(deck_rest) if deck_card == target]
+                if positions: added.append(deck_rest.pop(rng.choice(positions))); hand_mask |= 1 << target; break
+            for deck_card in deck_rest[:draws]: added.append(deck_card); hand_mask |= 1 << deck_card
+            del deck_rest[:draws]
+    return hand_mask, added, resolved
+
+def _resolve_effects_numpy(tables, keys, deck_ids, hands, effect_table, effect_counts):
+    """
+    Vectorized _resolve_effects_python for one batch; returns every hand's
+    resolved card bitmask. Only hands holding an effect card are resolved.
+    Their draws continue in key order past the hand, and a search takes the
+    target's lowest-numbered copy not yet taken (copies are interchangeable,
+    so later draws stay uniform), which the draws then skip.
+    """
+    names = tables["names"]
+    present = np.zeros((hands.shape[0], len(names)), dtype=bool)
+    for slot in range(hands.shape[1]): present[np.arange(hands.shape[0]), hands[:, slot]] = True
+    affected = np.flatnonzero(present[:, [card for card, _, _ in effect_table]].any(axis=1))
+    if affected.size:
+        hand_size = hands.shape[1]; rows = np.arange(affected.size)
+        depth = min(keys.shape[1], hand_size + sum(draws + bool(targets) for _, draws, targets in effect_table)) # Searches can skip at most one drawn slot each
+        sub_keys = keys[affected]
+        lowest = np.argpartition(sub_keys, depth - 1, axis=1)[:, :depth]
+        order = np.take_along_axis(lowest, np.take_along_axis(sub_keys, lowest, axis=1).argsort(axis=1), axis=1)
+        taken = np.zeros(sub_keys.shape, dtype=bool); taken[rows[:, None], order[:, :hand_size]] = True
+        seen = present[affected]; done = np.zeros((affected.size, len(effect_table)), dtype=bool)
+        pointer = np.full(affected.size, hand_size)
+        first_slot = np.searchsorted(deck_ids, np.arange(len(names))); copies = np.bincount(deck_ids, minlength=len(names))
+        for _ in range(len(effect_table)): # One pass per effect card reaches every chain
+            for e, (card, draws, targets) in enumerate(effect_table):
+                active = seen[:, card] & ~done[:, e]
+                if not active.any(): continue
+                done[active, e] = True; effect_counts[names[card]] += int(active.sum())
+                searching = active.copy()
+                for target in targets:
+                    free = ~taken[:, first_slot[target]:first_slot[target] + copies[target]]
+                    hit = searching & free.any(axis=1)
+                    taken[rows[hit], first_slot[target] + free[hit].argmax(axis=1)] = True; seen[hit, target] = True; searching &= ~hit
+                for _ in range(draws):
+                    while True: # Skip slots already taken by a search
+                        blocked = active & (pointer < depth)
+                        blocked[blocked] = taken[rows[blocked], order[blocked, pointer[blocked]]]
+                        if not blocked.any(): break
+                        pointer[blocked] += 1
+                    drawing = active & (pointer < depth)
+                    slots = order[drawing, pointer[drawing]]
+                    taken[rows[drawing], slots] = True; seen[rows[drawing], deck_ids[slots]] = True; pointer[drawing] += 1
+        present[affected] = seen
+    return present.astype(np.int64) @ tables["card_weights"]
+
+def preview_card_effect(card, card_effects, deck_rest, rng=None):
+    """Cards that card's effect would add when resolved over deck_rest (the rest of the deck in draw order); [] if it has none."""
+    if card not in card_effects: return []
+    registry = CardRegistry([card] + list(deck_rest))
+    effect_table = compile_card_effects({card: card_effects[card]}, registry.ids)
+    added = _resolve_effects_python(registry.bits[registry.ids[card]], [registry.ids[name] for name in deck_rest], effect_table, rng or random.Random())[1]
+    return [registry.names[card_id] for card_id in added]
+
 
 # --- Simulation Core ---
 
-def run_simulation(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue):
-    """Performs the Monte Carlo simulation for a given deck list."""
+def run_simulation(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue,
+                   engine=DEFAULT_ENGINE, workers=1, seed=None, progress=None, sample_hands=0, target_precision=None, draw_schedule=None, card_effects=None, card_types=None, control=None,
+                   checkpoint=None, resume=False):
+    """
+    Performs the Monte Carlo simulation for a given deck list.
+
+    engine selects the backend: "python" is the reference per-hand loop,
+    "numpy" draws hands in vectorized batches and "exact" enumerates every
+    hand instead of sampling (num_simulations is then ignored). All three
+    return the same result dict.
+    The run is split into shards of SEED_SHARD_SIZE hands, each dealt from its
+    own stream spawned from seed (see spawn_seed), so a seed gives identical
+    results on any number of workers; workers > 1 simulates the shards in a
+    process pool. Without a seed a fresh one is drawn; either way it is
+    returned under "seed". progress, if given, is called with the number of
+    hands completed instead of posting status messages; by default a
+    ProgressReporter posts at most PROGRESS_UPDATES_PER_SECOND of them, with
+    the hands/sec rate and ETA.
+
+    Only aggregate Counters and total_simulations are kept. "hands" holds an
+    optional uniform reservoir sample of at most sample_hands drawn hands
+    (empty by default), which is meant for debugging.
+
+    target_precision (a proportion, e.g. 0.001 for +/-0.1%) switches to
+    adaptive stopping: hands are simulated in batches until every tracked
+    frequency's Wilson interval half-width is within it, with num_simulations
+    as the cap. The achieved intervals are returned under "precision".
+
+    draw_schedule ({"opening_hand", "draws_per_turn", "turns"}, see
+    DEFAULT_DRAW_SCHEDULE) sets the opening hand size (e.g. 6 going second),
+    which all hand statistics use, and adds "turns": cumulative per-turn combo
+    hits and card sightings over the cards seen by each turn, read from the
+    same shuffle as the opening hand.
+
+    card_effects (card -> effect, see compile_card_effects) are resolved over
+    the shuffled deck before combos are checked, so combo counts describe the
+    resolved hand; every other statistic describes the opening hand as drawn.
+    "effect_counts" then counts the hands each effect card resolved in. The
+    exact engine does not support effects.
+
+    card_types is the effective card database (card -> type, e.g. with the
+    user's overrides); its keys are the card pool. Defaults to CARD_TYPES.
+
+    control (a SimulationControl) lets another thread pause or cancel the run;
+    the sampling engines check it between batches. A cancelled run returns
+    the hands completed so far with "partial" set. The exact engine ignores it.
+
+    checkpoint is a file path: fixed-size sampled runs write the merged
+    results of their completed shards there (atomically, every
+    CHECKPOINT_INTERVAL seconds and when cancelled) and delete it when done.
+    With resume, a checkpoint of the same run (hand count, engine, and seed if
+    given) is picked up: its shards are skipped and its seed reused, so the
+    final Counters equal those of an uninterrupted run. The caller keys the
+    path by deck and combos (see main.py).
+    """
     if not deck_list or sum(deck_list.values()) < MIN_DECK_SIZE:
         simulation_queue.put(("error", f"Deck {deck_label} invalid for simulation."))
         return None
 
+    card_types = CARD_TYPES if card_types is None else card_types
     cards = []
     for card, quantity in deck_list.items():
-        if card not in CARD_POOL:
-            print(f"Warning (Sim {deck_label}): Card '{card}' not in CARD_POOL.")
+        if card not in card_types:
+            print(f"Warning (Sim {deck_label}): Card '{card}' not in the card pool.")
         cards.extend([card] * quantity)
 
-    if len(cards) < 5:
-        simulation_queue.put(("error", f"Deck {deck_label} has only {len(cards)} cards, cannot draw 5."))
+    draw_schedule = normalize_draw_schedule(draw_schedule)
+    if draw_schedule and (draw_schedule["opening_hand"] < 1 or draw_schedule["draws_per_turn"] < 0 or draw_schedule["turns"] < 1):
+        simulation_queue.put(("error", f"Invalid draw schedule {draw_schedule}."))
+        return None
+    cards_needed = turn_hand_sizes(draw_schedule)[-1]
+    if len(cards) < cards_needed:
+        simulation_queue.put(("error", f"Deck {deck_label} has only {len(cards)} cards, cannot draw {cards_needed}."))
         return None
 
-    all_results = {
-        "hands": [], "card_counts": Counter(), "combo_counts": Counter(),
-        "duplicate_counts": Counter(), "hand_composition_counts": Counter(),
-        "category_counts": Counter(),
-        "hand_category_composition_counts": Counter(),
+    if engine == "numpy" and np is None:
+        simulation_queue.put(("error", "NumPy engine selected but numpy is not installed ('pip install numpy')."))
+        return None
+    if engine not in SIMULATION_ENGINES:
+        simulation_queue.put(("error", f"Unknown simulation engine '{engine}'."))
+        return None
+    if engine == "exact" and card_effects:
+        simulation_queue.put(("error", "The exact engine cannot resolve card effects; use the python or numpy engine."))
+        return None
+    if engine == "exact":
+        return _run_exact_analysis(deck_list, deck_label, card_combos, card_categories, simulation_queue, draw_schedule, card_types)
+
+    resume_state = None
+    if checkpoint and resume and not target_precision:
+        resume_state = load_checkpoint(checkpoint)
+        if resume_state and (resume_state["num_simulations"] != num_simulations or resume_state["shard_size"] != SEED_SHARD_SIZE or resume_state["engine"] != engine or seed not in (None, resume_state["seed"])):
+            simulation_queue.put(("status", f"Deck {deck_label}: checkpoint is for different run settings; starting over.")); resume_state = None
+        if resume_state:
+            seed = resume_state["seed"]
+            simulation_queue.put(("status", f"Deck {deck_label}: resuming from checkpoint ({resume_state['results']['total_simulations']:,} hands done)."))
+    seed = new_seed() if seed is None else seed
+    if target_precision:
+        results = _run_simulation_adaptive(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, engine, workers, sample_hands, target_precision, draw_schedule, card_effects, card_types, seed, control)
+    else:
+        if progress is None:
+            progress = ProgressReporter(status_publisher(simulation_queue, f"Simulating Deck {deck_label}" + (f" ({workers} workers)" if workers > 1 else "")), num_simulations, resume_state["results"]["total_simulations"] if resume_state else 0)
+        results = _run_simulation_sharded(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, engine, workers, sample_hands, draw_schedule, card_effects, card_types, seed, progress, control, checkpoint, resume_state)
+    if results is not None and not results["total_simulations"]:
+        simulation_queue.put(("error", f"Simulation of Deck {deck_label} was cancelled before any hands were completed.")); return None
+    if results: results["seed"] = seed
+    return results
+
+class SimulationControl:
+    """
+    Pause/cancel token shared between the GUI and a running simulation. The
+    engines call should_stop() between batches, never per hand. Built from
+    multiprocessing.Manager events it also reaches pool workers.
+    """
+    def __init__(self, cancel_event=None, resume_event=None):
+        self._cancel = cancel_event or threading.Event()
+        self._resume = resume_event or threading.Event() # Set while running, cleared while paused
+        self._resume.set()
+
+    def pause(self): self._resume.clear()
+    def resume(self): self._resume.set()
+    def cancel(self): self._cancel.set(); self._resume.set() # A paused run wakes up to stop
+
+    @property
+    def cancelled(self): return self._cancel.is_set()
+    @property
+    def paused(self): return not self._resume.is_set()
+
+    def should_stop(self):
+        """Blocks while paused, then returns True if the run was cancelled."""
+        self._resume.wait()
+        return self._cancel.is_set()
+
+class ProgressReporter:
+    """
+    Time-based progress channel. Call it with the hands done as often as
+    convenient: at most max_per_second calls (and always the last one, at
+    total) are passed on as publish(done, total, hands per second, ETA in
+    seconds or None); the calls in between are dropped, so a fast engine
+    can't flood the GUI. Rates count only hands done after initial (e.g.
+    hands restored from a checkpoint).
+    """
+    def __init__(self, publish, total, initial=0, max_per_second=PROGRESS_UPDATES_PER_SECOND):
+        self.publish, self.total, self.initial = publish, total, initial
+        self.interval = 1.0 / max_per_second
+        self.start = self.last = time.monotonic()
+
+    def __call__(self, done):
+        now = time.monotonic()
+        if now - self.last < self.interval and done < self.total: return
+        self.last = now
+        rate = (done - self.initial) / (now - self.start) if now > self.start else 0.0
+        self.publish(done, self.total, rate, (self.total - done) / rate if rate > 0 else None)
+
+def format_duration(seconds):
+    """Short text for a duration, e.g. "42s", "3m 05s" or "1h 02m"."""
+    seconds = int(round(seconds))
+    if seconds < 60: return f"{seconds}s"
+    if seconds < 3600: return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds // 60 % 60:02d}m"
+
+def status_publisher(simulation_queue, prefix):
+    """A ProgressReporter publish function posting "<prefix>... 42% (1,234,567 hands/s, ETA 3m 05s)" status messages."""
+    def publish(done, total, rate, eta):
+        text = f"{prefix}... {done / total * 100:.0f}%" if total else f"{prefix}..."
+        if rate > 0: text += f" ({rate:,.0f} hands/s" + (f", ETA {format_duration(eta)})" if eta else ")")
+        simulation_queue.put(("status", text))
+    return publish
+
+def new_seed():
+    """A fresh random seed, short enough to note down and type back in."""
+    return secrets.randbits(32)
+
+def spawn_seed(seed, *spawn_key):
+    """
+    Seed of the independent child stream spawn_key of seed, as
+    numpy.random.SeedSequence(seed).spawn would derive it, returned as a
+    128-bit int that seeds both random.Random and numpy. Without numpy a
+    SHA-256 of the same inputs stands in (deterministic, different hands).
+    """
+    if np is not None:
+        return int.from_bytes(np.random.SeedSequence(seed, spawn_key=spawn_key).generate_state(4).tobytes(), "little")
+    return int.from_bytes(hashlib.sha256(repr((seed,) + spawn_key).encode("utf-8")).digest()[:16], "little")
+
+def _run_engine(engine, num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, seed, progress, sample_hands=0, draw_schedule=None, card_effects=None, card_types=None, control=None):
+    """Simulates one RNG stream on the python or numpy engine (inputs already validated)."""
+    if engine == "numpy":
+        return _run_simulation_numpy(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, seed, progress, sample_hands, draw_schedule, card_effects, card_types, control)
+    cards = [card for card, quantity in deck_list.items() for _ in range(quantity)]
+    return _run_simulation_python(num_simulations, cards, deck_label, card_combos, card_categories, simulation_queue, seed, progress, sample_hands, draw_schedule, card_effects, card_types, control)
+
+def _merge_hand_samples(sample_a, seen_a, sample_b, seen_b, sample_size, rng):
+    """
+    Merges two uniform reservoir samples (of seen_a and seen_b hands) into one
+    uniform sample of at most sample_size hands from the combined population.
+    """
+    remaining_a, remaining_b = seen_a, seen_b
+    take_a = 0
+    for _ in range(min(sample_size, seen_a + seen_b)):
+        if rng.random() * (remaining_a + remaining_b) < remaining_a: take_a += 1; remaining_a -= 1
+        else: remaining_b -= 1
+    take_b = min(sample_size, seen_a + seen_b) - take_a
+    return rng.sample(sample_a, take_a) + rng.sample(sample_b, take_b)
+
+def _python_deck_tables(cards, card_combos, card_categories, card_types, card_effects, hand_size):
+    """
+    Compile step of the reference engine: interns the deck in a registry of
+    the effective pool (card_types' keys) and builds the per-card tables the
+    hand loop reads by ID. bits only sets the cards a combo or effect looks
+    at; type_weights and category_weights build the packed M/S/T code and
+    category key (see _category_weights) of a hand by summation.
+    """
+    registry = CardRegistry(card_types, card_types, card_categories)
+    deck = registry.encode_deck(Counter(cards))
+    card_index = {card: registry.ids[card] for card in set(cards)}
+    compiled_combos = compile_combos(card_combos, registry.card_bits(card_index))
+    effect_table = compile_card_effects(card_effects, card_index)
+    effect_mask = sum(1 << card for card, _, _ in effect_table)
+    relevant_mask = effect_mask
+    for _, must_mask, group_masks in compiled_combos:
+        if group_masks is not None: relevant_mask |= must_mask | sum(group_masks)
+    radix, category_radix = hand_size + 1, hand_size * _category_repeats(registry.category_ids) + 1
+    categories = sorted(registry.categories)
+    return {
+        "registry": registry, "deck": deck, "radix": radix, "category_radix": category_radix, "categories": categories,
+        "compiled_combos": compiled_combos, "needs_hand_set": any(group_masks is None for _, _, group_masks in compiled_combos),
+        "effect_table": effect_table, "effect_mask": effect_mask,
+        "bits": [bit & relevant_mask for bit in registry.bits],
+        "type_weights": [(radix * radix, radix, 1, 0)[type_code] for type_code in registry.type_codes],
+        "category_weights": _category_weights([[registry.categories[category] for category in card_category_ids] for card_category_ids in registry.category_ids], categories, category_radix),
     }
+
+def _run_simulation_python(num_simulations, cards, deck_label, card_combos, card_categories, simulation_queue, seed, progress, sample_hands, draw_schedule=None, card_effects=None, card_types=None, control=None):
+    """
+    Reference engine: shuffles the deck and tallies one hand at a time (plus
+    later turns' draws and card effects from the same shuffle). The deck is
+    shuffled as interned card IDs and the hand loop only indexes the tables
+    of _python_deck_tables; names are decoded once, when the results are built.
+    progress is offered (and control checked) every PROGRESS_CHECK_HANDS
+    hands, or every 1% of a shorter run.
+    """
+    rng = random.Random(seed)
+    hand_size = (draw_schedule or DEFAULT_DRAW_SCHEDULE)["opening_hand"]
+    tables = _python_deck_tables(cards, card_combos, card_categories, CARD_TYPES if card_types is None else card_types, card_effects, hand_size)
+    registry, deck, bits, radix, categories = tables["registry"], tables["deck"], tables["bits"], tables["radix"], tables["categories"]
+    names, type_weights, category_weights = registry.names, tables["type_weights"], tables["category_weights"]
+    compiled_combos, needs_hand_set, effect_table, effect_mask = tables["compiled_combos"], tables["needs_hand_set"], tables["effect_table"], tables["effect_mask"]
     sim_count = 0
-    update_interval = max(1, num_simulations // 100)
+    update_interval = max(1, min(num_simulations // 100, PROGRESS_CHECK_HANDS))
+    turns = _new_turn_totals(turn_hand_sizes(draw_schedule)) if draw_schedule else None
+
+    hands, combo_counts = [], Counter()
+    card_totals, duplicate_totals = [0] * len(names), [0] * len(names)
+    composition_totals, category_composition_totals, effect_totals = [0] * radix ** 3, Counter(), Counter()
+    turn_card_totals = [Counter() for _ in turns["cards_seen"]] if turns else None
 
     for i in range(num_simulations):
         try:
-            random.shuffle(cards)
-            hand = cards[:5]
-            hand_set = set(hand) # Use set for efficient checking
-            all_results["hands"].append(hand)
-            all_results["card_counts"].update(hand)
-
-            # --- Combo Checking (Handles hardcoded lambdas and custom dicts) ---
-            for combo_name, definition in card_combos.items():
-                combo_success = False
+            rng.shuffle(deck)
+            hand = deck[:hand_size]
+            if hand_size == 5: hand_mask = bits[hand[0]] | bits[hand[1]] | bits[hand[2]] | bits[hand[3]] | bits[hand[4]]
+            else:
+                hand_mask = 0
+                for card in hand: hand_mask |= bits[card]
+            hand_set = {names[card] for card in hand} if needs_hand_set else None
+            if sample_hands: # Reservoir sampling keeps memory bounded
+                if len(hands) < sample_hands: hands.append([names[card] for card in hand])
+                else:
+                    slot = rng.randrange(sim_count + 1)
+                    if slot < sample_hands: hands[slot] = [names[card] for card in hand]
+            for card in hand: card_totals[card] += 1
+
+            # --- Card Effects (combos are checked on the resolved hand) ---
+            combo_mask, combo_set = hand_mask, hand_set
+            if hand_mask & effect_mask:
+                combo_mask, added, resolved = _resolve_effects_python(hand_mask, deck[hand_size:], effect_table, rng)
+                if needs_hand_set: combo_set = hand_set | {names[card] for card in added}
+                effect_totals.update(resolved)
+
+            # --- Combo Checking (Compiled bitmask predicates) ---
+            for combo_name, must_mask, group_masks in compiled_combos:
                 try:
-                    if callable(definition): # Hardcoded lambda function
-                        combo_success = definition(hand_set)
-                    elif isinstance(definition, dict): # Custom structured combo
-                        combo_success = evaluate_custom_combo(hand_set, definition)
-                    else:
-                        print(f"Warning: Unknown combo definition type for '{combo_name}'")
-
-                    if combo_success:
-                        all_results["combo_counts"][combo_name] += 1
+                    if _hand_meets_combo(combo_mask, combo_set, must_mask, group_masks):
+                        combo_counts[combo_name] += 1
                 except Exception as e:
                     print(f"Error evaluating combo '{combo_name}': {e}")
             # --- End Combo Checking ---
 
             hand_counts = Counter(hand)
-            all_results["duplicate_counts"].update(c for c, count in hand_counts.items() if count > 1)
-
-            m, s, t = 0, 0, 0
-            for card_in_hand in hand:
-                card_type = CARD_TYPES.get(card_in_hand, "UNKNOWN")
-                if card_type == "MONSTER": m += 1
-                elif card_type == "SPELL": s += 1
-                elif card_type == "TRAP": t += 1
-            all_results["hand_composition_counts"][f"M:{m} S:{s} T:{t}"] += 1
-
-            # --- Category Analysis (Corrected Logic) ---
-            hand_categories_found = []
-            category_composition_counter = Counter()
-            uncategorized_count = 0
-            for card_in_hand in hand:
-                categories_for_card = card_categories.get(card_in_hand, [])
-                if categories_for_card:
-                    hand_categories_found.extend(categories_for_card)
-                    for category in categories_for_card:
-                         category_composition_counter[category] += 1
-                else: uncategorized_count += 1
-            all_results["category_counts"].update(hand_categories_found)
-            comp_parts = [f"{cat}:{count}" for cat, count in sorted(category_composition_counter.items())]
-            if uncategorized_count > 0: comp_parts.append(f"Uncategorized:{uncategorized_count}")
-            composition_key = ", ".join(comp_parts) if comp_parts else "Uncategorized Hand"
-            all_results["hand_category_composition_counts"][composition_key] += 1
-            # --- End Category Analysis ---
+            for card, count in hand_counts.items():
+                if count > 1: duplicate_totals[card] += 1
+
+            # --- Type and Category Composition (packed integer keys, decoded after the run) ---
+            composition_code, category_key = 0, 0
+            for card in hand: composition_code += type_weights[card]; category_key += category_weights[card]
+            composition_totals[composition_code] += 1
+            category_composition_totals[category_key] += 1
+
+            if turns: # Cumulative per-turn stats over the cards seen so far
+                seen_mask, seen_count = 0, 0
+                for turn, cards_seen in enumerate(turns["cards_seen"]):
+                    for card in deck[seen_count:cards_seen]: seen_mask |= bits[card]
+                    seen_count = cards_seen
+                    seen_cards = set(deck[:cards_seen]); seen_set = {names[card] for card in seen_cards} if needs_hand_set else None
+                    turns["totals"][turn] += 1; turn_card_totals[turn].update(seen_cards)
+                    for combo_name, must_mask, group_masks in compiled_combos:
+                        try:
+                            if _hand_meets_combo(seen_mask, seen_set, must_mask, group_masks): turns["combo_counts"][turn][combo_name] += 1
+                        except Exception as e:
+                            print(f"Error evaluating combo '{combo_name}': {e}")
 
             sim_count += 1
             if (i + 1) % update_interval == 0:
-                progress = ((i + 1) / num_simulations) * 100
-                simulation_queue.put(("status", f"Simulating Deck {deck_label}... {progress:.0f}%"))
+                progress(i + 1)
+                if control is not None and control.should_stop(): break
 
         except Exception as e:
             print(f"Error during simulation {i+1} for deck {deck_label}: {e}")
@@ -257,8 +711,849 @@ def run_simulation(num_simulations, deck_list, deck_label, card_combos, card_cat
     if sim_count == 0:
         simulation_queue.put(("error", f"No simulations completed for Deck {deck_label}."))
         return None
+    category_composition_counts, category_counts = _decode_category_compositions(category_composition_totals, categories, tables["category_radix"])
+    all_results = {
+        "hands": hands, "card_counts": registry.decode_counts(card_totals), "combo_counts": combo_counts,
+        "duplicate_counts": registry.decode_counts(duplicate_totals),
+        "hand_composition_counts": Counter({_composition_label(code, radix): count for code, count in enumerate(composition_totals) if count}),
+        "category_counts": category_counts, "hand_category_composition_counts": category_composition_counts, "total_simulations": sim_count,
+    }
+    if turns:
+        turns["card_counts"] = [registry.decode_counts(totals) for totals in turn_card_totals]
+        all_results["turns"] = turns; all_results["draw_schedule"] = draw_schedule
+    if effect_table:
+        all_results["effect_counts"] = registry.decode_counts(effect_totals)
+        all_results["card_effects"] = {names[card]: card_effects[names[card]] for card, _, _ in effect_table}
     return all_results
 
+def _pack_rows_numpy(matrix, radix):
+    """Packs each row of small non-negative ints into one int64 key (None if it won't fit)."""
+    if radix ** matrix.shape[1] > 2 ** 62:
+        return None
+    weights = radix ** np.arange(matrix.shape[1], dtype=np.int64)
+    return matrix.astype(np.int64) @ weights
+
+def _category_repeats(category_ids):
+    """The most times one card lists the same category (a card may list one twice, and then counts twice), at least 1."""
+    return max((max(Counter(card_category_ids).values()) for card_category_ids in category_ids if card_category_ids), default=1)
+
+def _category_weights(card_categories_list, categories, radix):
+    """
+    Per-card weights of the packed category composition key: the key of a
+    hand is the sum of its cards' weights, a mixed-radix number whose digit i
+    counts the hand's cards in categories[i] and whose last digit counts its
+    uncategorized cards. card_categories_list holds each card's categories;
+    radix must exceed the largest digit (see _category_repeats).
+    """
+    column = {category: i for i, category in enumerate(categories)}
+    return [sum(radix ** column[category] for category in card_categories) if card_categories else radix ** len(categories) for card_categories in card_categories_list]
+
+def _category_composition_label(counts, categories):
+    """The report's key for one hand's per-category counts (last entry: uncategorized cards)."""
+    comp_parts = [f"{cat}:{count}" for cat, count in zip(categories, counts) if count]
+    if counts[-1] > 0: comp_parts.append(f"Uncategorized:{counts[-1]}")
+    return ", ".join(comp_parts) if comp_parts else "Uncategorized Hand"
+
+def _decode_category_compositions(key_counts, categories, radix):
+    """
+    Decodes a Counter of packed category keys (or count tuples, when a key
+    would not fit) into (composition Counter keyed like the report, per-category card totals).
+    """
+    compositions, category_counts = Counter(), Counter()
+    for key, n in key_counts.items():
+        counts = key if isinstance(key, tuple) else [key // radix ** i % radix for i in range(len(categories) + 1)]
+        compositions[_category_composition_label(counts, categories)] += n
+        for category, count in zip(categories, counts):
+            if count: category_counts[category] += count * n
+    return compositions, category_counts
+
+def _combo_hits_numpy(hand_masks, names, compiled_combos):
+    """
+    Evaluates every compiled combo for a batch of hands.
+
+    hand_masks holds one int64 card bitmask per hand, so each structured combo
+    is a couple of vectorized AND/compare operations. Legacy callables are
+    evaluated once per distinct hand set.
+    Returns a dict of combo name -> bool array (one entry per hand).
+    """
+    hits = {}
+    unique_masks = None
+    for combo_name, must_mask, group_masks in compiled_combos:
+        try:
+            if group_masks is None:
+                if unique_masks is None:
+                    unique_masks, inverse = np.unique(hand_masks, return_inverse=True)
+                    unique_sets = [{card for j, card in enumerate(names) if int(mask) >> j & 1} for mask in unique_masks]
+                hits[combo_name] = np.array([bool(must_mask(hand_set)) for hand_set in unique_sets])[inverse]
+                continue
+            ok = (hand_masks & must_mask) == must_mask
+            for group_mask in group_masks:
+                ok &= (hand_masks & group_mask) != 0
+            hits[combo_name] = ok
+        except Exception as e:
+            print(f"Error evaluating combo '{combo_name}': {e}")
+    return hits
+
+def _numpy_deck_tables(names, card_combos, card_categories, card_types=None):
+    """
+    Precomputes the per-card arrays (types, categories, combo bits) the
+    vectorized engine indexes into, from a registry whose IDs are the
+    positions in names. card_types defaults to CARD_TYPES.
+    """
+    registry = CardRegistry(names, CARD_TYPES if card_types is None else card_types, card_categories)
+    categories = sorted(registry.categories) # Columns in name order, as the composition keys list them
+    columns = [categories.index(category) for category in registry.categories]
+    category_matrix = np.zeros((len(names), len(categories)), dtype=np.int64)
+    for card_id, card_category_ids in enumerate(registry.category_ids):
+        for category in card_category_ids: category_matrix[card_id, columns[category]] += 1 # A category listed twice counts twice, as in _category_weights
+    return {
+        "names": names,
+        "compiled_combos": compile_combos(card_combos, registry.card_bits(names)),
+        "card_weights": np.array(registry.bits, dtype=np.int64),
+        "type_codes": np.array(registry.type_codes),
+        "categories": categories,
+        "category_matrix": category_matrix,
+        "uncategorized": category_matrix.sum(axis=1) == 0,
+        "category_repeats": _category_repeats(registry.category_ids),
+    }
+
+def _new_numpy_totals(tables, hand_size=5):
+    """Returns empty accumulators for _tally_batch_numpy."""
+    radix = hand_size + 1
+    return {
+        "cards": np.zeros(len(tables["names"]), dtype=np.int64),
+        "duplicates": np.zeros(len(tables["names"]), dtype=np.int64),
+        "compositions": np.zeros(radix ** 3, dtype=np.int64), "radix": radix, # Mixed radix over M/S/T counts (0-hand_size each)
+        "combos": Counter(), "category_compositions": Counter(), "hands": [], "simulations": 0, # category_compositions: packed keys, see _category_weights
+        "category_radix": hand_size * tables["category_repeats"] + 1,
+    }
+
+def _tally_batch_numpy(tables, hands, totals, combo_masks=None):
+    """
+    Adds a (hands x 5) array of card indices into totals. combo_masks, if
+    given, are the card bitmasks combos are checked on (e.g. effect-resolved hands).
+    Returns the per-hand indicators (combo hits, duplicate matrix, M/S/T codes)
+    for callers that compare hands across decks.
+    """
+    batch = hands.shape[0]
+    counts = np.zeros((batch, len(tables["names"])), dtype=np.int64)
+    rows = np.arange(batch)
+    for slot in range(hands.shape[1]):
+        counts[rows, hands[:, slot]] += 1
+
+    totals["cards"] += counts.sum(axis=0)
+    duplicates = counts > 1
+    totals["duplicates"] += duplicates.sum(axis=0)
+    if combo_masks is None: combo_masks = (counts > 0).astype(np.int64) @ tables["card_weights"]
+    combo_hits = _combo_hits_numpy(combo_masks, tables["names"], tables["compiled_combos"])
+    for combo_name, hit in combo_hits.items():
+        hit_count = int(hit.sum())
+        if hit_count: totals["combos"][combo_name] += hit_count
+
+    type_codes = tables["type_codes"]
+    m = counts[:, type_codes == 0].sum(axis=1); s = counts[:, type_codes == 1].sum(axis=1); t = counts[:, type_codes == 2].sum(axis=1)
+    radix = totals["radix"]
+    composition_codes = (m * radix + s) * radix + t
+    totals["compositions"] += np.bincount(composition_codes, minlength=totals["compositions"].size)
+
+    hand_categories = np.column_stack([counts @ tables["category_matrix"], counts[:, tables["uncategorized"]].sum(axis=1)])
+    category_keys = _pack_rows_numpy(hand_categories, totals["category_radix"]) # Decoded once per run by _numpy_totals_to_results
+    if category_keys is None:
+        for row, n in zip(*np.unique(hand_categories, axis=0, return_counts=True)): totals["category_compositions"][tuple(int(count) for count in row)] += int(n)
+    else:
+        for key, n in zip(*np.unique(category_keys, return_counts=True)): totals["category_compositions"][int(key)] += int(n)
+    totals["simulations"] += batch
+    return combo_hits, duplicates, composition_codes
+
+def _composition_label(code, radix=6):
+    """Decodes a mixed-radix M/S/T code into the report's composition key."""
+    return f"M:{code // (radix * radix)} S:{code // radix % radix} T:{code % radix}"
+
+def _tally_turns_numpy(tables, drawn, turns):
+    """Adds cumulative per-turn card sightings and combo hits for (hands x cards drawn) card indices in draw order."""
+    batch = drawn.shape[0]; names = tables["names"]
+    seen = np.zeros((batch, len(names)), dtype=bool); rows = np.arange(batch); done = 0
+    for turn, cards_seen in enumerate(turns["cards_seen"]):
+        for column in range(done, cards_seen): seen[rows, drawn[:, column]] = True
+        done = cards_seen
+        turns["totals"][turn] += batch
+        sightings = seen.sum(axis=0)
+        for i in np.flatnonzero(sightings): turns["card_counts"][turn][names[i]] += int(sightings[i])
+        for combo_name, hit in _combo_hits_numpy(seen.astype(np.int64) @ tables["card_weights"], names, tables["compiled_combos"]).items():
+            hit_count = int(hit.sum())
+            if hit_count: turns["combo_counts"][turn][combo_name] += hit_count
+
+def _numpy_totals_to_results(tables, totals):
+    """Converts vectorized accumulators into the standard result dict."""
+    names = tables["names"]
+    category_totals = totals["cards"] @ tables["category_matrix"]
+    return {
+        "hands": totals["hands"],
+        "card_counts": Counter({card: int(n) for card, n in zip(names, totals["cards"]) if n}),
+        "combo_counts": totals["combos"],
+        "duplicate_counts": Counter({card: int(n) for card, n in zip(names, totals["duplicates"]) if n}),
+        "hand_composition_counts": Counter({_composition_label(code, totals["radix"]): int(totals["compositions"][code]) for code in np.flatnonzero(totals["compositions"])}),
+        "category_counts": Counter({cat: int(n) for cat, n in zip(tables["categories"], category_totals) if n}),
+        "hand_category_composition_counts": _decode_category_compositions(totals["category_compositions"], tables["categories"], totals["category_radix"])[0],
+        "total_simulations": totals["simulations"],
+    }
+
+def _run_simulation_numpy(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, seed, progress, sample_hands, draw_schedule=None, card_effects=None, card_types=None, control=None):
+    """
+    Vectorized engine: the deck is an integer array of card indices and each
+    batch draws its hands with one argpartition over random sort keys. With a
+    draw schedule the lowest keys are sorted into draw order, so the opening
+    hand and every later turn's draws come from the same shuffle, as do the
+    cards added by effects.
+    """
+    names = sorted(card for card, qty in deck_list.items() if qty > 0)
+    tables = _numpy_deck_tables(names, card_combos, card_categories, card_types)
+    deck_ids = np.repeat(np.arange(len(names)), [deck_list[card] for card in names])
+    rng = np.random.default_rng(seed)
+    hand_size = (draw_schedule or DEFAULT_DRAW_SCHEDULE)["opening_hand"]
+    totals = _new_numpy_totals(tables, hand_size)
+    turns = _new_turn_totals(turn_hand_sizes(draw_schedule)) if draw_schedule else None
+    effect_table = compile_card_effects(card_effects, {card: i for i, card in enumerate(names)}); effect_counts = Counter()
+
+    while totals["simulations"] < num_simulations:
+        if control is not None and control.should_stop(): break
+        batch = min(NUMPY_BATCH_SIZE, num_simulations - totals["simulations"])
+        keys = rng.random((batch, len(deck_ids)))
+        if turns:
+            depth = turns["cards_seen"][-1]
+            lowest = np.argpartition(keys, depth - 1, axis=1)[:, :depth]
+            drawn = deck_ids[np.take_along_axis(lowest, np.take_along_axis(keys, lowest, axis=1).argsort(axis=1), axis=1)]
+            hands = drawn[:, :hand_size]
+            _tally_turns_numpy(tables, drawn, turns)
+        else: hands = deck_ids[np.argpartition(keys, 4, axis=1)[:, :5]]
+        if sample_hands:
+            picked = rng.choice(batch, size=min(sample_hands, batch), replace=False)
+            batch_sample = [[names[j] for j in hands[row]] for row in picked]
+            totals["hands"] = _merge_hand_samples(totals["hands"], totals["simulations"], batch_sample, batch, sample_hands, random.Random(int(rng.integers(2 ** 63))))
+        combo_masks = _resolve_effects_numpy(tables, keys, deck_ids, hands, effect_table, effect_counts) if effect_table else None
+        _tally_batch_numpy(tables, hands, totals, combo_masks)
+        progress(totals["simulations"])
+
+    results = _numpy_totals_to_results(tables, totals)
+    if turns: results["turns"] = turns; results["draw_schedule"] = draw_schedule
+    if effect_table: results["effect_counts"] = effect_counts; results["card_effects"] = {names[card]: card_effects[names[card]] for card, _, _ in effect_table}
+    return results
+
+# --- Adaptive (Precision-Targeted) Simulation ---
+
+def wilson_interval(successes, trials, z=WILSON_Z):
+    """Returns the Wilson score interval (low, high) for a binomial proportion."""
+    if trials == 0: return (0.0, 1.0)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(0.0, centre - half_width), min(1.0, centre + half_width))
+
+def _precision_intervals(results, card_combos):
+    """Wilson intervals for every tracked per-hand frequency, keyed like the result Counters."""
+    trials = results["total_simulations"]
+    intervals = {key: {} for key in PRECISION_METRIC_KEYS}
+    for combo_name in set(card_combos) | set(results["combo_counts"]):
+        intervals["combo_counts"][combo_name] = wilson_interval(results["combo_counts"].get(combo_name, 0), trials)
+    for key in ("duplicate_counts", "hand_composition_counts"):
+        for name, count in results[key].items(): intervals[key][name] = wilson_interval(count, trials)
+    return intervals
+
+def _run_simulation_adaptive(max_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, engine, workers, sample_hands, target_precision, draw_schedule=None, card_effects=None, card_types=None, seed=None, control=None):
+    """
+    Simulates in batches until all tracked Wilson intervals are within +/- target_precision (or the cap is hit, or control cancels).
+    Batch i is seeded with spawn_seed(seed, i + 1), so a seed reproduces the whole run.
+    """
+    merged = None; rng = random.Random(spawn_seed(seed, 0))
+    batch = min(ADAPTIVE_MIN_BATCH, max_simulations); batch_index = 0
+    while True:
+        batch_index += 1
+        batch_results = _run_simulation_sharded(batch, deck_list, deck_label, card_combos, card_categories, simulation_queue, engine, workers, sample_hands,
+                                                draw_schedule, card_effects, card_types, spawn_seed(seed, batch_index), lambda done: None, control)
+        if not batch_results: return None
+        merged = merge_results([merged, batch_results] if merged else [batch_results], sample_hands, rng)
+        trials = merged["total_simulations"]
+        intervals = _precision_intervals(merged, card_combos)
+        worst = max((high - low) / 2 for metric in intervals.values() for low, high in metric.values())
+        simulation_queue.put(("status", f"Simulating Deck {deck_label}... {trials:,} hands, widest interval +/-{worst * 100:.3f}% (target +/-{target_precision * 100:.3f}%)"))
+        if worst <= target_precision or trials >= max_simulations or merged.get("partial"): break
+        # Size the next batch from the hands the noisiest metric still needs (normal approximation)
+        worst_variance = max(p * (1 - p) for p in ((low + high) / 2 for metric in intervals.values() for low, high in metric.values()))
+        needed = math.ceil(WILSON_Z * WILSON_Z * worst_variance / (target_precision * target_precision))
+        batch = min(max_simulations - trials, max(ADAPTIVE_MIN_BATCH, needed - trials))
+    merged["precision"] = {
+        "target": target_precision, "confidence": 0.95, "hands_used": trials,
+        "widest": worst, "converged": worst <= target_precision,
+        "intervals": {key: {name: list(interval) for name, interval in metric.items()} for key, metric in intervals.items()},
+    }
+    return merged
+
+# --- Common Random Numbers (Paired Comparison, Multi-Deck Runs) ---
+
+def _common_slots_numpy(deck_lists, universe=None):
+    """
+    Lays out one slot per (card, copy number) over all decks (and universe, a
+    deck whose copy counts bound theirs). Returns (names, slot_cards, deck_slots)
+    where deck_slots[i] indexes the slots holding deck i's copies. Equal
+    universes give equal layouts, so the same seed deals the same hands.
+    """
+    universe = dict(universe or {})
+    for deck_list in deck_lists:
+        for card, quantity in deck_list.items(): universe[card] = max(universe.get(card, 0), quantity)
+    names = sorted(card for card, quantity in universe.items() if quantity > 0)
+    slot_cards = np.repeat(np.arange(len(names)), [universe[card] for card in names])
+    slot_copies = np.concatenate([np.arange(universe[card]) for card in names])
+    deck_slots = [np.flatnonzero(slot_copies < np.array([deck_list.get(card, 0) for card in names])[slot_cards]) for deck_list in deck_lists]
+    return names, slot_cards, deck_slots
+
+def _deal_common_hands_numpy(slot_cards, deck_slots, keys):
+    """Each deck's hands (as card indices) are its 5 lowest-keyed slots of the shared key matrix."""
+    return [slot_cards[slots][np.argpartition(keys[:, slots], 4, axis=1)[:, :5]] for slots in deck_slots]
+
+def run_common_simulation(num_simulations, deck_lists, card_combos, card_categories, simulation_queue, seed=None, universe=None, progress=None, card_types=None):
+    """
+    Simulates several decks from one shared random stream, like
+    run_paired_simulation but without the per-hand difference counts.
+    Differences between the decks' statistics are far less noisy than with
+    independent runs, and the random keys are drawn once for all decks.
+    Runs given the same seed and universe deal the same hands to the same deck.
+
+    Returns a list of result dicts (one per deck), or None on failure.
+    """
+    for deck_list in deck_lists:
+        if not deck_list or sum(deck_list.values()) < 5:
+            simulation_queue.put(("error", "Every deck needs at least 5 cards to draw a hand.")); return None
+    if np is None:
+        simulation_queue.put(("error", "Common random number runs require numpy ('pip install numpy').")); return None
+    names, slot_cards, deck_slots = _common_slots_numpy(deck_lists, universe)
+    tables = _numpy_deck_tables(names, card_combos, card_categories, card_types)
+    rng = np.random.default_rng(seed)
+    totals = [_new_numpy_totals(tables) for _ in deck_lists]
+    done = 0
+    while done < num_simulations:
+        batch = min(NUMPY_BATCH_SIZE, num_simulations - done)
+        for hands, deck_totals in zip(_deal_common_hands_numpy(slot_cards, deck_slots, rng.random((batch, len(slot_cards)))), totals):
+            _tally_batch_numpy(tables, hands, deck_totals)
+        done += batch
+        if progress: progress(done)
+    return [_numpy_totals_to_results(tables, deck_totals) for deck_totals in totals]
+
+def run_paired_simulation(num_simulations, deck_list_a, deck_list_b, card_combos, card_categories, simulation_queue, seed=None, card_types=None, control=None):
+    """
+    Simulates Deck A and Deck B from one shared random stream (common random numbers).
+
+    Every copy slot (card, copy number) across both decks gets one random sort
+    key per hand, and each deck's hand is its 5 lowest-keyed slots. Copies the
+    decks share therefore land in the same hands, while each deck's hands stay
+    uniformly random, so A-B differences have far lower variance.
+
+    Returns (results_a, results_b), or (None, None) on failure. results_a["paired"]
+    holds, per tracked metric, the hands where only A or only B hit it. Both
+    record the seed used (drawn fresh if seed is None) under "seed". control
+    (a SimulationControl) is checked between batches; a cancelled run returns
+    the hands dealt so far with "partial" set.
+    """
+    for label, deck_list in (("A", deck_list_a), ("B", deck_list_b)):
+        if not deck_list or sum(deck_list.values()) < MIN_DECK_SIZE:
+            simulation_queue.put(("error", f"Deck {label} invalid for simulation.")); return None, None
+    if np is None:
+        simulation_queue.put(("error", "Paired comparison requires numpy ('pip install numpy').")); return None, None
+
+    names, slot_cards, deck_slots = _common_slots_numpy([deck_list_a, deck_list_b])
+    tables = _numpy_deck_tables(names, card_combos, card_categories, card_types)
+
+    seed = new_seed() if seed is None else seed
+    rng = np.random.default_rng(seed)
+    totals_a = _new_numpy_totals(tables); totals_b = _new_numpy_totals(tables)
+    paired = {key: {} for key in PRECISION_METRIC_KEYS}
+    progress = ProgressReporter(status_publisher(simulation_queue, "Simulating Decks A+B (paired)"), num_simulations)
+
+    def add_discordant(metric, name, a_only, b_only):
+        if a_only or b_only:
+            counts = paired[metric].setdefault(name, [0, 0]); counts[0] += a_only; counts[1] += b_only
+
+    while totals_a["simulations"] < num_simulations:
+        if control is not None and control.should_stop(): break
+        batch = min(NUMPY_BATCH_SIZE, num_simulations - totals_a["simulations"])
+        hands_a, hands_b = _deal_common_hands_numpy(slot_cards, deck_slots, rng.random((batch, len(slot_cards))))
+        hits_a, duplicates_a, compositions_a = _tally_batch_numpy(tables, hands_a, totals_a)
+        hits_b, duplicates_b, compositions_b = _tally_batch_numpy(tables, hands_b, totals_b)
+
+        for combo_name in hits_a:
+            add_discordant("combo_counts", combo_name, int((hits_a[combo_name] & ~hits_b[combo_name]).sum()), int((hits_b[combo_name] & ~hits_a[combo_name]).sum()))
+        a_only = (duplicates_a & ~duplicates_b).sum(axis=0); b_only = (duplicates_b & ~duplicates_a).sum(axis=0)
+        for i in np.flatnonzero(a_only + b_only):
+            add_discordant("duplicate_counts", names[i], int(a_only[i]), int(b_only[i]))
+        differ = compositions_a != compositions_b
+        a_only = np.bincount(compositions_a[differ], minlength=216); b_only = np.bincount(compositions_b[differ], minlength=216)
+        for code in np.flatnonzero(a_only + b_only):
+            add_discordant("hand_composition_counts", _composition_label(code), int(a_only[code]), int(b_only[code]))
+
+        progress(totals_a["simulations"])
+
+    if not totals_a["simulations"]:
+        simulation_queue.put(("error", "Paired simulation was cancelled before any hands were completed.")); return None, None
+    results_a = _numpy_totals_to_results(tables, totals_a); results_b = _numpy_totals_to_results(tables, totals_b)
+    if totals_a["simulations"] < num_simulations: results_a["partial"] = results_b["partial"] = True
+    paired["hands"] = totals_a["simulations"]
+    results_a["paired"] = paired; results_a["seed"] = results_b["seed"] = seed
+    return results_a, results_b
+
+def paired_difference(a_only, b_only, trials):
+    """Returns (mean A-B difference, standard error) of a paired indicator from its discordant hand counts."""
+    if trials == 0: return 0.0, 0.0
+    difference = (a_only - b_only) / trials
+    variance = (a_only + b_only) / trials - difference * difference
+    return difference, math.sqrt(max(variance, 0.0) / trials)
+
+# --- Incremental Re-simulation (Hand Records) ---
+
+def _tally_positions_numpy(slots, positions, card_combos, card_categories, card_types=None):
+    """Tallies hands given as (hands x 5) deck positions into a standard result dict."""
+    names = sorted(set(slots))
+    tables = _numpy_deck_tables(names, card_combos, card_categories, card_types)
+    slot_ids = np.array([names.index(card) for card in slots])
+    totals = _new_numpy_totals(tables)
+    for start in range(0, positions.shape[0], NUMPY_BATCH_SIZE):
+        _tally_batch_numpy(tables, slot_ids[positions[start:start + NUMPY_BATCH_SIZE]], totals)
+    return _numpy_totals_to_results(tables, totals)
+
+def _record_signature(slots, card_combos, card_categories, card_types=None):
+    """The inputs besides the hands that a record's results depend on, restricted to its cards."""
+    cards = sorted(set(slots)); card_types = CARD_TYPES if card_types is None else card_types
+    return {"combos": card_combos, "types": {card: card_types.get(card, "UNKNOWN") for card in cards}, "categories": {card: sorted(card_categories.get(card, [])) for card in cards if card_categories.get(card)}}
+
+def run_recorded_simulation(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, seed=None, card_types=None, control=None):
+    """
+    Numpy simulation that also returns a hand record for resimulate_from_record.
+
+    The record keeps every sampled hand as 5 deck positions (uint8), so 1M hands
+    cost 5 MB. control pauses/cancels between batches; a cancelled run returns
+    the hands drawn so far with "partial" set. Returns (results, record), or
+    (None, None) on failure.
+    """
+    if not deck_list or sum(deck_list.values()) < MIN_DECK_SIZE:
+        simulation_queue.put(("error", f"Deck {deck_label} invalid for simulation.")); return None, None
+    if np is None:
+        simulation_queue.put(("error", "Hand records require numpy ('pip install numpy').")); return None, None
+    slots = [card for card in sorted(deck_list) for _ in range(deck_list[card])]
+    seed = new_seed() if seed is None else seed
+    rng = np.random.default_rng(seed)
+    positions = np.empty((num_simulations, 5), dtype=np.uint8)
+    progress = ProgressReporter(status_publisher(simulation_queue, f"Drawing Deck {deck_label}"), num_simulations)
+    drawn = 0
+    while drawn < num_simulations:
+        if control is not None and control.should_stop(): break
+        batch = min(NUMPY_BATCH_SIZE, num_simulations - drawn)
+        positions[drawn:drawn + batch] = np.argpartition(rng.random((batch, len(slots))), 4, axis=1)[:, :5]
+        drawn += batch
+        progress(drawn)
+    if not drawn:
+        simulation_queue.put(("error", f"Simulation of Deck {deck_label} was cancelled before any hands were completed.")); return None, None
+    positions = positions[:drawn]
+    simulation_queue.put(("status", f"Tallying Deck {deck_label}..."))
+    results = _tally_positions_numpy(slots, positions, card_combos, card_categories, card_types)
+    results["seed"] = seed
+    if drawn < num_simulations: results["partial"] = True
+    return results, {"slots": slots, "positions": positions, "results": results, "signature": _record_signature(slots, card_combos, card_categories, card_types)}
+
+def _fill_flagged_positions(hands, flagged, pool, rng):
+    """Replaces the flagged entries of each hand with distinct positions drawn uniformly from pool minus that hand."""
+    keys = rng.random((hands.shape[0], len(pool)))
+    in_pool = np.full(max(int(hands.max()), int(pool.max())) + 1, -1); in_pool[pool] = np.arange(len(pool))
+    rows, cols = np.nonzero(~flagged)
+    held = in_pool[hands[rows, cols]]
+    keys[rows[held >= 0], held[held >= 0]] = 2.0 # Never redraw a position the hand keeps
+    order = np.argsort(keys, axis=1)[:, :5]
+    fill_rank = np.cumsum(flagged, axis=1) - 1
+    hands[flagged] = pool[order[np.nonzero(flagged)[0], fill_rank[flagged]]]
+
+def resimulate_from_record(record, deck_list, deck_label, card_combos, card_categories, simulation_queue, seed=None, max_changed_fraction=INCREMENTAL_MAX_CHANGED, card_types=None, control=None):
+    """
+    Updates a hand record to a slightly different deck without redrawing every hand.
+
+    Cards are matched copy by copy. Positions of removed copies are first
+    relabelled as added copies, which keeps each hand a uniform draw. Leftover
+    removed positions are redrawn from the kept ones (deck shrank), and leftover
+    added positions enter hands through hypergeometric replacement (deck grew).
+    Only hands touching a changed position are re-tallied: their old
+    contribution is subtracted from the recorded results and the new one added.
+
+    Returns (results, record), or (None, None) when the record does not apply
+    (other combos/categories/types, too small a deck) or more than
+    max_changed_fraction of the hands would change; run a full simulation then.
+    The update is one pass: control can only hold or cancel it before it starts
+    (also (None, None)). seed drives the redraws of the changed positions.
+    """
+    if np is None or not deck_list or sum(deck_list.values()) < MIN_DECK_SIZE: return None, None
+    if control is not None and control.should_stop(): return None, None
+    old_slots = record["slots"]
+    if record["signature"] != _record_signature(old_slots, card_combos, card_categories, card_types): return None, None
+    rng = np.random.default_rng(seed)
+    old_positions = record["positions"]
+
+    copies_seen, removed = Counter(), []
+    for position, card in enumerate(old_slots):
+        copies_seen[card] += 1
+        if copies_seen[card] > deck_list.get(card, 0): removed.append(position)
+    added = [card for card in sorted(deck_list) for _ in range(max(0, deck_list[card] - copies_seen[card]))]
+    relabel = min(len(removed), len(added))
+    new_slots = list(old_slots)
+    for position, card in zip(removed[:relabel], added[:relabel]): new_slots[position] = card
+    dropped, appended = np.array(removed[relabel:], dtype=np.int64), added[relabel:]
+
+    changed = np.zeros(len(old_slots), dtype=bool); changed[removed] = True
+    affected = changed[old_positions].any(axis=1)
+    new_count = len(old_slots) + len(appended)
+    if appended:
+        # Hypergeometric number of new positions per hand; each replaces a random held position
+        swaps = rng.hypergeometric(len(appended), len(old_slots), 5, size=old_positions.shape[0])
+        affected |= swaps > 0
+    if affected.mean() > max_changed_fraction: return None, None
+
+    rows = np.flatnonzero(affected)
+    hands = old_positions[rows].astype(np.int64)
+    if len(dropped):
+        keep = np.setdiff1d(np.arange(len(old_slots)), dropped)
+        _fill_flagged_positions(hands, np.isin(hands, dropped), keep, rng)
+        renumber = np.full(len(old_slots), -1); renumber[keep] = np.arange(len(keep))
+        hands = renumber[hands]; new_slots = [new_slots[position] for position in keep]
+    if appended:
+        swap_counts = swaps[rows]
+        flagged = np.argsort(rng.random(hands.shape), axis=1).argsort(axis=1) < swap_counts[:, None]
+        _fill_flagged_positions(hands, flagged, np.arange(len(old_slots), new_count), rng)
+        new_slots.extend(appended)
+
+    simulation_queue.put(("status", f"Re-evaluating {len(rows):,} of {old_positions.shape[0]:,} hands for Deck {deck_label}..."))
+    old_part = _tally_positions_numpy(old_slots, old_positions[rows], card_combos, card_categories, card_types)
+    new_part = _tally_positions_numpy(new_slots, hands, card_combos, card_categories, card_types)
+    results = {"hands": [], "total_simulations": record["results"]["total_simulations"]}
+    for key in RESULT_COUNTER_KEYS:
+        counter = Counter(record["results"][key]); counter.subtract(old_part[key]); counter.update(new_part[key])
+        results[key] = Counter({name: n for name, n in counter.items() if n > 0})
+
+    positions = old_positions.copy()
+    if len(dropped): positions = renumber[positions].astype(np.uint8) # Unaffected hands hold no dropped position
+    positions[rows] = hands
+    return results, {"slots": new_slots, "positions": positions, "results": results, "signature": _record_signature(new_slots, card_combos, card_categories, card_types)}
+
+def save_hand_record(record, path):
+    """Writes a hand record to a compressed .npz file (atomically replacing any previous one)."""
+    meta = {"slots": record["slots"], "signature": record["signature"], "results": {key: dict(value) if isinstance(value, Counter) else value for key, value in record["results"].items() if key != "hands"}}
+    temp_path = path + ".tmp.npz"
+    np.savez_compressed(temp_path, positions=record["positions"], meta=np.array(json.dumps(meta)))
+    os.replace(temp_path, path)
+
+def load_hand_record(path):
+    """Reads a hand record written by save_hand_record, or returns None if it is missing or unreadable."""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"])); positions = data["positions"]
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(path): print(f"Warning: Ignoring unreadable hand record '{path}': {e}")
+        return None
+    results = restore_result_counters(meta["results"])
+    return {"slots": meta["slots"], "positions": positions, "results": results, "signature": meta["signature"]}
+
+# --- Exact (Hypergeometric) Analysis ---
+
+def _run_exact_analysis(deck_list, deck_label, card_combos, card_categories, simulation_queue, draw_schedule=None, card_types=None):
+    """
+    Exact engine: counts opening hands by how many cards they take from each
+    card group (multivariate hypergeometric) instead of sampling.
+
+    Copies count as distinct cards, so every counter is out of C(N, n) hands
+    (n = opening hand size) and the resulting percentages are exact. Card and
+    structured combo counts have closed forms (inclusion-exclusion, see
+    combo_hit_terms). The M/S/T and category compositions are separate
+    tallies, so each enumerates only the card groups it can tell apart (by
+    type, by category set), and only legacy callable combos need every hand's
+    card set. A default deck takes tens of milliseconds; the category
+    enumeration grows with the number of distinct category sets and the hand
+    size. Per-turn stats of a draw schedule use the same closed forms over the
+    C(N, k) sets of the first k cards; callable combos are left out of them.
+    """
+    simulation_queue.put(("status", f"Computing exact probabilities for Deck {deck_label}..."))
+    names = sorted(card for card, qty in deck_list.items() if qty > 0)
+    deck_size = sum(deck_list[card] for card in names)
+    hand_size = (draw_schedule or DEFAULT_DRAW_SCHEDULE)["opening_hand"]
+    total_hands = math.comb(deck_size, hand_size)
+    hands_per_copy = math.comb(deck_size - 1, hand_size - 1)
+    results = {"hands": [], "total_simulations": total_hands, "exact": True}
+    for key in RESULT_COUNTER_KEYS: results[key] = Counter()
+
+    # Per-card frequencies have closed forms
+    for card in names:
+        quantity = deck_list[card]
+        results["card_counts"][card] = quantity * hands_per_copy
+        duplicates = total_hands - math.comb(deck_size - quantity, hand_size) - quantity * math.comb(deck_size - quantity, hand_size - 1)
+        if duplicates: results["duplicate_counts"][card] = duplicates
+        for category in card_categories.get(card, []): results["category_counts"][category] += quantity * hands_per_copy
+
+    # Structured combos: sum(coefficient * C(N - copies in union, k)), with the
+    # copies of each union (shared across combos) looked up once
+    combo_terms, callable_combos = {}, {}
+    for combo_name, definition in card_combos.items():
+        if isinstance(definition, dict): combo_terms[combo_name] = combo_hit_terms(definition)
+        elif callable(definition): callable_combos[combo_name] = definition
+        else: print(f"Warning: Unknown combo definition type for '{combo_name}'")
+    union_copies = {}
+    for terms in combo_terms.values():
+        for union in terms:
+            if union not in union_copies: union_copies[union] = sum(deck_list.get(card, 0) for card in union)
+    def combo_hits(terms, cards_seen):
+        return sum(coefficient * math.comb(deck_size - union_copies[union], cards_seen) for union, coefficient in terms.items())
+    for combo_name, terms in combo_terms.items():
+        hits = combo_hits(terms, hand_size)
+        if hits: results["combo_counts"][combo_name] = hits
+
+    card_type_of = CARD_TYPES if card_types is None else card_types
+    type_sizes = Counter()
+    for card in names: type_sizes[card_type_of.get(card, "UNKNOWN")] += deck_list[card]
+    type_list = list(type_sizes.items())
+    for counts, weight in _group_count_hands([size for _, size in type_list], hand_size):
+        by_type = dict(zip((card_type for card_type, _ in type_list), counts))
+        results["hand_composition_counts"][f"M:{by_type.get('MONSTER', 0)} S:{by_type.get('SPELL', 0)} T:{by_type.get('TRAP', 0)}"] += weight
+
+    category_sizes = Counter()
+    for card in names: category_sizes[tuple(sorted(card_categories.get(card, [])))] += deck_list[card]
+    category_list = list(category_sizes.items())
+    for counts, weight in _group_count_hands([size for _, size in category_list], hand_size):
+        category_composition_counter = Counter(); uncategorized_count = 0
+        for (categories, _), count in zip(category_list, counts):
+            if not count: continue
+            if categories:
+                for category in categories: category_composition_counter[category] += count
+            else: uncategorized_count += count
+        comp_parts = [f"{cat}:{count}" for cat, count in sorted(category_composition_counter.items())]
+        if uncategorized_count > 0: comp_parts.append(f"Uncategorized:{uncategorized_count}")
+        results["hand_category_composition_counts"][", ".join(comp_parts) if comp_parts else "Uncategorized Hand"] += weight
+
+    if callable_combos: # Legacy callables see the hand's card set, so they need the per-card enumeration
+        for counts, weight in _group_count_hands([deck_list[card] for card in names], hand_size):
+            hand_set = {card for card, count in zip(names, counts) if count}
+            for combo_name, definition in callable_combos.items():
+                try:
+                    if definition(hand_set): results["combo_counts"][combo_name] += weight
+                except Exception as e:
+                    print(f"Error evaluating combo '{combo_name}': {e}")
+
+    if draw_schedule:
+        turns = _new_turn_totals(turn_hand_sizes(draw_schedule))
+        for turn, cards_seen in enumerate(turns["cards_seen"]):
+            turns["totals"][turn] = math.comb(deck_size, cards_seen)
+            for card in names: turns["card_counts"][turn][card] = turns["totals"][turn] - math.comb(deck_size - deck_list[card], cards_seen)
+            for combo_name, terms in combo_terms.items():
+                hits = combo_hits(terms, cards_seen)
+                if hits: turns["combo_counts"][turn][combo_name] = hits
+        results["turns"] = turns; results["draw_schedule"] = draw_schedule
+    return results
+
+def _group_count_hands(group_sizes, hand_size):
+    """Yields (cards taken from each group, number of hands) for every way to take hand_size cards from groups of the given sizes."""
+    capacity_after = [sum(group_sizes[i:]) for i in range(len(group_sizes) + 1)]
+    counts = [0] * len(group_sizes)
+    def enumerate_hands(index, remaining, weight):
+        if remaining == 0: yield tuple(counts), weight; return
+        if capacity_after[index] < remaining: return
+        size = group_sizes[index]
+        for count in range(min(size, remaining) + 1):
+            counts[index] = count
+            yield from enumerate_hands(index + 1, remaining - count, weight * math.comb(size, count))
+        counts[index] = 0
+    yield from enumerate_hands(0, hand_size, 1)
+
+# --- Sharded (Multi-Process) Simulation ---
+
+def merge_results(partial_results, sample_hands=0, rng=None):
+    """
+    Merges shard results into one result dict by summing their Counters and
+    simulation counts (per turn too, for draw-schedule runs, and effect
+    counts for card-effect runs; "partial" if any part is). Shard hand
+    samples are merged into one uniform sample of at most sample_hands hands.
+    """
+    rng = rng or random.Random()
+    merged = {"hands": [], "total_simulations": 0}
+    for key in RESULT_COUNTER_KEYS: merged[key] = Counter()
+    for partial in partial_results:
+        for key in RESULT_COUNTER_KEYS: merged[key].update(partial.get(key, {}))
+        if partial.get("turns"):
+            if "turns" not in merged: merged["turns"] = _new_turn_totals(partial["turns"]["cards_seen"]); merged["draw_schedule"] = partial["draw_schedule"]
+            _add_turn_totals(merged["turns"], partial["turns"])
+        if "effect_counts" in partial:
+            merged.setdefault("effect_counts", Counter()).update(partial["effect_counts"]); merged["card_effects"] = partial["card_effects"]
+        if partial.get("partial"): merged["partial"] = True
+        shard_total = partial.get("total_simulations", 0)
+        if sample_hands:
+            merged["hands"] = _merge_hand_samples(merged["hands"], merged["total_simulations"], partial.get("hands", []), shard_total, sample_hands, rng)
+        merged["total_simulations"] += shard_total
+    return merged
+
+def _picklable_combos(card_combos):
+    """Swaps legacy combo callables for their structured equivalents so combos can cross process boundaries."""
+    structured = _get_hardcoded_combo_definitions()
+    combos = {}
+    for combo_name, definition in card_combos.items():
+        if callable(definition):
+            if combo_name not in structured:
+                print(f"Warning: Combo '{combo_name}' has no structured form and is skipped in multi-process runs.")
+                continue
+            definition = structured[combo_name]
+        combos[combo_name] = definition
+    return combos
+
+def _simulate_shard(shard_id, num_simulations, deck_list, deck_label, card_combos, card_categories, engine, seed, message_queue, sample_hands=0, draw_schedule=None, card_effects=None, card_types=None, control=None):
+    """Worker entry point: simulates one shard, reporting throttled progress and errors on message_queue."""
+    progress = ProgressReporter(lambda done, total, rate, eta: message_queue.put(("shard_progress", shard_id, done)), num_simulations)
+    return _run_engine(engine, num_simulations, deck_list, deck_label, card_combos, card_categories, message_queue, seed, progress, sample_hands, draw_schedule, card_effects, card_types, control)
+
+def _run_simulation_sharded(num_simulations, deck_list, deck_label, card_combos, card_categories, simulation_queue, engine, workers, sample_hands=0, draw_schedule=None, card_effects=None, card_types=None, seed=None, progress=None, control=None, checkpoint=None, resume_state=None):
+    """
+    Splits a run into shards of SEED_SHARD_SIZE hands, shard i dealt from
+    spawn_seed(seed, i), and merges their results in shard order. The shards
+    run in a process pool when workers > 1, else one after another here; the
+    layout doesn't depend on workers, so neither do the results. Workers see
+    control through manager events; on cancel, shards not yet started are
+    dropped and the result is marked "partial". Completed shards go to the
+    checkpoint file, if given; shards listed in resume_state (a loaded
+    checkpoint) are taken from it instead of being simulated.
+    """
+    seed = new_seed() if seed is None else seed
+    shard_sizes = [min(SEED_SHARD_SIZE, num_simulations - start) for start in range(0, num_simulations, SEED_SHARD_SIZE)] or [num_simulations]
+    num_shards = len(shard_sizes)
+    merge_rng = random.Random(spawn_seed(seed, num_shards)) # Only used to merge hand samples
+    writer = _CheckpointWriter(checkpoint, seed, num_simulations, engine, resume_state)
+    skipped = set(writer.done_shards)
+    restored = [resume_state["results"]] if resume_state else []
+    if workers <= 1 or num_shards - len(skipped) <= 1:
+        partial_results, done = list(restored), sum(partial["total_simulations"] for partial in restored)
+        for i, size in enumerate(shard_sizes):
+            if i in skipped: continue
+            if control is not None and control.cancelled: break
+            shard_progress = (lambda offset: lambda shard_done: progress(offset + shard_done))(done) if progress else (lambda shard_done: None)
+            partial = _run_engine(engine, size, deck_list, deck_label, card_combos, card_categories, simulation_queue, spawn_seed(seed, i), shard_progress, sample_hands, draw_schedule, card_effects, card_types, control)
+            if partial is None: return None
+            partial_results.append(partial); done += size
+            if partial["total_simulations"] == size: writer.add(i, partial)
+        return writer.finish(_mark_partial(merge_results(partial_results, sample_hands, merge_rng) if len(partial_results) != 1 else partial_results[0], num_simulations))
+
+    combos = _picklable_combos(card_combos)
+    done_per_shard = [0] * num_shards
+    for i in skipped: done_per_shard[i] = shard_sizes[i]
+    progress = progress or ProgressReporter(status_publisher(simulation_queue, f"Simulating Deck {deck_label} ({workers} workers)"), num_simulations, sum(done_per_shard))
+    finished = set()
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        message_queue = manager.Queue()
+        worker_control = SimulationControl(manager.Event(), manager.Event()) if control is not None else None
+        futures = {
+            i: pool.submit(_simulate_shard, i, size, deck_list, deck_label, combos, card_categories, engine, spawn_seed(seed, i), message_queue, sample_hands, draw_schedule, card_effects, card_types, worker_control)
+            for i, size in enumerate(shard_sizes) if i not in skipped
+        }
+        while True:
+            pending = wait(futures.values(), timeout=0.1).not_done
+            if control is not None: # Mirror the caller's token into the workers' events
+                if control.cancelled and not worker_control.cancelled:
+                    worker_control.cancel()
+                    for future in pending: future.cancel()
+                elif control.paused != worker_control.paused: worker_control.pause() if control.paused else worker_control.resume()
+            while not message_queue.empty():
+                message = message_queue.get()
+                if message[0] == "shard_progress": done_per_shard[message[1]] = message[2]
+                else: simulation_queue.put(message)
+            for i, future in futures.items():
+                if i in finished or not future.done() or future.cancelled() or future.exception() is not None: continue
+                finished.add(i); partial = future.result()
+                if partial: done_per_shard[i] = partial["total_simulations"] # Workers throttle their progress, so the last count may be missing
+                if partial and partial["total_simulations"] == shard_sizes[i]: writer.add(i, partial)
+            progress(sum(done_per_shard))
+            if not pending: break
+        try:
+            partial_results = restored + [future.result() for future in futures.values() if not future.cancelled()]
+        except Exception as e:
+            simulation_queue.put(("error", f"Simulation worker failed for Deck {deck_label}: {e}"))
+            return None
+    if any(partial is None for partial in partial_results):
+        simulation_queue.put(("error", f"One or more simulation shards failed for Deck {deck_label}."))
+        return None
+    return writer.finish(_mark_partial(merge_results(partial_results, sample_hands, merge_rng), num_simulations))
+
+def _mark_partial(results, num_simulations):
+    """Flags results that cover fewer hands than requested (a cancelled run) as "partial"."""
+    if results and results["total_simulations"] < num_simulations: results["partial"] = True
+    return results
+
+# --- Checkpoints (Resumable Runs) ---
+
+class _CheckpointWriter:
+    """
+    Collects the completed shards of a sharded run and writes their merged
+    results to a checkpoint file at most every CHECKPOINT_INTERVAL seconds.
+    Without a path it does nothing.
+    """
+    def __init__(self, path, seed, num_simulations, engine, resume_state=None):
+        self.path = path
+        self.header = {"seed": seed, "num_simulations": num_simulations, "shard_size": SEED_SHARD_SIZE, "engine": engine}
+        self.done_shards = set(resume_state["done_shards"]) if resume_state else set()
+        self.results = resume_state["results"] if resume_state else None
+        self.last_write = time.monotonic()
+
+    def add(self, shard_id, results):
+        """Adds a completed shard, writing the checkpoint if the last write is CHECKPOINT_INTERVAL old."""
+        if not self.path: return
+        self.done_shards.add(shard_id)
+        self.results = merge_results([self.results, results] if self.results else [results])
+        if time.monotonic() - self.last_write >= CHECKPOINT_INTERVAL: self.write()
+
+    def write(self):
+        """Writes the completed shards now."""
+        if not self.path or not self.results: return
+        try: save_checkpoint(dict(self.header, done_shards=sorted(self.done_shards), results=self.results), self.path)
+        except (OSError, TypeError, ValueError) as e: print(f"Warning: Could not write checkpoint '{self.path}': {e}")
+        self.last_write = time.monotonic()
+
+    def finish(self, results):
+        """Keeps the checkpoint of a cancelled run for a later resume and removes that of a finished one; returns results."""
+        if not self.path or results is None: return results
+        if results.get("partial"): self.write()
+        else:
+            try: os.remove(self.path)
+            except FileNotFoundError: pass
+            except OSError as e: print(f"Warning: Could not remove checkpoint '{self.path}': {e}")
+        return results
+
+def restore_result_counters(results):
+    """Turns the counter dicts of a result dict read back from JSON (including per-turn and effect counts) into Counters, in place; returns results."""
+    for key in RESULT_COUNTER_KEYS: results[key] = Counter(results.get(key, {}))
+    if results.get("turns"):
+        for kind in ("combo_counts", "card_counts"): results["turns"][kind] = [Counter(counts) for counts in results["turns"][kind]]
+    if "effect_counts" in results: results["effect_counts"] = Counter(results["effect_counts"])
+    results.setdefault("hands", [])
+    return results
+
+def save_checkpoint(state, path):
+    """Writes a checkpoint (run header, completed shard ids and their merged results) as JSON, atomically replacing any previous one."""
+    directory = os.path.dirname(path)
+    if directory: os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f: json.dump(state, f)
+    os.replace(temp_path, path)
+
+def load_checkpoint(path):
+    """Reads a checkpoint written by save_checkpoint (Counters restored), or returns None if it is missing or unreadable."""
+    try:
+        with open(path, 'r') as f: state = json.load(f)
+        restore_result_counters(state["results"])["hands"] = []
+        state["done_shards"] = [int(shard) for shard in state["done_shards"]]
+        missing = {"seed", "num_simulations", "shard_size", "engine"} - set(state)
+        if missing: raise KeyError(", ".join(sorted(missing)))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Warning: Ignoring unreadable checkpoint '{path}': {e}")
+        return None
+    return state
+
 # --- PDF Generation Core ---
 
 def _create_pdf_table(data, col_widths, style):
@@ -280,28 +1575,186 @@ def _add_pdf_section(elements, title, data, col_widths, style, styles):
     elements.append(table)
     elements.append(Spacer(1, 0.3 * inch))
 
+def _add_precision_section(elements, results_a, results_b, style, styles):
+    """Adds the hands used and achieved combo confidence intervals of precision-targeted runs."""
+    elements.append(Paragraph("Achieved Precision (95% Wilson Intervals)", styles['h2']))
+    labelled = [("A", results_a)] + ([("B", results_b)] if results_b else [])
+    for label, results in labelled:
+        precision = results.get("precision")
+        if not precision: elements.append(Paragraph(f"Deck {label}: fixed-size run ({results.get('total_simulations', 0):,} hands).", styles['Normal'])); continue
+        status = "target reached" if precision["converged"] else "stopped at simulation cap"
+        elements.append(Paragraph(f"Deck {label}: {precision['hands_used']:,} hands, widest interval +/-{precision['widest'] * 100:.3f}% (target +/-{precision['target'] * 100:.3f}%, {status}).", styles['Normal']))
+    header = ["Combo"] + [f"95% CI ({label})" for label, _ in labelled]
+    combo_names = sorted({name for _, results in labelled for name in results.get("precision", {}).get("intervals", {}).get("combo_counts", {})})
+    data = [header]
+    for combo_name in combo_names:
+        row = [combo_name]
+        for _, results in labelled:
+            interval = results.get("precision", {}).get("intervals", {}).get("combo_counts", {}).get(combo_name)
+            row.append(f"{interval[0] * 100:.2f}% - {interval[1] * 100:.2f}%" if interval else "n/a")
+        data.append(row)
+    elements.append(Spacer(1, 0.1 * inch))
+    elements.append(_create_pdf_table(data, [3.0 * inch] + [1.6 * inch] * (len(header) - 1), style))
+    elements.append(Spacer(1, 0.3 * inch))
+
+def _add_paired_section(elements, results_a, results_b, style, styles):
+    """Adds the paired (common random numbers) A-B differences with their standard errors."""
+    paired = results_a["paired"]; trials = paired.get("hands", 0)
+    total_a = results_a.get("total_simulations", 0); total_b = results_b.get("total_simulations", 0)
+    elements.append(Paragraph("Paired Differences (Common Random Numbers)", styles['h2']))
+    elements.append(Paragraph(f"Both decks were dealt from the same random stream over {trials:,} hands. Paired SE is the standard error of the A-B difference; Indep. SE is what two independent runs of the same size would give.", styles['Normal']))
+    sections = (("combo_counts", "Combos", "Combo"), ("duplicate_counts", "Duplicates", "Card"), ("hand_composition_counts", "Composition (M/S/T)", "Composition"))
+    for key, title, label in sections:
+        names = set(results_a.get(key, {})) | set(results_b.get(key, {})) | set(paired.get(key, {}))
+        if not names: continue
+        rows = []
+        for name in names:
+            p_a = results_a[key].get(name, 0) / total_a; p_b = results_b[key].get(name, 0) / total_b
+            difference, paired_se = paired_difference(*paired.get(key, {}).get(name, (0, 0)), trials)
+            independent_se = math.sqrt(p_a * (1 - p_a) / total_a + p_b * (1 - p_b) / total_b)
+            rows.append((name, p_a, p_b, difference, paired_se, independent_se))
+        rows.sort(key=lambda row: abs(row[3]), reverse=True)
+        data = [(label, "% (A)", "% (B)", "Diff (A-B)", "Paired SE", "Indep. SE")]
+        data.extend((name, f"{p_a * 100:.2f}%", f"{p_b * 100:.2f}%", f"{difference * 100:+.3f}%", f"{paired_se * 100:.3f}%", f"{independent_se * 100:.3f}%") for name, p_a, p_b, difference, paired_se, independent_se in rows)
+        elements.append(Paragraph(title, styles['h3']))
+        elements.append(_create_pdf_table(data, [2.4 * inch, 0.8 * inch, 0.8 * inch, 0.9 * inch, 0.8 * inch, 0.8 * inch], style))
+    elements.append(Spacer(1, 0.3 * inch))
+
+def _add_turns_section(elements, results_a, results_b, card_combos, style, styles):
+    """Adds cumulative per-turn combo and card-sighting tables for draw-schedule runs ("A% / B%" cells when comparing)."""
+    turns_a = results_a["turns"]; turns_b = results_b.get("turns") if results_b else None
+    headers = [f"Turn {turn + 1} ({cards_seen})" for turn, cards_seen in enumerate(turns_a["cards_seen"])]
+    col_widths = [2.4 * inch] + [min(1.2 * inch, 4.6 * inch / len(headers))] * len(headers)
+
+    def cell(kind, turn, name):
+        text = f"{turns_a[kind][turn].get(name, 0) / turns_a['totals'][turn] * 100:.2f}%"
+        if turns_b: text += f" / {turns_b[kind][turn].get(name, 0) / turns_b['totals'][turn] * 100:.2f}%"
+        return text
+
+    elements.append(Paragraph("Draw Schedule (Cumulative by Turn)", styles['h2']))
+    note = "Column headers give the cards seen by each turn. Each cell is the chance to have met the combo, or seen at least one copy of the card, by then."
+    if turns_b: note += " Cells show Deck A / Deck B."
+    elements.append(Paragraph(note, styles['Normal']))
+    for kind, title, label, names in (
+        ("combo_counts", "Combos by Turn", "Combo", set(card_combos) | set(turns_a["combo_counts"][-1]) | (set(turns_b["combo_counts"][-1]) if turns_b else set())),
+        ("card_counts", "Cards Seen by Turn", "Card", set(turns_a["card_counts"][-1]) | (set(turns_b["card_counts"][-1]) if turns_b else set())),
+    ):
+        rows = sorted(names, key=lambda name: turns_a[kind][-1].get(name, 0) / turns_a["totals"][-1], reverse=True)
+        data = [tuple([label] + headers)] + [tuple([name] + [cell(kind, turn, name) for turn in range(len(headers))]) for name in rows]
+        elements.append(Paragraph(title, styles['h3']))
+        elements.append(_create_pdf_table(data, col_widths, style))
+    elements.append(Spacer(1, 0.3 * inch))
+
+def _add_effects_section(elements, results_a, results_b, style, styles):
+    """Adds the resolved card effects and the share of hands each one resolved in."""
+    card_effects = dict(results_a.get("card_effects", {}))
+    if results_b: card_effects.update(results_b.get("card_effects", {}))
+    elements.append(Paragraph("Card Effects", styles['h2']))
+    elements.append(Paragraph("Combos were checked after resolving these effects over the shuffled deck; the other tables describe the opening hand as drawn.", styles['Normal']))
+    data = [("Card", "Effect", "Resolved (A)") + (("Resolved (B)",) if results_b else ())]
+    for card in sorted(card_effects):
+        row = [card, Paragraph(describe_card_effect(card_effects[card]), styles['BodyText'])]
+        for results in (results_a, results_b) if results_b else (results_a,):
+            row.append(f"{results.get('effect_counts', {}).get(card, 0) / results['total_simulations'] * 100:.2f}%" if card in results.get("card_effects", {}) else "n/a")
+        data.append(tuple(row))
+    elements.append(_create_pdf_table(data, [2.0 * inch, 3.0 * inch] + [0.9 * inch] * (len(data[0]) - 2), style))
+    elements.append(Spacer(1, 0.3 * inch))
+
+def build_report_tables(results_a, results_b, deck_list_a, deck_list_b, card_combos, max_table_rows=REPORT_MAX_TABLE_ROWS):
+    """
+    Computes the report's frequency tables (REPORT_SECTIONS) once, for every
+    output format (PDF, HTML, CSV). results_b is None for a single deck.
+
+    Each table is a dict with the section's "key", "title" and row "label",
+    "rows": (name, count A, share A, count B, share B) tuples with numeric
+    counts and shares (fractions of each deck's hands; 0 for B when single),
+    sorted numerically, "all_rows" (rows before folding) and "tail": None,
+    or for folded sections with more than max_table_rows rows, the
+    (rows folded, count A, share A, count B, share B) of the rest.
+    Cards of either deck and every defined combo always get a row.
+    """
+    total_a = results_a.get("total_simulations", 0); total_b = results_b.get("total_simulations", 0) if results_b else 0
+    always_listed = {"card_counts": set(deck_list_a) | set(deck_list_b or {}), "combo_counts": set(card_combos)}
+    tables = []
+    for key, title, label, order, fold in REPORT_SECTIONS:
+        counts_a = results_a.get(key, {}); counts_b = results_b.get(key, {}) if results_b else {}
+        rows = []
+        for name in sorted(always_listed.get(key, set()) | set(counts_a) | set(counts_b)): # One pass over both results; name order breaks ties
+            count_a = counts_a.get(name, 0); count_b = counts_b.get(name, 0)
+            rows.append((name, count_a, count_a / total_a if total_a else 0.0, count_b, count_b / total_b if total_b else 0.0))
+        if order == "share": rows.sort(key=lambda row: (row[2], row[4]), reverse=True)
+        table = {"key": key, "title": title, "label": label, "rows": rows, "all_rows": rows, "tail": None}
+        if fold and max_table_rows and len(rows) > max_table_rows:
+            table["rows"] = rows[:max_table_rows]
+            folded_a = sum(row[1] for row in rows[max_table_rows:]); folded_b = sum(row[3] for row in rows[max_table_rows:])
+            table["tail"] = (len(rows) - max_table_rows, folded_a, folded_a / total_a if total_a else 0.0, folded_b, folded_b / total_b if total_b else 0.0)
+        tables.append(table)
+    return tables
+
+def _format_table_row(row, is_comparison):
+    """Text cells of one report table row: name, then count and percentage per deck."""
+    name, count_a, share_a, count_b, share_b = row
+    cells = (name, str(count_a), f"{share_a * 100:.2f}%")
+    return cells + (str(count_b), f"{share_b * 100:.2f}%") if is_comparison else cells
+
+def _pdf_table_data(table, is_comparison):
+    """Header plus formatted rows of a build_report_tables table, the folded tail as an "Other (k rows, x%)" row."""
+    header = (table["label"], "Count (A)", "% (A)", "Count (B)", "% (B)") if is_comparison else (table["label"], "Count", "Percentage")
+    data = [header] + [_format_table_row(row, is_comparison) for row in table["rows"]]
+    if table["tail"]:
+        folded, count_a, share_a, count_b, share_b = table["tail"]
+        share = f"{share_a * 100:.2f}%" + (f" / {share_b * 100:.2f}%" if is_comparison else "")
+        data.append(_format_table_row((f"Other ({folded:,} rows, {share})", count_a, share_a, count_b, share_b), is_comparison))
+    return data
+
+def write_report_tables_csv(tables, path, is_comparison):
+    """
+    Writes build_report_tables tables (every row, none folded) to one CSV
+    of section, name and numeric count/share columns per deck.
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(("Section", "Name", "Count (A)", "Share (A)") + (("Count (B)", "Share (B)") if is_comparison else ()))
+        for table in tables:
+            for name, count_a, share_a, count_b, share_b in table["all_rows"]:
+                writer.writerow((table["title"], name, count_a, f"{share_a:.6f}") + ((count_b, f"{share_b:.6f}") if is_comparison else ()))
+
+def report_base_name(submitted_name_a, submitted_name_b, is_comparison, is_partial=False):
+    """The file name stem shared by a run's report and exported results, e.g. "comparison_x_vs_y_partial"."""
+    no_deck_a_placeholder = "deck_a"; no_deck_b_placeholder = "deck_b"
+    name_a = os.path.splitext(submitted_name_a)[0] if submitted_name_a != "No Deck Selected (A)" else no_deck_a_placeholder
+    base_filename = f"analysis_{name_a}"
+    if is_comparison:
+        name_b = os.path.splitext(submitted_name_b)[0] if submitted_name_b != "No Deck Selected (B)" else no_deck_b_placeholder
+        base_filename = f"comparison_{name_a}_vs_{name_b}"
+    if is_partial: base_filename += "_partial"
+    return base_filename
+
 def analyze_and_generate_pdf(
     results_a, results_b, deck_list_a, deck_list_b,
     submitted_name_a, submitted_name_b, is_comparison,
-    # Note: card_combos now contains BOTH hardcoded lambdas and custom dicts
+    # Note: card_combos now contains BOTH hardcoded and custom structured combos
     card_combos, combo_card_map, card_categories, simulation_queue,
-    deck_stats_a, deck_stats_b
+    deck_stats_a, deck_stats_b, max_table_rows=REPORT_MAX_TABLE_ROWS
 ):
-    """Analyzes results and generates PDF. Returns filename or None on failure."""
+    """
+    Analyzes results and generates PDF. Returns filename or None on failure.
+    The tables come from build_report_tables. Folded sections keep their
+    max_table_rows most frequent rows (None keeps all); the rest fold into
+    one "Other" row, and the full table is written to a CSV next to the PDF.
+    """
     if not results_a: simulation_queue.put(("error", "Analysis failed: Missing results A.")); return None
     if is_comparison and not results_b: simulation_queue.put(("error", "Analysis failed: Missing results B.")); return None
-    total_simulations = len(results_a.get("hands", []))
+    total_simulations = results_a.get("total_simulations", 0)
     if total_simulations == 0: simulation_queue.put(("error", "Analysis failed: Zero simulations recorded.")); return None
+    total_b = results_b.get("total_simulations", 0) if is_comparison else 0
+    if is_comparison and total_b == 0: simulation_queue.put(("error", "Analysis failed: Zero simulations recorded for B.")); return None
 
     # --- Filename Setup ---
-    no_deck_a_placeholder = "deck_a"; no_deck_b_placeholder = "deck_b"
-    name_a = os.path.splitext(submitted_name_a)[0] if submitted_name_a != "No Deck Selected (A)" else no_deck_a_placeholder
-    base_filename = f"analysis_{name_a}"
-    if is_comparison:
-        name_b = os.path.splitext(submitted_name_b)[0] if submitted_name_b != "No Deck Selected (B)" else no_deck_b_placeholder
-        base_filename = f"comparison_{name_a}_vs_{name_b}"
+    is_partial = bool(results_a.get("partial") or (is_comparison and results_b.get("partial")))
+    base_filename = report_base_name(submitted_name_a, submitted_name_b, is_comparison, is_partial)
     try:
-        output_dir = "analysis_reports"; os.makedirs(output_dir, exist_ok=True)
+        output_dir = REPORT_DIR; os.makedirs(output_dir, exist_ok=True)
         full_base_path = os.path.join(output_dir, base_filename)
         filename = get_unique_filename(full_base_path + ".pdf")
         doc = SimpleDocTemplate(filename, pagesize=letter)
@@ -309,10 +1762,20 @@ def analyze_and_generate_pdf(
 
     # --- PDF Content ---
     styles = getSampleStyleSheet(); elements = []
-    elements.append(Paragraph("Deck Analysis - Comparison" if is_comparison else "Deck Analysis", styles['h1']))
+    elements.append(Paragraph(("Deck Analysis - Comparison" if is_comparison else "Deck Analysis") + (" (Partial)" if is_partial else ""), styles['h1']))
+    if is_partial: elements.append(Paragraph("PARTIAL RESULTS: the run was cancelled, so every figure covers only the hands completed before it stopped.", styles['Normal']))
     elements.append(Paragraph(f"Deck A: {submitted_name_a}", styles['Normal']))
     if is_comparison: elements.append(Paragraph(f"Deck B: {submitted_name_b}", styles['Normal']))
-    elements.append(Paragraph(f"Simulations: {total_simulations:,}", styles['h3']))
+    if results_a.get("exact"):
+        exact_text = f"Exact analysis: all {total_simulations:,} possible hands (A)"
+        if is_comparison: exact_text += f", {total_b:,} (B)"
+        elements.append(Paragraph(exact_text, styles['h3']))
+    elif is_comparison and total_b != total_simulations: elements.append(Paragraph(f"Simulations: {total_simulations:,} (A), {total_b:,} (B)", styles['h3']))
+    else: elements.append(Paragraph(f"Simulations: {total_simulations:,}", styles['h3']))
+    seeds = [results.get("seed") for results in (results_a, results_b if is_comparison else None) if results and results.get("seed") is not None]
+    if seeds: elements.append(Paragraph(f"Seed: {seeds[0]}" if len(set(seeds)) == 1 else f"Seeds: {seeds[0]} (A), {seeds[1]} (B)", styles['Normal']))
+    schedule = results_a.get("draw_schedule")
+    if schedule: elements.append(Paragraph(f"Opening hand: {schedule['opening_hand']} cards, then {schedule['draws_per_turn']} drawn per turn over {schedule['turns']} turn(s)", styles['Normal']))
     elements.append(Spacer(1, 0.2 * inch))
 
     # --- Table Style and Widths ---
@@ -323,102 +1786,40 @@ def analyze_and_generate_pdf(
         ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey), ('GRID', (0, 0), (-1, -1), 1, colors.black),
         ('FONTSIZE', (0, 0), (-1, -1), 8), ('LEFTPADDING', (0,0), (-1,-1), 4), ('RIGHTPADDING', (0,0),(-1,-1),4),
     ])
-    comp_cols = [2.5*inch, 0.8*inch, 0.7*inch, 0.8*inch, 0.7*inch]
-    single_cols = [3.5*inch, 1.0*inch, 1.2*inch]
-    comp_comp_cols = [1.5*inch, 0.9*inch, 0.8*inch, 0.9*inch, 0.8*inch]
-    single_comp_cols = [2.0*inch, 1.5*inch, 1.5*inch]
-    cat_freq_comp_cols = [2.5*inch, 0.8*inch, 0.7*inch, 0.8*inch, 0.7*inch]
-    cat_freq_single_cols = [3.5*inch, 1.0*inch, 1.2*inch]
-    cat_comp_comp_cols = [3.0*inch, 0.8*inch, 0.7*inch, 0.8*inch, 0.7*inch]
-    cat_comp_single_cols = [4.0*inch, 1.0*inch, 1.2*inch]
+    section_widths = { # Result key -> (comparison, single deck) column widths
+        "hand_composition_counts": ([1.5*inch, 0.9*inch, 0.8*inch, 0.9*inch, 0.8*inch], [2.0*inch, 1.5*inch, 1.5*inch]),
+        "hand_category_composition_counts": ([3.0*inch, 0.8*inch, 0.7*inch, 0.8*inch, 0.7*inch], [4.0*inch, 1.0*inch, 1.2*inch]),
+    }
+    default_widths = ([2.5*inch, 0.8*inch, 0.7*inch, 0.8*inch, 0.7*inch], [3.5*inch, 1.0*inch, 1.2*inch])
 
     # --- Generate Tables ---
     try:
-        # Card Frequency (Unchanged)
-        data = [("Card", "Count (A)", "% (A)", "Count (B)", "% (B)")] if is_comparison else [("Card", "Count", "Percentage")]
-        counts_a = results_a.get("card_counts", Counter()); all_cards = set(deck_list_a.keys())
-        if is_comparison: all_cards.update(deck_list_b.keys())
-        temp_data = []
-        for card in sorted(list(all_cards)):
-            c_a = counts_a.get(card, 0); p_a = (c_a / total_simulations) * 100
-            if is_comparison:
-                counts_b = results_b.get("card_counts", Counter()); c_b = counts_b.get(card, 0); p_b = (c_b / total_simulations) * 100
-                temp_data.append((card, str(c_a), f"{p_a:.2f}%", str(c_b), f"{p_b:.2f}%"))
-            else: temp_data.append((card, str(c_a), f"{p_a:.2f}%"))
-        temp_data.sort(key=lambda x: float(x[2].rstrip('%')), reverse=True); data.extend(temp_data)
-        _add_pdf_section(elements, "Individual Card Frequency", data, comp_cols if is_comparison else single_cols, common_style, styles)
-
-        # Combo Frequency (Now includes custom combos passed in card_combos)
-        data = [("Combo", "Count (A)", "% (A)", "Count (B)", "% (B)")] if is_comparison else [("Combo", "Count", "Percentage")]
-        combos_a = results_a.get("combo_counts", Counter())
-        all_defined = set(card_combos.keys()) # Use keys from the passed dict
-        all_defined.update(combos_a.keys())
-        if is_comparison: all_defined.update(results_b.get("combo_counts", Counter()).keys())
-        temp_data = []
-        for combo in sorted(list(all_defined)):
-            c_a = combos_a.get(combo, 0); p_a = (c_a / total_simulations) * 100
-            if is_comparison:
-                combos_b = results_b.get("combo_counts", Counter()); c_b = combos_b.get(combo, 0); p_b = (c_b / total_simulations) * 100
-                temp_data.append((combo, str(c_a), f"{p_a:.2f}%", str(c_b), f"{p_b:.2f}%"))
-            else: temp_data.append((combo, str(c_a), f"{p_a:.2f}%"))
-        temp_data.sort(key=lambda x: float(x[2].rstrip('%')), reverse=True); data.extend(temp_data)
-        _add_pdf_section(elements, "Combo Frequency", data, comp_cols if is_comparison else single_cols, common_style, styles)
-
-        # Duplicate Frequency (Unchanged)
-        data = [("Card", "Count (A)", "% (A)", "Count (B)", "% (B)")] if is_comparison else [("Card", "Count", "Percentage")]
-        dupes_a = results_a.get("duplicate_counts", Counter()); all_dupes = set(dupes_a.keys())
-        if is_comparison: all_dupes.update(results_b.get("duplicate_counts", Counter()).keys())
-        temp_data = []
-        for card in sorted(list(all_dupes)):
-            c_a = dupes_a.get(card, 0); p_a = (c_a / total_simulations) * 100
-            if is_comparison:
-                dupes_b = results_b.get("duplicate_counts", Counter()); c_b = dupes_b.get(card, 0); p_b = (c_b / total_simulations) * 100
-                temp_data.append((card, str(c_a), f"{p_a:.2f}%", str(c_b), f"{p_b:.2f}%"))
-            else: temp_data.append((card, str(c_a), f"{p_a:.2f}%"))
-        temp_data.sort(key=lambda x: float(x[2].rstrip('%')), reverse=True); data.extend(temp_data)
-        _add_pdf_section(elements, "Duplicate Card Frequency (Opening Hand)", data, comp_cols if is_comparison else single_cols, common_style, styles)
-
-        # Hand Composition (M/S/T) (Unchanged)
-        data = [("Composition", "Count (A)", "% (A)", "Count (B)", "% (B)")] if is_comparison else [("Composition", "Count", "Percentage")]
-        comp_a = results_a.get("hand_composition_counts", Counter()); all_comps = set(comp_a.keys())
-        if is_comparison: all_comps.update(results_b.get("hand_composition_counts", Counter()).keys())
-        temp_data = []
-        for comp in sorted(list(all_comps)):
-            c_a = comp_a.get(comp, 0); p_a = (c_a / total_simulations) * 100
-            if is_comparison:
-                comp_b = results_b.get("hand_composition_counts", Counter()); c_b = comp_b.get(comp, 0); p_b = (c_b / total_simulations) * 100
-                temp_data.append((comp, str(c_a), f"{p_a:.2f}%", str(c_b), f"{p_b:.2f}%"))
-            else: temp_data.append((comp, str(c_a), f"{p_a:.2f}%"))
-        temp_data.sort(key=lambda x: float(x[2].rstrip('%')), reverse=True); data.extend(temp_data)
-        _add_pdf_section(elements, "Opening Hand Composition (M/S/T)", data, comp_comp_cols if is_comparison else single_comp_cols, common_style, styles)
-
-        # Individual Category Frequency (Unchanged)
-        data = [("Category", "Count (A)", "% (A)", "Count (B)", "% (B)")] if is_comparison else [("Category", "Count", "Percentage")]
-        cats_a = results_a.get("category_counts", Counter()); all_cats = set(cats_a.keys())
-        if is_comparison: all_cats.update(results_b.get("category_counts", Counter()).keys())
-        temp_data = []
-        for cat in sorted(list(all_cats)):
-            c_a = cats_a.get(cat, 0); p_a = (c_a / total_simulations) * 100
-            if is_comparison:
-                cats_b = results_b.get("category_counts", Counter()); c_b = cats_b.get(cat, 0); p_b = (c_b / total_simulations) * 100
-                temp_data.append((cat, str(c_a), f"{p_a:.2f}%", str(c_b), f"{p_b:.2f}%"))
-            else: temp_data.append((cat, str(c_a), f"{p_a:.2f}%"))
-        temp_data.sort(key=lambda x: x[0]); data.extend(temp_data)
-        _add_pdf_section(elements, "Individual Category Frequency (Avg per Hand)", data, cat_freq_comp_cols if is_comparison else cat_freq_single_cols, common_style, styles)
-
-        # Hand Category Composition (Unchanged)
-        data = [("Category Composition", "Count (A)", "% (A)", "Count (B)", "% (B)")] if is_comparison else [("Category Composition", "Count", "Percentage")]
-        cat_comp_a = results_a.get("hand_category_composition_counts", Counter()); all_cat_comps = set(cat_comp_a.keys())
-        if is_comparison: all_cat_comps.update(results_b.get("hand_category_composition_counts", Counter()).keys())
-        temp_data = []
-        for comp_key in sorted(list(all_cat_comps)):
-            c_a = cat_comp_a.get(comp_key, 0); p_a = (c_a / total_simulations) * 100
-            if is_comparison:
-                cat_comp_b = results_b.get("hand_category_composition_counts", Counter()); c_b = cat_comp_b.get(comp_key, 0); p_b = (c_b / total_simulations) * 100
-                temp_data.append((comp_key, str(c_a), f"{p_a:.2f}%", str(c_b), f"{p_b:.2f}%"))
-            else: temp_data.append((comp_key, str(c_a), f"{p_a:.2f}%"))
-        temp_data.sort(key=lambda x: float(x[2].rstrip('%')), reverse=True); data.extend(temp_data)
-        _add_pdf_section(elements, "Hand Category Composition", data, cat_comp_comp_cols if is_comparison else cat_comp_single_cols, common_style, styles)
+        tables = build_report_tables(results_a, results_b if is_comparison else None, deck_list_a, deck_list_b if is_comparison else {}, card_combos, max_table_rows)
+        for table in tables:
+            title = table["title"]
+            if table["tail"]:
+                side_file = f"{os.path.splitext(filename)[0]}_{table['key'].replace('_counts', 's')}.csv"
+                try: write_report_tables_csv([table], side_file, is_comparison)
+                except OSError as e: print(f"Warning: Could not write full table '{side_file}': {e}"); side_file = None
+                title += f" (Top {len(table['rows'])} of {len(table['all_rows']):,}" + (f"; full table in {os.path.basename(side_file)})" if side_file else ")")
+            comparison_widths, single_widths = section_widths.get(table["key"], default_widths)
+            _add_pdf_section(elements, title, _pdf_table_data(table, is_comparison), comparison_widths if is_comparison else single_widths, common_style, styles)
+
+            if table["key"] == "combo_counts":
+                # Card effects (runs that resolved effects before combo checks)
+                if results_a.get("card_effects") or (is_comparison and results_b.get("card_effects")):
+                    _add_effects_section(elements, results_a, results_b if is_comparison else None, common_style, styles)
+                # Per-turn cumulative stats (draw-schedule runs only)
+                if results_a.get("turns"):
+                    _add_turns_section(elements, results_a, results_b if is_comparison else None, card_combos, common_style, styles)
+
+        # Achieved Precision (adaptive runs only)
+        if results_a.get("precision") or (is_comparison and results_b.get("precision")):
+            _add_precision_section(elements, results_a, results_b if is_comparison else None, common_style, styles)
+
+        # Paired Differences (common random numbers runs only)
+        if is_comparison and results_a.get("paired"):
+            _add_paired_section(elements, results_a, results_b, common_style, styles)
 
     except Exception as e:
         elements.append(Paragraph(f"Error generating report tables: {e}", styles['Normal']))
@@ -449,6 +1850,8 @@ def analyze_and_generate_pdf(
         return filename # Return filename on success
     except Exception as e:
         simulation_queue.put(("error", f"Failed to build PDF document '{filename}': {e}"))
+        try: os.remove(filename) # Drop the reserved (empty or half-written) file
+        except OSError: pass
         return None # Return None on failure
 
 # --- Insight Generation Logic ---
@@ -457,6 +1860,7 @@ def generate_insights(results_a, results_b, deck_list_a, deck_list_b, total_simu
     """Generates textual insights comparing two simulation results."""
     insights = [];
     if total_simulations == 0: return ["No simulations run."]
+    total_b = results_b.get("total_simulations", total_simulations) or total_simulations
     results_a_combos = results_a.get("combo_counts", Counter()); results_b_combos = results_b.get("combo_counts", Counter())
 
     # --- Combo Insights (Uses combined hardcoded + custom combo keys) ---
@@ -464,11 +1868,15 @@ def generate_insights(results_a, results_b, deck_list_a, deck_list_b, total_simu
     combos_to_analyze = sorted(list(all_defined_combos | all_found_combos))
     for combo in combos_to_analyze:
         count_a = results_a_combos.get(combo, 0); percentage_a = (count_a / total_simulations) * 100
-        count_b = results_b_combos.get(combo, 0); percentage_b = (count_b / total_simulations) * 100
+        count_b = results_b_combos.get(combo, 0); percentage_b = (count_b / total_b) * 100
         better_list, worse_list, better_label, worse_label = None, None, None, None
-        if abs(percentage_a - percentage_b) < 0.01: insights.append(f"'{combo}': Similar draw chance ({percentage_a:.2f}%).")
-        elif percentage_a > percentage_b: better_list, worse_list, better_label, worse_label = deck_list_a, deck_list_b, "A", "B"; insights.append(f"'{combo}': Deck A higher ({percentage_a:.2f}%) vs Deck B ({percentage_b:.2f}%).")
-        else: better_list, worse_list, better_label, worse_label = deck_list_b, deck_list_a, "B", "A"; insights.append(f"'{combo}': Deck B higher ({percentage_b:.2f}%) vs Deck A ({percentage_a:.2f}%).")
+        paired_note = ""
+        if results_a.get("paired"):
+            difference, paired_se = paired_difference(*results_a["paired"]["combo_counts"].get(combo, (0, 0)), results_a["paired"]["hands"])
+            paired_note = f" Paired diff {difference * 100:+.2f}% ± {paired_se * 100:.2f}% (SE)."
+        if abs(percentage_a - percentage_b) < 0.01: insights.append(f"'{combo}': Similar draw chance ({percentage_a:.2f}%).{paired_note}")
+        elif percentage_a > percentage_b: better_list, worse_list, better_label, worse_label = deck_list_a, deck_list_b, "A", "B"; insights.append(f"'{combo}': Deck A higher ({percentage_a:.2f}%) vs Deck B ({percentage_b:.2f}%).{paired_note}")
+        else: better_list, worse_list, better_label, worse_label = deck_list_b, deck_list_a, "B", "A"; insights.append(f"'{combo}': Deck B higher ({percentage_b:.2f}%) vs Deck A ({percentage_a:.2f}%).{paired_note}")
         # Recommendations only work for hardcoded combos until combo_card_map is dynamic
         if better_list is not None and combo in combo_card_map:
             recs = get_combo_recommendations(combo, better_list, worse_list, better_label, worse_label, combo_card_map)
@@ -481,7 +1889,7 @@ def generate_insights(results_a, results_b, deck_list_a, deck_list_b, total_simu
     all_cats = sorted(list(set(results_a_cats.keys()) | set(results_b_cats.keys())))
     for cat in all_cats:
         count_a = results_a_cats.get(cat, 0); percentage_a = (count_a / total_simulations) * 100
-        count_b = results_b_cats.get(cat, 0); percentage_b = (count_b / total_simulations) * 100
+        count_b = results_b_cats.get(cat, 0); percentage_b = (count_b / total_b) * 100
         if abs(percentage_a - percentage_b) < 0.1: insights.append(f"'{cat}': Similar avg frequency (~{percentage_a:.2f}%).")
         elif percentage_a > percentage_b: insights.append(f"'{cat}': Deck A higher avg ({percentage_a:.2f}%) vs Deck B ({percentage_b:.2f}%).")
         else: insights.append(f"'{cat}': Deck B higher avg ({percentage_b:.2f}%) vs Deck A ({percentage_a:.2f}%).")
@@ -0,0 +1,55 @@
+# card_registry.py
+# Interned card IDs: every card gets a small integer, and per-card data lives in tables indexed by it.
+
+from collections import Counter
+
+TYPE_CODES = {"MONSTER": 0, "SPELL": 1, "TRAP": 2}
+UNKNOWN_TYPE_CODE = 3
+
+class CardRegistry:
+    """
+    Interns card names to small integer IDs (0, 1, ... in pool order) and keeps
+    per-card data in lists indexed by ID: type_codes (TYPE_CODES, else
+    UNKNOWN_TYPE_CODE), category_ids (indices into categories) and bits
+    (1 << ID, the card's bit in combo membership masks).
+
+    Cards outside the pool, e.g. from an older deck file, are interned on
+    first use with their type and categories looked up the same way.
+    """
+
+    def __init__(self, card_pool=(), card_types=None, card_categories=None):
+        self.card_types = card_types or {}
+        self.card_categories = card_categories or {}
+        self.names, self.ids = [], {}
+        self.type_codes, self.category_ids, self.bits = [], [], []
+        self.categories, self.category_index = [], {}
+        for card in card_pool: self.intern(card)
+
+    def intern(self, card):
+        """Returns card's ID, registering the card first if it is new."""
+        card_id = self.ids.get(card)
+        if card_id is None:
+            card_id = self.ids[card] = len(self.names)
+            self.names.append(card)
+            self.type_codes.append(TYPE_CODES.get(self.card_types.get(card, "UNKNOWN"), UNKNOWN_TYPE_CODE))
+            self.category_ids.append(tuple(self._intern_category(category) for category in sorted(self.card_categories.get(card, []))))
+            self.bits.append(1 << card_id)
+        return card_id
+
+    def _intern_category(self, category):
+        if category not in self.category_index:
+            self.category_index[category] = len(self.categories); self.categories.append(category)
+        return self.category_index[category]
+
+    def encode_deck(self, deck_list):
+        """Expands a deck dict into a list of card IDs, one entry per copy."""
+        return [self.intern(card) for card, quantity in deck_list.items() for _ in range(quantity)]
+
+    def card_bits(self, cards):
+        """Card name -> bit for the given cards, the form compile_combos expects."""
+        return {card: self.bits[self.intern(card)] for card in cards}
+
+    def decode_counts(self, totals, names=None):
+        """Turns per-ID counts (a list indexed by ID, or a dict keyed by it) into a Counter keyed by name; pass names=self.categories for category counts."""
+        names = self.names if names is None else names
+        return Counter({names[i]: count for i, count in (totals.items() if isinstance(totals, dict) else enumerate(totals)) if count})
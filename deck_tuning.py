@@ -0,0 +1,278 @@
+# deck_tuning.py
+# Ratio sweeps and the ratio optimizer: searching per-card copy counts around a base deck.
+
+import csv
+import math
+import time
+import random
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Optional: NumPy powers the optimizer's closed-form evaluation
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import analysis_engine
+import result_cache
+
+SWEEP_ENGINES = ("exact", "numpy")
+SWEEP_CHUNK_SIZE = 8 # Decks per worker task with the exact engine
+
+def expand_sweep(base_deck, card_ranges, min_deck_size=analysis_engine.MIN_DECK_SIZE, max_deck_size=analysis_engine.MAX_DECK_SIZE):
+    """
+    Returns (counts, deck) for every deck obtained by setting each swept card
+    to each copy count in its inclusive (low, high) range. counts maps the
+    swept cards to their copies; decks outside the size limits are skipped.
+    """
+    cards = sorted(card_ranges)
+    for card in cards:
+        low, high = card_ranges[card]
+        if not 0 <= low <= high <= analysis_engine.MAX_CARD_COPIES:
+            raise ValueError(f"Invalid range {low}-{high} for '{card}' (copies must be 0-{analysis_engine.MAX_CARD_COPIES}).")
+    variants = []
+    for copies in itertools.product(*(range(card_ranges[card][0], card_ranges[card][1] + 1) for card in cards)):
+        deck = dict(base_deck); deck.update(zip(cards, copies))
+        deck = {card: quantity for card, quantity in deck.items() if quantity > 0}
+        if min_deck_size <= sum(deck.values()) <= max_deck_size: variants.append((dict(zip(cards, copies)), deck))
+    return variants
+
+class _DiscardQueue:
+    """Stands in for the status queue inside sweep workers, where per-deck messages would only be noise."""
+    def put(self, message): pass
+
+def _evaluate_exact_chunk(decks, card_combos, card_categories, card_types=None):
+    """Worker entry point: exact results for a list of decks."""
+    silent_queue = _DiscardQueue()
+    return [analysis_engine.run_simulation(0, deck, "Sweep", card_combos, card_categories, silent_queue, engine="exact", card_types=card_types) for deck in decks]
+
+def run_sweep(base_deck, card_ranges, card_combos, card_categories, simulation_queue, engine="exact", num_simulations=100000, workers=1, seed=None, card_types=None, cache_dir=None):
+    """
+    Evaluates every deck from expand_sweep and returns one row per deck:
+    {"counts", "deck_size", "total_simulations", "combo_rates"} (rates are proportions),
+    plus "seed" for sampled sweeps.
+
+    "exact" computes each deck exactly, spread over workers processes; with
+    cache_dir set, decks already computed in an earlier sweep are read from the
+    result cache. "numpy" deals every deck from one shared stream of random
+    numbers (common random numbers), so the keys are drawn once per batch and
+    differences between rows are far less noisy than separate runs; workers
+    split the decks, not the hands, so every worker deals identical hands.
+    Pass the seed back in to repeat a sampled sweep; left out, a fresh one is
+    drawn (analysis_engine.new_seed) and reported.
+    Returns None if the sweep fails.
+    """
+    if engine not in SWEEP_ENGINES:
+        simulation_queue.put(("error", f"Unknown sweep engine '{engine}'.")); return None
+    try: variants = expand_sweep(base_deck, card_ranges)
+    except ValueError as e: simulation_queue.put(("error", str(e))); return None
+    if not variants:
+        simulation_queue.put(("error", "No deck in the sweep has a legal size.")); return None
+    decks = [deck for _, deck in variants]
+    combos = analysis_engine._picklable_combos(card_combos)
+    card_types = card_types or analysis_engine.CARD_TYPES
+    if engine != "exact": seed = analysis_engine.new_seed() if seed is None else seed
+    simulation_queue.put(("status", f"Sweeping {len(decks)} decks ({engine}" + (f", seed {seed}" if engine != "exact" else "") + ")..."))
+
+    if engine == "exact":
+        results = [None] * len(decks); keys = [None] * len(decks)
+        if cache_dir:
+            for i, deck in enumerate(decks):
+                keys[i] = result_cache.make_cache_key(deck, card_types, combos, card_categories, None, engine="exact")
+                results[i] = result_cache.load_cached_results(keys[i], cache_dir)
+        pending = [i for i, result in enumerate(results) if result is None]
+        chunks = [pending[start:start + SWEEP_CHUNK_SIZE] for start in range(0, len(pending), SWEEP_CHUNK_SIZE)]
+        done = len(decks) - len(pending)
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_evaluate_exact_chunk, [decks[i] for i in chunk], combos, card_categories, card_types): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    try: chunk_results = future.result()
+                    except Exception as e: simulation_queue.put(("error", f"Sweep worker failed: {e}")); return None
+                    for i, result in zip(futures[future], chunk_results): results[i] = result
+                    done += len(futures[future]); simulation_queue.put(("status", f"Sweep: {done}/{len(decks)} decks evaluated..."))
+        else:
+            for chunk in chunks:
+                for i, result in zip(chunk, _evaluate_exact_chunk([decks[i] for i in chunk], combos, card_categories, card_types)): results[i] = result
+                done += len(chunk); simulation_queue.put(("status", f"Sweep: {done}/{len(decks)} decks evaluated..."))
+        if cache_dir:
+            for i in pending: result_cache.store_cached_results(keys[i], results[i], cache_dir)
+    else:
+        universe = {card: max(deck.get(card, 0) for deck in decks) for card in set().union(*decks)}
+        groups = [decks[i::workers] for i in range(min(workers, len(decks)))]
+        progress = lambda hands: simulation_queue.put(("status", f"Sweep: {hands / num_simulations * 100:.0f}% of {num_simulations:,} hands dealt to {len(decks)} decks..."))
+        if len(groups) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(analysis_engine.run_common_simulation, num_simulations, group, combos, card_categories, _DiscardQueue(), seed, universe, None, card_types) for group in groups]
+                try: group_results = [future.result() for future in futures]
+                except Exception as e: simulation_queue.put(("error", f"Sweep worker failed: {e}")); return None
+        else:
+            group_results = [analysis_engine.run_common_simulation(num_simulations, decks, combos, card_categories, simulation_queue, seed, universe, progress, card_types)]
+        if any(group is None for group in group_results):
+            simulation_queue.put(("error", "Sweep simulation failed.")); return None
+        results = [None] * len(decks)
+        for offset, group in enumerate(group_results): results[offset::workers] = group
+
+    rows = []
+    for (counts, deck), result in zip(variants, results):
+        total = result["total_simulations"]
+        rows.append({"counts": counts, "deck_size": sum(deck.values()), "total_simulations": total,
+                     "combo_rates": {combo_name: result["combo_counts"].get(combo_name, 0) / total for combo_name in combos}})
+        if engine != "exact": rows[-1]["seed"] = seed
+    return rows
+
+def write_sweep_csv(rows, path):
+    """Writes sweep rows as CSV: swept card counts, deck size, then one % column per combo."""
+    if not rows: return
+    cards = list(rows[0]["counts"]); combo_names = list(rows[0]["combo_rates"])
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(cards + ["Deck Size"] + [f"{combo_name} (%)" for combo_name in combo_names])
+        for row in rows:
+            writer.writerow([row["counts"][card] for card in cards] + [row["deck_size"]] + [f"{row['combo_rates'][combo_name] * 100:.4f}" for combo_name in combo_names])
+
+# --- Ratio Optimizer ---
+
+OPTIMIZER_ITERATIONS = 60000
+OPTIMIZER_START_TEMPERATURE = 0.01 # Relative to the total objective weight
+OPTIMIZER_END_TEMPERATURE = 0.00001
+MAX_COMBO_REQUIREMENTS = 12 # Inclusion-exclusion cost doubles with every requirement
+
+def compile_combo_probabilities(card_combos, cards):
+    """
+    Prepares exact combo probabilities as a function of copy counts, using the
+    inclusion-exclusion terms of analysis_engine.combo_requirement_terms:
+    P = sum(sign * C(N - copies in union, 5)) / C(N, 5).
+    Returns (combo_names, membership, signs, owners): one membership row over
+    cards per term, its sign, and the index of the combo it belongs to.
+    """
+    card_index = {card: i for i, card in enumerate(cards)}
+    combo_names, rows, signs, owners = [], [], [], []
+    for combo_name, definition in card_combos.items():
+        if not isinstance(definition, dict):
+            print(f"Warning: Combo '{combo_name}' has no structured definition and is left out of the optimizer."); continue
+        if len(definition.get("must_have", [])) + len(definition.get("need_one_groups", [])) > MAX_COMBO_REQUIREMENTS:
+            print(f"Warning: Combo '{combo_name}' has too many requirements for exact optimization, skipping."); continue
+        owner = len(combo_names); combo_names.append(combo_name)
+        for sign, union in analysis_engine.combo_requirement_terms(definition):
+            row = np.zeros(len(cards), dtype=np.int64)
+            for card in union:
+                if card in card_index: row[card_index[card]] = 1
+            rows.append(row); signs.append(sign); owners.append(owner)
+    membership = np.array(rows).reshape(len(rows), len(cards))
+    return combo_names, membership, np.array(signs, dtype=float), np.array(owners, dtype=np.int64)
+
+def combo_probabilities(compiled, quantities, deck_size):
+    """Exact probabilities of every compiled combo for the given copy counts (aligned with its cards) and deck size."""
+    combo_names, membership, signs, owners = compiled
+    hands = _hands_table(deck_size)
+    terms = signs * hands[deck_size - membership @ quantities] / hands[deck_size]
+    return np.clip(np.bincount(owners, weights=terms, minlength=len(combo_names)), 0.0, 1.0) # Clip float rounding
+
+_HANDS_TABLE = []
+def _hands_table(deck_size):
+    """C(n, 5) for n = 0..deck_size (at least), as floats."""
+    global _HANDS_TABLE
+    if len(_HANDS_TABLE) <= deck_size: _HANDS_TABLE = np.array([math.comb(n, 5) for n in range(max(deck_size, analysis_engine.MAX_DECK_SIZE) + 1)], dtype=float)
+    return _HANDS_TABLE
+
+def optimize_deck(card_pool, card_combos, weights, simulation_queue, base_deck=None, required=None,
+                  min_deck_size=analysis_engine.MIN_DECK_SIZE, max_deck_size=analysis_engine.MAX_DECK_SIZE, max_copies=analysis_engine.MAX_CARD_COPIES,
+                  iterations=OPTIMIZER_ITERATIONS, seed=None):
+    """
+    Searches copy counts that maximize sum(weight * P(combo)) over the combos in
+    weights, by simulated annealing followed by a greedy polish.
+
+    Only pool cards named in a weighted combo ("engine" cards) change the
+    objective; every other card is filler that only sets the deck size.
+    required maps cards to minimum copies. The returned deck holds the engine
+    cards, the required cards, and base_deck's other cards (largest counts
+    first) as filler; open_slots counts filler slots base_deck could not fill.
+
+    Candidates are scored exactly in closed form and memoized, so thousands
+    are evaluated per second. Returns {"deck", "open_slots", "probabilities",
+    "base_probabilities", "score", "evaluations", "evaluations_per_second"},
+    or None on failure.
+    """
+    if np is None:
+        simulation_queue.put(("error", "The optimizer requires numpy ('pip install numpy').")); return None
+    required = {card: quantity for card, quantity in (required or {}).items() if quantity > 0}
+    weighted = {combo_name: card_combos[combo_name] for combo_name, weight in weights.items() if weight and combo_name in card_combos}
+    pool = set(card_pool)
+    engine_cards = sorted({card for definition in weighted.values() if isinstance(definition, dict)
+                           for card in definition.get("must_have", []) + [card for group in definition.get("need_one_groups", []) for card in group]} & pool)
+    if not engine_cards:
+        simulation_queue.put(("error", "None of the weighted combos uses a card from the pool.")); return None
+    compiled = compile_combo_probabilities(weighted, engine_cards)
+    weight_vector = np.array([weights[combo_name] for combo_name in compiled[0]], dtype=float)
+    low = np.array([min(required.get(card, 0), max_copies) for card in engine_cards]); high = np.full(len(engine_cards), max_copies)
+    fixed_filler = sum(quantity for card, quantity in required.items() if card not in engine_cards)
+    if low.sum() + fixed_filler > max_deck_size:
+        simulation_queue.put(("error", "The required cards alone exceed the maximum deck size.")); return None
+
+    memo = {}
+    def score(quantities, deck_size):
+        key = (quantities.tobytes(), deck_size)
+        if key not in memo: memo[key] = float(weight_vector @ combo_probabilities(compiled, quantities, deck_size))
+        return memo[key]
+    def feasible(quantities, deck_size, changed):
+        return (min_deck_size <= deck_size <= max_deck_size and quantities.sum() + fixed_filler <= deck_size
+                and all(low[k] <= quantities[k] <= high[k] for k in changed))
+
+    # Start from base_deck's engine counts (clamped to the limits)
+    quantities = np.clip(np.array([(base_deck or {}).get(card, 0) for card in engine_cards]), low, high)
+    deck_size = min(max(sum((base_deck or {}).values()), min_deck_size, int(quantities.sum()) + fixed_filler), max_deck_size)
+    while quantities.sum() + fixed_filler > deck_size: quantities[np.flatnonzero(quantities > low)[0]] -= 1
+    current = score(quantities, deck_size); best = (current, quantities.copy(), deck_size)
+
+    rng = random.Random(seed)
+    total_weight = float(np.abs(weight_vector).sum()) or 1.0
+    start_temperature, end_temperature = OPTIMIZER_START_TEMPERATURE * total_weight, OPTIMIZER_END_TEMPERATURE * total_weight
+    started = time.perf_counter()
+    for step in range(iterations):
+        temperature = start_temperature * (end_temperature / start_temperature) ** (step / max(iterations - 1, 1))
+        candidate = quantities.copy(); candidate_size = deck_size
+        move = rng.randrange(3); i, j = rng.randrange(len(engine_cards)), rng.randrange(len(engine_cards))
+        if move == 0: candidate[i] += rng.choice((-1, 1)) # Change one card (filler absorbs it)
+        elif move == 1: candidate[i] -= 1; candidate[j] += 1 # Swap one copy for another card
+        else: candidate_size += rng.choice((-1, 1)) # Grow or shrink the deck
+        if not feasible(candidate, candidate_size, (i, j)): continue
+        candidate_score = score(candidate, candidate_size)
+        if candidate_score >= current or rng.random() < math.exp((candidate_score - current) / temperature):
+            quantities, deck_size, current = candidate, candidate_size, candidate_score
+            if current > best[0]: best = (current, quantities.copy(), deck_size)
+        if step % 2000 == 0: simulation_queue.put(("status", f"Optimizing... {step / iterations * 100:.0f}% (best score {best[0]:.4f})"))
+
+    # Greedy polish: take the best single change or swap until none improves
+    best_score, quantities, deck_size = best
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(engine_cards)):
+            for j in list(range(len(engine_cards))) + [None]:
+                for size_change in (-1, 0, 1):
+                    candidate = quantities.copy(); candidate_size = deck_size + size_change
+                    if j is None: candidate[i] += 1 if size_change >= 0 else -1
+                    elif i == j: continue
+                    else: candidate[i] -= 1; candidate[j] += 1
+                    if not feasible(candidate, candidate_size, (i, j) if j is not None else (i,)): continue
+                    candidate_score = score(candidate, candidate_size)
+                    if candidate_score > best_score + 1e-12: best_score, quantities, deck_size, improved = candidate_score, candidate, candidate_size, True
+    elapsed = time.perf_counter() - started
+
+    deck = {card: int(quantity) for card, quantity in zip(engine_cards, quantities) if quantity > 0}
+    for card, quantity in required.items(): deck[card] = max(deck.get(card, 0), min(quantity, max_copies))
+    open_slots = deck_size - sum(deck.values())
+    for card, quantity in sorted((base_deck or {}).items(), key=lambda item: (-item[1], item[0])):
+        if open_slots <= 0: break
+        if card in deck or card in engine_cards: continue
+        deck[card] = min(quantity, open_slots); open_slots -= deck[card]
+
+    base_probabilities = None
+    if base_deck and min_deck_size <= sum(base_deck.values()):
+        base_quantities = np.array([base_deck.get(card, 0) for card in engine_cards])
+        base_probabilities = dict(zip(compiled[0], combo_probabilities(compiled, base_quantities, sum(base_deck.values())).tolist()))
+    return {"deck": deck, "open_slots": open_slots, "score": best_score,
+            "probabilities": dict(zip(compiled[0], combo_probabilities(compiled, quantities, deck_size).tolist())), "base_probabilities": base_probabilities,
+            "evaluations": len(memo), "evaluations_per_second": len(memo) / elapsed if elapsed else 0.0}
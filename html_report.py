@@ -0,0 +1,113 @@
+# html_report.py
+# Single-file HTML report: the report tables as embedded JSON, sorted and filtered in the browser (no ReportLab).
+
+import os
+import html
+import json
+
+import analysis_engine
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; margin: 2em; color: #222; }}
+h1 {{ margin-bottom: 0.2em; }} .meta {{ margin: 0.1em 0; }} .partial {{ color: #a00; font-weight: bold; }}
+section {{ margin-top: 2em; }} input {{ margin: 0.4em 0; padding: 0.2em; width: 20em; }}
+table {{ border-collapse: collapse; font-size: 0.85em; }} th, td {{ border: 1px solid #444; padding: 0.2em 0.6em; }}
+th {{ background: #2f4f4f; color: #f5f5f5; cursor: pointer; user-select: none; }} td.num {{ text-align: right; }}
+tr:nth-child(even) td {{ background: #eee; }} .count {{ color: #666; font-size: 0.85em; }}
+</style></head><body>
+<h1>{title}</h1>
+{header}
+<div id="tables"></div>
+{insights}
+<script type="application/json" id="report-data">{data}</script>
+<script>
+(function () {{
+  var report = JSON.parse(document.getElementById("report-data").textContent);
+  var container = document.getElementById("tables");
+  var pct = function (share) {{ return (share * 100).toFixed(2) + "%"; }};
+  report.tables.forEach(function (table) {{
+    var section = document.createElement("section");
+    var columns = [table.label].concat(report.comparison ? ["Count (A)", "% (A)", "Count (B)", "% (B)"] : ["Count", "Percentage"]);
+    var fields = report.comparison ? [0, 1, 2, 3, 4] : [0, 1, 2];
+    section.innerHTML = "<h2></h2><input type='search' placeholder='Filter rows...'><span class='count'></span><table><thead><tr></tr></thead><tbody></tbody></table>";
+    section.querySelector("h2").textContent = table.title;
+    var headRow = section.querySelector("tr"), body = section.querySelector("tbody"), filter = section.querySelector("input"), count = section.querySelector(".count");
+    var sortField = null, descending = true;
+    var render = function () {{
+      var needle = filter.value.toLowerCase();
+      var rows = table.rows.filter(function (row) {{ return row[0].toLowerCase().indexOf(needle) !== -1; }});
+      if (sortField !== null) rows.sort(function (a, b) {{
+        var x = a[sortField], y = b[sortField];
+        var order = typeof x === "string" ? x.localeCompare(y) : x - y;
+        return descending ? -order : order;
+      }});
+      var cells = [];
+      rows.forEach(function (row) {{
+        cells.push("<tr>" + fields.map(function (field) {{
+          var value = row[field];
+          if (field === 0) {{ var text = document.createElement("td"); text.textContent = value; return text.outerHTML; }}
+          return "<td class='num'>" + (field % 2 === 0 ? pct(value) : value.toLocaleString()) + "</td>";
+        }}).join("") + "</tr>");
+      }});
+      body.innerHTML = cells.join("");
+      count.textContent = " " + rows.length + " of " + table.rows.length + " rows";
+    }};
+    columns.forEach(function (name, index) {{
+      var cell = document.createElement("th"); cell.textContent = name;
+      cell.addEventListener("click", function () {{
+        descending = sortField === fields[index] ? !descending : index > 0;
+        sortField = fields[index]; render();
+      }});
+      headRow.appendChild(cell);
+    }});
+    filter.addEventListener("input", render);
+    render(); container.appendChild(section);
+  }});
+}})();
+</script></body></html>
+"""
+
+def generate_html_report(
+    results_a, results_b, deck_list_a, deck_list_b,
+    submitted_name_a, submitted_name_b, is_comparison,
+    card_combos, combo_card_map, card_categories, simulation_queue,
+    deck_stats_a, deck_stats_b
+):
+    """
+    Writes the report as one self-contained HTML file (same arguments as
+    analyze_and_generate_pdf). The card, combo, duplicate, M/S/T and category
+    tables of build_report_tables are embedded unfolded as JSON, and the page
+    sorts (click a header) and filters them in the browser. Comparisons also
+    get the text insights. Returns the filename, or None on failure.
+    """
+    if not results_a or not results_a.get("total_simulations"): simulation_queue.put(("error", "HTML report failed: Missing results A.")); return None
+    if is_comparison and (not results_b or not results_b.get("total_simulations")): simulation_queue.put(("error", "HTML report failed: Missing results B.")); return None
+    results_b = results_b if is_comparison else None
+    is_partial = bool(results_a.get("partial") or (results_b and results_b.get("partial")))
+    title = ("Deck Analysis - Comparison" if is_comparison else "Deck Analysis") + (" (Partial)" if is_partial else "")
+
+    header = [f"<p class='meta'>Deck A: {html.escape(submitted_name_a)}</p>"]
+    if is_comparison: header.append(f"<p class='meta'>Deck B: {html.escape(submitted_name_b)}</p>")
+    if is_partial: header.append("<p class='meta partial'>PARTIAL RESULTS: the run was cancelled, so every figure covers only the hands completed before it stopped.</p>")
+    hands = f"{results_a['total_simulations']:,}" + (f" (A), {results_b['total_simulations']:,} (B)" if results_b else "")
+    header.append(f"<p class='meta'>{'Exact analysis: all possible hands' if results_a.get('exact') else 'Simulations'}: {hands}</p>")
+    seeds = [results.get("seed") for results in (results_a, results_b) if results and results.get("seed") is not None]
+    if seeds: header.append(f"<p class='meta'>Seed: {seeds[0]}</p>" if len(set(seeds)) == 1 else f"<p class='meta'>Seeds: {seeds[0]} (A), {seeds[1]} (B)</p>")
+
+    insights = ""
+    if is_comparison:
+        lines = analysis_engine.generate_insights(results_a, results_b, deck_list_a, deck_list_b, results_a["total_simulations"], card_combos, combo_card_map, card_categories, deck_stats_a, deck_stats_b)
+        insights = "<section><h2>Insights and Analysis</h2>" + "".join(f"<p>{html.escape(line)}</p>" for line in lines if line) + "</section>"
+
+    tables = analysis_engine.build_report_tables(results_a, results_b, deck_list_a, deck_list_b if is_comparison else {}, card_combos, max_table_rows=None)
+    data = {"comparison": bool(is_comparison), "tables": [{"title": table["title"], "label": table["label"], "rows": table["rows"]} for table in tables]}
+    page = PAGE_TEMPLATE.format(title=html.escape(title), header="\n".join(header), insights=insights,
+                                data=json.dumps(data, separators=(",", ":")).replace("</", "<\\/"))
+    try:
+        filename = analysis_engine.get_unique_filename(os.path.join(analysis_engine.REPORT_DIR, analysis_engine.report_base_name(submitted_name_a, submitted_name_b, is_comparison, is_partial) + ".html"))
+        with open(filename, 'w', encoding='utf-8') as f: f.write(page)
+    except OSError as e:
+        simulation_queue.put(("error", f"Failed to write HTML report: {e}")); return None
+    return filename
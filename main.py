@@ -54,6 +54,10 @@ except ImportError as e:
 # --- Local Imports (Card Database, Analysis Engine) ---
 try:
     import analysis_engine
+    import result_cache
+    import result_export
+    import html_report
+    import deck_tuning
 except ImportError as e:
     print(f"Detailed error importing analysis_engine: {str(e)}")
     try:
@@ -88,8 +92,14 @@ NO_DECK_B = "No Deck Selected (B)"
 CATEGORY_FILE = "card_categories.json"
 APP_STATE_FILE = "app_state.json"
 CUSTOM_COMBO_FILE = "custom_combos.json"
+CARD_EFFECTS_FILE = "card_effects.json" # Overrides/extends analysis_engine.DEFAULT_CARD_EFFECTS
 USER_DB_FILE = "user_card_database.json" # Now includes image paths
 STATUS_CLEAR_DELAY = 4000
+REPORT_OUTPUTS = { # Output choice -> (report: "pdf", "html" or None, result_export format or None)
+    "PDF": ("pdf", None), "PDF + JSON": ("pdf", "json"), "PDF + CSV": ("pdf", "csv"), "PDF + NPZ": ("pdf", "npz"),
+    "HTML": ("html", None), "HTML + JSON": ("html", "json"),
+    "JSON (no PDF)": (None, "json"), "CSV (no PDF)": (None, "csv"), "NPZ (no PDF)": (None, "npz"),
+}
 
 # Ensure card images directory exists
 if not os.path.exists(CARD_IMAGES_DIR):
@@ -1152,6 +1162,7 @@ class ABTestWindow(tk.Toplevel):
         self.card_a_name = tk.StringVar() # Test Card 1
         self.card_b_name = tk.StringVar() # Test Card 2
         self.num_trials_var = tk.IntVar(value=16)
+        self.seed_var = tk.StringVar(value="") # Blank = fresh random seed; the seed used is shown in the report
 
         self.deck_list = {} # The loaded deck {card_name: count}
         self.valid_cards = [] # List of card names in the loaded deck
@@ -1162,6 +1173,8 @@ class ABTestWindow(tk.Toplevel):
         self.wins_a = 0
         self.wins_b = 0
         self.ties = 0
+        self.rng = random.Random() # Seeded per test in _start_ab_test
+        self.test_seed = None
         # History: [trial_num, hand_a_list, hand_b_list, pot_draws, bj_reveals, rest_of_deck, result]
         self.trial_history = []
 
@@ -1210,8 +1223,11 @@ class ABTestWindow(tk.Toplevel):
         ttk.Label(setup_frame, text="Trials (1-162):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
         self.trials_spinbox = tk.Spinbox(setup_frame, from_=1, to=162, textvariable=self.num_trials_var, width=5, justify=tk.RIGHT)
         self.trials_spinbox.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(setup_frame, text="Seed (optional):").grid(row=2, column=2, padx=5, pady=5, sticky="w")
+        self.seed_entry = ttk.Entry(setup_frame, textvariable=self.seed_var, width=12)
+        self.seed_entry.grid(row=2, column=3, padx=5, pady=5, sticky="w")
         self.start_button = ttk.Button(setup_frame, text="Start Test", command=self._start_ab_test, state="disabled")
-        self.start_button.grid(row=2, column=3, padx=5, pady=10, sticky="e")
+        self.start_button.grid(row=3, column=3, padx=5, pady=10, sticky="e")
 
         # --- Testing Frame (Row 1) ---
         testing_frame = ttk.Frame(main_frame)
@@ -1252,7 +1268,7 @@ class ABTestWindow(tk.Toplevel):
         extra_draws_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
         extra_draws_frame.columnconfigure(0, weight=1); extra_draws_frame.columnconfigure(1, weight=1)
 
-        pot_frame = ttk.LabelFrame(extra_draws_frame, text="Pot of Extravagance (Next 3)")
+        pot_frame = ttk.LabelFrame(extra_draws_frame, text="Pot of Extravagance (Effect)")
         pot_frame.grid(row=0, column=0, padx=10, pady=5, sticky="nsew")
         pot_frame.rowconfigure(0, weight=1); pot_frame.columnconfigure(0, weight=1);
         self.pot_listbox = tk.Listbox(pot_frame, height=3, width=35)
@@ -1261,7 +1277,7 @@ class ABTestWindow(tk.Toplevel):
         pot_scroll.grid(row=0, column=1, sticky="ns", padx=(0,5), pady=5)
         self.pot_listbox.config(yscrollcommand=pot_scroll.set)
 
-        bj_frame = ttk.LabelFrame(extra_draws_frame, text="Back Jack Reveal (BWL + Next 3)")
+        bj_frame = ttk.LabelFrame(extra_draws_frame, text="Big Welcome Labrynth (Effect)")
         bj_frame.grid(row=0, column=1, padx=10, pady=5, sticky="nsew")
         bj_frame.rowconfigure(0, weight=1); bj_frame.columnconfigure(0, weight=1);
         self.bj_listbox = tk.Listbox(bj_frame, height=4, width=35)
@@ -1373,6 +1389,7 @@ class ABTestWindow(tk.Toplevel):
         self.card_a_combo.config(state="disabled" if self.is_testing or not self.deck_list else "readonly")
         self.card_b_combo.config(state="disabled" if self.is_testing or not self.deck_list else "readonly")
         self.trials_spinbox.config(state=setup_state)
+        self.seed_entry.config(state=setup_state)
         self.start_button.config(state="disabled" if self.is_testing else "normal")
         if not self.is_testing: self._validate_inputs_for_start()
 
@@ -1462,6 +1479,14 @@ class ABTestWindow(tk.Toplevel):
         except (tk.TclError, ValueError) as e:
             messagebox.showerror("Input Error", f"Invalid number of trials: {e}", parent=self)
             return
+        try:
+            seed_text = self.seed_var.get().strip()
+            self.test_seed = int(seed_text) if seed_text else analysis_engine.new_seed()
+            if self.test_seed < 0: raise ValueError("Seed must not be negative.")
+        except ValueError as e:
+            messagebox.showerror("Input Error", f"Invalid seed: {e}", parent=self)
+            return
+        self.rng = random.Random(self.test_seed) # Same seed, same deck and cards: the same sequence of trials
 
         # Reset state
         self.is_testing = True
@@ -1550,7 +1575,7 @@ class ABTestWindow(tk.Toplevel):
             if len(full_deck_list) < 4:
                  raise ValueError(f"Deck size ({len(full_deck_list)}) is too small to draw 4 common cards.")
 
-            random.shuffle(full_deck_list)
+            self.rng.shuffle(full_deck_list)
             common_cards = full_deck_list[:4]
             rest_of_deck = full_deck_list[4:]
 
@@ -1559,14 +1584,17 @@ class ABTestWindow(tk.Toplevel):
             current_hand_a = sorted(hand_a_list)
             current_hand_b = sorted(hand_b_list)
 
-            pot_draws = rest_of_deck[:3]
+            # Resolve the configured effects over the rest of the deck (same engine as the simulator)
+            card_effects = self.parent_app.card_effects
+            pot_card_name = "Pot of Extravagance"
+            if pot_card_name not in card_effects: pot_draws = ["N/A (no effect defined)"]
+            else: pot_draws = analysis_engine.preview_card_effect(pot_card_name, card_effects, rest_of_deck, self.rng) or ["Nothing left to draw"]
 
             bwl_card_name = "Big Welcome Labrynth"
             if bwl_card_name not in self.deck_list:
                 bj_reveals = ["N/A (BWL not in deck)"]
-            else:
-                next_3_for_bj = rest_of_deck[:3]
-                bj_reveals = [bwl_card_name] + next_3_for_bj
+            elif bwl_card_name not in card_effects: bj_reveals = ["N/A (no effect defined)"]
+            else: bj_reveals = analysis_engine.preview_card_effect(bwl_card_name, card_effects, rest_of_deck, self.rng) or ["No target left in deck"]
             # --- End Hand and Draw Generation ---
 
         except ValueError as e:
@@ -1709,7 +1737,7 @@ class ABTestWindow(tk.Toplevel):
             result = trial_data[6] # Result at index 6
             if result == 'A': draw4_when_a_preferred.update(initial_draw4)
             elif result == 'B': draw4_when_b_preferred.update(initial_draw4)
-        report = f"--- Card Evaluation Report (Draw 4 + Test Card) ---\n\n"; report += f"Deck: {self.deck_name.get()}\n"; report += f"Card A: {card_a}\n"; report += f"Card B: {card_b}\n"
+        report = f"--- Card Evaluation Report (Draw 4 + Test Card) ---\n\n"; report += f"Deck: {self.deck_name.get()}\n"; report += f"Card A: {card_a}\n"; report += f"Card B: {card_b}\n"; report += f"Seed: {self.test_seed}\n"
         report += f"Total Trials Evaluated: {total_evaluated}\n\n"; report += "--- Overall Results ---\n"; report += f"Hand A (Draw 4 + {card_a}) Preferred: {final_wins_a} ({perc_a:.1f}%)\n"
         report += f"Hand B (Draw 4 + {card_b}) Preferred: {final_wins_b} ({perc_b:.1f}%)\n"; report += f"Equal Value / Tie:                   {final_ties} ({perc_tie:.1f}%)\n\n"
         report += f"--- Initial Draw 4 Analysis ---\n"; report += "Top Cards in Initial Draw 4 (When Hand A Preferred):\n"
@@ -1751,6 +1779,247 @@ class ABTestWindow(tk.Toplevel):
 
 # --- End of ABTestWindow ---
 
+# --- Ratio Sweep Window ---
+class RatioSweepWindow(tk.Toplevel):
+    """
+    Toplevel window for ratio sweeps: copy-count ranges for a few cards of
+    Deck A, with combo rates for every resulting deck shown in a sortable table.
+    """
+    def __init__(self, parent_app, base_deck):
+        super().__init__(parent_app.root)
+        self.parent_app = parent_app
+        self.base_deck = dict(base_deck)
+        self.title("Ratio Sweep (Deck A)"); self.geometry("900x600"); self.transient(parent_app.root)
+        self.bind('<Escape>', lambda e: self.destroy())
+
+        self.card_ranges = {} # card -> (low, high)
+        self.rows = []
+        self.sweep_queue = queue.Queue()
+        self.card_var = tk.StringVar(); self.low_var = tk.IntVar(value=0); self.high_var = tk.IntVar(value=MAX_CARD_COPIES)
+        self.engine_var = tk.StringVar(value="exact"); self.hands_var = tk.IntVar(value=DEFAULT_SIMULATIONS); self.workers_var = tk.IntVar(value=parent_app.num_workers.get())
+        self.seed_var = tk.StringVar(value="") # numpy sweeps; blank = fresh random seed, shown when the sweep completes
+        self.status_var = tk.StringVar(value="Add card ranges, then run the sweep.")
+        self._setup_gui()
+
+    def _setup_gui(self):
+        """Builds the range editor, run controls and result table."""
+        range_frame = ttk.LabelFrame(self, text="Card Ranges"); range_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Combobox(range_frame, textvariable=self.card_var, values=sorted(self.parent_app.card_pool), width=35).grid(row=0, column=0, padx=5, pady=5)
+        ttk.Label(range_frame, text="Min:").grid(row=0, column=1); ttk.Spinbox(range_frame, from_=0, to=MAX_CARD_COPIES, textvariable=self.low_var, width=3, state="readonly").grid(row=0, column=2, padx=5)
+        ttk.Label(range_frame, text="Max:").grid(row=0, column=3); ttk.Spinbox(range_frame, from_=0, to=MAX_CARD_COPIES, textvariable=self.high_var, width=3, state="readonly").grid(row=0, column=4, padx=5)
+        ttk.Button(range_frame, text="Add Range", command=self._add_range).grid(row=0, column=5, padx=5)
+        ttk.Button(range_frame, text="Remove Selected", command=self._remove_range).grid(row=0, column=6, padx=5)
+        self.range_listbox = tk.Listbox(range_frame, height=4); self.range_listbox.grid(row=1, column=0, columnspan=7, sticky="ew", padx=5, pady=5)
+        range_frame.columnconfigure(0, weight=1)
+
+        run_frame = ttk.Frame(self); run_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Label(run_frame, text="Engine:").pack(side="left"); ttk.Combobox(run_frame, textvariable=self.engine_var, values=deck_tuning.SWEEP_ENGINES, state="readonly", width=7).pack(side="left", padx=5)
+        ttk.Label(run_frame, text="Hands (numpy):").pack(side="left"); ttk.Entry(run_frame, textvariable=self.hands_var, width=9).pack(side="left", padx=5)
+        ttk.Label(run_frame, text="Workers:").pack(side="left"); ttk.Spinbox(run_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.workers_var, width=4, state="readonly").pack(side="left", padx=5)
+        ttk.Label(run_frame, text="Seed:").pack(side="left"); ttk.Entry(run_frame, textvariable=self.seed_var, width=10).pack(side="left", padx=5)
+        self.run_button = ttk.Button(run_frame, text="Run Sweep", command=self._start_sweep); self.run_button.pack(side="left", padx=10)
+        self.export_button = ttk.Button(run_frame, text="Export CSV...", command=self._export_csv, state="disabled"); self.export_button.pack(side="left", padx=5)
+        ttk.Label(self, textvariable=self.status_var).pack(fill="x", padx=10)
+
+        table_frame = ttk.Frame(self); table_frame.pack(expand=True, fill="both", padx=10, pady=5)
+        self.result_tree = ttk.Treeview(table_frame, show="headings"); self.result_tree.pack(side="left", expand=True, fill="both")
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.result_tree.yview); scrollbar.pack(side="right", fill="y"); self.result_tree.config(yscrollcommand=scrollbar.set)
+
+    def _refresh_ranges(self):
+        self.range_listbox.delete(0, tk.END)
+        for card, (low, high) in sorted(self.card_ranges.items()): self.range_listbox.insert(tk.END, f"{card}: {low}-{high} (base {self.base_deck.get(card, 0)})")
+
+    def _add_range(self):
+        """Adds or replaces the range for the chosen card."""
+        card = self.card_var.get().strip(); low, high = self.low_var.get(), self.high_var.get()
+        if card not in self.parent_app.card_pool: messagebox.showwarning("Invalid Card", "Choose a card from the pool.", parent=self); return
+        if low > high: messagebox.showwarning("Invalid Range", "Min must not exceed Max.", parent=self); return
+        self.card_ranges[card] = (low, high); self._refresh_ranges()
+
+    def _remove_range(self):
+        selection = self.range_listbox.curselection()
+        if not selection: return
+        del self.card_ranges[sorted(self.card_ranges)[selection[0]]]; self._refresh_ranges()
+
+    def _start_sweep(self):
+        """Runs the sweep in a background thread."""
+        if not self.card_ranges: messagebox.showwarning("No Ranges", "Add at least one card range.", parent=self); return
+        try:
+            num_hands = self.hands_var.get()
+            if num_hands <= 0: raise ValueError
+        except (ValueError, tk.TclError): messagebox.showerror("Input Error", "Enter a positive number of hands.", parent=self); return
+        try:
+            seed_text = self.seed_var.get().strip()
+            seed = int(seed_text) if seed_text else None
+            if seed is not None and seed < 0: raise ValueError
+        except ValueError: messagebox.showerror("Input Error", "Enter a non-negative whole number as the seed, or leave it blank for a random one.", parent=self); return
+        card_combos = analysis_engine._define_combos(); card_combos.update(self.parent_app.custom_combos)
+        self.run_button.config(state="disabled"); self.export_button.config(state="disabled")
+        args = (self.base_deck, dict(self.card_ranges), card_combos, self.parent_app.card_categories.copy(), self.sweep_queue, self.engine_var.get(), num_hands, self.workers_var.get(), seed, self.parent_app.card_types.copy(), result_cache.CACHE_DIR if self.parent_app.use_result_cache.get() else None)
+        threading.Thread(target=self._run_sweep_task, args=args, daemon=True).start()
+        self.after(100, self._check_sweep_queue)
+
+    def _run_sweep_task(self, *args):
+        """Sweep thread body; always ends with a sweep_done message."""
+        rows = None
+        try: rows = deck_tuning.run_sweep(*args)
+        except Exception as e: import traceback; traceback.print_exc(); self.sweep_queue.put(("error", f"Sweep failed: {e}"))
+        finally: self.sweep_queue.put(("sweep_done", rows))
+
+    def _check_sweep_queue(self):
+        """Polls the sweep thread's messages."""
+        if not self.winfo_exists(): return
+        try:
+            while True:
+                message = self.sweep_queue.get_nowait()
+                if message[0] == "status": self.status_var.set(message[1])
+                elif message[0] == "error": self.status_var.set(f"Error: {message[1]}"); messagebox.showerror("Sweep Error", message[1], parent=self)
+                elif message[0] == "sweep_done":
+                    self.run_button.config(state="normal")
+                    if message[1]: self.rows = message[1]; self._show_rows(); self.status_var.set(f"Sweep complete: {len(self.rows)} decks" + (f" (seed {self.rows[0]['seed']})." if "seed" in self.rows[0] else ".")); self.export_button.config(state="normal")
+                    return
+        except queue.Empty: pass
+        self.after(100, self._check_sweep_queue)
+
+    def _show_rows(self, sort_column=None):
+        """Fills the result table, best rows first when sorted by a combo column."""
+        cards = list(self.rows[0]["counts"]); combo_names = list(self.rows[0]["combo_rates"])
+        columns = cards + ["Deck Size"] + combo_names
+        rows = self.rows
+        if sort_column in combo_names: rows = sorted(rows, key=lambda row: row["combo_rates"][sort_column], reverse=True)
+        self.result_tree.config(columns=columns)
+        for column in columns:
+            self.result_tree.heading(column, text=column, command=lambda c=column: self._show_rows(c))
+            self.result_tree.column(column, width=60 if column in cards or column == "Deck Size" else 120, anchor="center")
+        self.result_tree.delete(*self.result_tree.get_children())
+        for row in rows:
+            self.result_tree.insert("", tk.END, values=[row["counts"][card] for card in cards] + [row["deck_size"]] + [f"{row['combo_rates'][name] * 100:.2f}%" for name in combo_names])
+
+    def _export_csv(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".csv", filetypes=[("CSV files", "*.csv")], title="Export Sweep Results")
+        if not path: return
+        try: deck_tuning.write_sweep_csv(self.rows, path); self.status_var.set(f"Exported {len(self.rows)} rows to {os.path.basename(path)}.")
+        except OSError as e: messagebox.showerror("Export Error", f"Could not write CSV: {e}", parent=self)
+
+# --- End of RatioSweepWindow ---
+
+# --- Ratio Optimizer Window ---
+class RatioOptimizerWindow(tk.Toplevel):
+    """
+    Toplevel window for the ratio optimizer: combo weights and required cards
+    in, the best-scoring deck (compared with Deck A) out.
+    """
+    def __init__(self, parent_app, base_deck):
+        super().__init__(parent_app.root)
+        self.parent_app = parent_app
+        self.base_deck = dict(base_deck)
+        self.title("Ratio Optimizer (Deck A)"); self.geometry("800x650"); self.transient(parent_app.root)
+        self.bind('<Escape>', lambda e: self.destroy())
+
+        self.card_combos = analysis_engine._define_combos(); self.card_combos.update(parent_app.custom_combos)
+        self.weights = {combo_name: 1.0 for combo_name in self.card_combos}
+        self.result = None
+        self.optimizer_queue = queue.Queue()
+        self.weight_var = tk.StringVar(value="1"); self.iterations_var = tk.IntVar(value=deck_tuning.OPTIMIZER_ITERATIONS)
+        self.status_var = tk.StringVar(value="Set combo weights (0 ignores a combo) and pick required cards.")
+        self._setup_gui()
+
+    def _setup_gui(self):
+        """Builds the weight table, required card list, run controls and result view."""
+        input_frame = ttk.Frame(self); input_frame.pack(fill="both", padx=10, pady=5)
+        input_frame.columnconfigure(0, weight=2); input_frame.columnconfigure(1, weight=1)
+        weight_frame = ttk.LabelFrame(input_frame, text="Combo Weights"); weight_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
+        self.weight_tree = ttk.Treeview(weight_frame, columns=("combo", "weight"), show="headings", height=8)
+        self.weight_tree.heading("combo", text="Combo"); self.weight_tree.heading("weight", text="Weight"); self.weight_tree.column("weight", width=60, anchor="center")
+        self.weight_tree.pack(fill="both", expand=True, padx=5, pady=5)
+        weight_controls = ttk.Frame(weight_frame); weight_controls.pack(fill="x", padx=5, pady=(0, 5))
+        ttk.Label(weight_controls, text="Weight:").pack(side="left"); ttk.Entry(weight_controls, textvariable=self.weight_var, width=6).pack(side="left", padx=5)
+        ttk.Button(weight_controls, text="Set for Selected", command=self._set_weight).pack(side="left")
+        self._refresh_weights()
+        required_frame = ttk.LabelFrame(input_frame, text="Required Cards (keep Deck A count)"); required_frame.grid(row=0, column=1, sticky="nsew")
+        self.required_listbox = tk.Listbox(required_frame, selectmode=tk.EXTENDED, height=10, exportselection=False); self.required_listbox.pack(fill="both", expand=True, padx=5, pady=5)
+        for card, quantity in sorted(self.base_deck.items()): self.required_listbox.insert(tk.END, f"{card} x{quantity}")
+
+        run_frame = ttk.Frame(self); run_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Label(run_frame, text="Iterations:").pack(side="left"); ttk.Entry(run_frame, textvariable=self.iterations_var, width=8).pack(side="left", padx=5)
+        self.run_button = ttk.Button(run_frame, text="Optimize", command=self._start_optimizer); self.run_button.pack(side="left", padx=10)
+        self.apply_button = ttk.Button(run_frame, text="Load Result into Deck B", command=self._apply_to_deck_b, state="disabled"); self.apply_button.pack(side="left", padx=5)
+        ttk.Label(self, textvariable=self.status_var).pack(fill="x", padx=10)
+        self.result_text = tk.Text(self, height=18, wrap="word", state="disabled"); self.result_text.pack(fill="both", expand=True, padx=10, pady=5)
+
+    def _refresh_weights(self):
+        self.weight_tree.delete(*self.weight_tree.get_children())
+        for combo_name in sorted(self.weights): self.weight_tree.insert("", tk.END, iid=combo_name, values=(combo_name, f"{self.weights[combo_name]:g}"))
+
+    def _set_weight(self):
+        """Applies the weight entry to every selected combo."""
+        try: weight = float(self.weight_var.get())
+        except ValueError: messagebox.showerror("Input Error", "Enter a numeric weight.", parent=self); return
+        selection = self.weight_tree.selection()
+        if not selection: messagebox.showinfo("No Selection", "Select one or more combos first.", parent=self); return
+        for combo_name in selection: self.weights[combo_name] = weight
+        self._refresh_weights()
+
+    def _start_optimizer(self):
+        """Runs the optimizer in a background thread."""
+        try:
+            iterations = self.iterations_var.get()
+            if iterations <= 0: raise ValueError
+        except (ValueError, tk.TclError): messagebox.showerror("Input Error", "Enter a positive number of iterations.", parent=self); return
+        if not any(self.weights.values()): messagebox.showwarning("No Objective", "Give at least one combo a non-zero weight.", parent=self); return
+        required_cards = [sorted(self.base_deck)[i] for i in self.required_listbox.curselection()]
+        required = {card: self.base_deck[card] for card in required_cards}
+        self.run_button.config(state="disabled"); self.apply_button.config(state="disabled")
+        args = (self.parent_app.card_pool, self.card_combos, dict(self.weights), self.optimizer_queue, self.base_deck, required, MIN_DECK_SIZE, MAX_DECK_SIZE, MAX_CARD_COPIES, iterations)
+        threading.Thread(target=self._run_optimizer_task, args=args, daemon=True).start()
+        self.after(100, self._check_optimizer_queue)
+
+    def _run_optimizer_task(self, *args):
+        """Optimizer thread body; always ends with an optimizer_done message."""
+        result = None
+        try: result = deck_tuning.optimize_deck(*args)
+        except Exception as e: import traceback; traceback.print_exc(); self.optimizer_queue.put(("error", f"Optimizer failed: {e}"))
+        finally: self.optimizer_queue.put(("optimizer_done", result))
+
+    def _check_optimizer_queue(self):
+        """Polls the optimizer thread's messages."""
+        if not self.winfo_exists(): return
+        try:
+            while True:
+                message = self.optimizer_queue.get_nowait()
+                if message[0] == "status": self.status_var.set(message[1])
+                elif message[0] == "error": self.status_var.set(f"Error: {message[1]}"); messagebox.showerror("Optimizer Error", message[1], parent=self)
+                elif message[0] == "optimizer_done":
+                    self.run_button.config(state="normal")
+                    if message[1]: self.result = message[1]; self._show_result(); self.apply_button.config(state="normal")
+                    return
+        except queue.Empty: pass
+        self.after(100, self._check_optimizer_queue)
+
+    def _show_result(self):
+        """Lists the optimized deck and its combo probabilities next to Deck A's."""
+        result = self.result
+        self.status_var.set(f"Score {result['score']:.4f} after {result['evaluations']:,} distinct decks ({result['evaluations_per_second']:,.0f}/s).")
+        lines = [f"Optimized deck ({sum(result['deck'].values()) + result['open_slots']} cards):"]
+        lines += [f"  {card} x{quantity}" for card, quantity in sorted(result["deck"].items())]
+        if result["open_slots"]: lines.append(f"  + {result['open_slots']} open slot(s) for cards outside the weighted combos")
+        lines.append(""); lines.append("Combo probabilities (Deck A -> optimized):")
+        for combo_name, probability in sorted(result["probabilities"].items()):
+            before = f"{result['base_probabilities'][combo_name] * 100:.2f}%" if result["base_probabilities"] else "-"
+            lines.append(f"  {combo_name}: {before} -> {probability * 100:.2f}% (weight {self.weights[combo_name]:g})")
+        self.result_text.config(state="normal"); self.result_text.delete("1.0", tk.END); self.result_text.insert(tk.END, "\n".join(lines)); self.result_text.config(state="disabled")
+
+    def _apply_to_deck_b(self):
+        """Puts the optimized deck into Deck B for a full simulation or comparison."""
+        if not self.result: return
+        app = self.parent_app
+        app.deck_list_b = dict(self.result["deck"]); app.current_deck_name_b = "Optimized (unsaved)"
+        app.update_deck_listbox('b'); app.update_deck_counts('b')
+        if app.comparison_mode.get(): app.update_deck_differences()
+        app.update_status("Optimized deck loaded into Deck B.", temporary=True)
+
+# --- End of RatioOptimizerWindow ---
+
 # --- Main Application Class ---
 class DeckSimulatorApp:
     def __init__(self, root):
@@ -1795,16 +2064,33 @@ class DeckSimulatorApp:
         # UI Variables
         self.num_simulations = tk.IntVar(value=DEFAULT_SIMULATIONS)
         self.comparison_mode = tk.BooleanVar(value=True) # Default to True
+        self.simulation_engine = tk.StringVar(value=analysis_engine.DEFAULT_ENGINE)
+        self.num_workers = tk.IntVar(value=1) # >1 runs shards in a process pool
+        self.use_result_cache = tk.BooleanVar(value=True)
+        self.target_precision_var = tk.StringVar(value="") # "+/- %" target for adaptive stopping; blank = fixed count
+        self.seed_var = tk.StringVar(value="") # Integer seed for reproducible runs; blank = fresh random seed
+        self.paired_comparison = tk.BooleanVar(value=False) # Deal A and B from common random numbers
+        self.reuse_hands = tk.BooleanVar(value=False) # Re-evaluate the previous run's hands after small deck edits
+        self.going_second = tk.BooleanVar(value=False) # 6-card opening hand instead of 5
+        self.num_turns = tk.IntVar(value=1) # Turns of draws tracked cumulatively (1 = opening hand only)
+        self.resolve_effects = tk.BooleanVar(value=False) # Resolve draw/search effects before combo checks
+        self.resume_checkpoint = tk.BooleanVar(value=False) # Continue an interrupted run from its checkpoint
+        self.report_output = tk.StringVar(value="PDF") # Key of REPORT_OUTPUTS: PDF or HTML report and/or a machine-readable results file
         self.simulation_status_var = tk.StringVar(value="Status: Idle")
 
         # Simulation Threading & Communication
         self.simulation_queue = queue.Queue()
+        self.simulation_control = None # analysis_engine.SimulationControl of the running simulation (Pause/Cancel)
         self.last_pdf_path = None # Store path to generated PDF
+        self.report_renderer = result_export.ReportRenderer(self.simulation_queue) # Builds PDFs from run files in worker processes
+        self._closing = False # Set once the main window is closing; a simulation still running then skips its report
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self._after_id_status_clear = None # ID for status bar clear timer
 
         # Load combo definitions (hardcoded and custom)
         self.hardcoded_combo_definitions = analysis_engine._get_hardcoded_combo_definitions()
         self.custom_combos = self._load_initial_custom_combos()
+        self.card_effects = self._load_card_effects()
 
         # Load categories (these can change via editor)
         self.card_categories = self._load_initial_categories()
@@ -1982,6 +2268,9 @@ class DeckSimulatorApp:
         self.manage_combos_button = ttk.Button(self.file_frame, text="Manage Combos", command=self._open_combo_editor); self.manage_combos_button.pack(side="right", padx=5, pady=5)
         self.manage_db_button = ttk.Button(self.file_frame, text="Manage Card DB", command=self._open_db_editor); self.manage_db_button.pack(side="right", padx=5, pady=5)
         self.ab_test_button = ttk.Button(self.file_frame, text="Card Evaluation Test", command=self._open_ab_test_window); self.ab_test_button.pack(side="right", padx=5, pady=5)
+        self.sweep_button = ttk.Button(self.file_frame, text="Ratio Sweep", command=self._open_sweep_window); self.sweep_button.pack(side="right", padx=5, pady=5)
+        self.optimizer_button = ttk.Button(self.file_frame, text="Optimize Ratios", command=self._open_optimizer_window); self.optimizer_button.pack(side="right", padx=5, pady=5)
+        self.render_report_button = ttk.Button(self.file_frame, text="Render Report...", command=self.render_report_from_file); self.render_report_button.pack(side="right", padx=5, pady=5)
 
     def _setup_simulation_controls(self):
         """Sets up the widgets for controlling the simulation."""
@@ -1990,7 +2279,27 @@ class DeckSimulatorApp:
         num_sim_label = ttk.Label(self.simulation_frame, text="Simulations:"); num_sim_label.pack(side="left", padx=(10, 2), pady=5)
         validate_cmd = self.root.register(self._validate_simulation_entry); self.num_sim_entry = ttk.Entry(self.simulation_frame, textvariable=self.num_simulations, width=10, validate="key", validatecommand=(validate_cmd, '%P')); self.num_sim_entry.pack(side="left", padx=(0, 5), pady=5)
         self.start_simulation_button = ttk.Button(self.simulation_frame, text="Start Simulation", command=self.start_simulation_thread, state="disabled"); self.start_simulation_button.pack(side="left", padx=5, pady=5)
+        self.pause_simulation_button = ttk.Button(self.simulation_frame, text="Pause", command=self.toggle_pause_simulation, state="disabled"); self.pause_simulation_button.pack(side="left", padx=5, pady=5)
+        self.cancel_simulation_button = ttk.Button(self.simulation_frame, text="Cancel", command=self.cancel_simulation, state="disabled"); self.cancel_simulation_button.pack(side="left", padx=5, pady=5)
         self.comparison_mode_check = ttk.Checkbutton(self.simulation_frame, text="Comparison Mode", variable=self.comparison_mode, command=self.toggle_comparison_mode); self.comparison_mode_check.pack(side="left", padx=15, pady=5)
+        ttk.Label(self.simulation_frame, text="Engine:").pack(side="left", padx=(10, 2), pady=5)
+        self.engine_dropdown = ttk.Combobox(self.simulation_frame, textvariable=self.simulation_engine, values=analysis_engine.SIMULATION_ENGINES, state="readonly", width=8); self.engine_dropdown.pack(side="left", padx=(0, 5), pady=5)
+        ttk.Label(self.simulation_frame, text="Workers:").pack(side="left", padx=(10, 2), pady=5)
+        self.workers_spinbox = ttk.Spinbox(self.simulation_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.num_workers, width=4, state="readonly"); self.workers_spinbox.pack(side="left", padx=(0, 5), pady=5)
+        self.cache_check = ttk.Checkbutton(self.simulation_frame, text="Use Cache", variable=self.use_result_cache); self.cache_check.pack(side="left", padx=10, pady=5)
+        ttk.Label(self.simulation_frame, text="Precision ±%:").pack(side="left", padx=(10, 2), pady=5)
+        self.precision_entry = ttk.Entry(self.simulation_frame, textvariable=self.target_precision_var, width=6); self.precision_entry.pack(side="left", padx=(0, 5), pady=5)
+        ttk.Label(self.simulation_frame, text="Seed:").pack(side="left", padx=(10, 2), pady=5)
+        self.seed_entry = ttk.Entry(self.simulation_frame, textvariable=self.seed_var, width=10); self.seed_entry.pack(side="left", padx=(0, 5), pady=5)
+        self.paired_check = ttk.Checkbutton(self.simulation_frame, text="Paired (CRN)", variable=self.paired_comparison); self.paired_check.pack(side="left", padx=10, pady=5)
+        self.reuse_hands_check = ttk.Checkbutton(self.simulation_frame, text="Reuse Hands", variable=self.reuse_hands); self.reuse_hands_check.pack(side="left", padx=10, pady=5)
+        self.going_second_check = ttk.Checkbutton(self.simulation_frame, text="Going Second", variable=self.going_second); self.going_second_check.pack(side="left", padx=10, pady=5)
+        ttk.Label(self.simulation_frame, text="Turns:").pack(side="left", padx=(10, 2), pady=5)
+        self.turns_spinbox = ttk.Spinbox(self.simulation_frame, from_=1, to=10, textvariable=self.num_turns, width=3, state="readonly"); self.turns_spinbox.pack(side="left", padx=(0, 5), pady=5)
+        self.effects_check = ttk.Checkbutton(self.simulation_frame, text="Card Effects", variable=self.resolve_effects); self.effects_check.pack(side="left", padx=10, pady=5)
+        self.resume_check = ttk.Checkbutton(self.simulation_frame, text="Resume Checkpoint", variable=self.resume_checkpoint); self.resume_check.pack(side="left", padx=10, pady=5)
+        ttk.Label(self.simulation_frame, text="Output:").pack(side="left", padx=(10, 2), pady=5)
+        self.output_dropdown = ttk.Combobox(self.simulation_frame, textvariable=self.report_output, values=list(REPORT_OUTPUTS), state="readonly", width=13); self.output_dropdown.pack(side="left", padx=(0, 5), pady=5)
 
     def _validate_simulation_entry(self, value_if_allowed):
         """Validation function for the simulation number entry."""
@@ -2354,39 +2663,208 @@ class DeckSimulatorApp:
         cats_copy = self.card_categories.copy()
         all_combos_to_pass = analysis_engine._define_combos(); all_combos_to_pass.update(self.custom_combos)
         combo_map_to_pass = analysis_engine._define_combo_card_map()
-        sim_thread = threading.Thread(target=self._run_simulation_task, args=(num_sim, is_comp_to_sim, deck_a_to_sim, deck_b_to_sim, name_a_to_sim, name_b_to_sim, stats_a_to_sim, stats_b_to_sim, cats_copy, all_combos_to_pass, combo_map_to_pass), daemon=True); sim_thread.start()
+        engine = self.simulation_engine.get(); workers = self.num_workers.get()
+        card_effects = dict(self.card_effects) if self.resolve_effects.get() else None
+        if card_effects and engine == "exact":
+            engine = "numpy" if analysis_engine.np is not None else "python"
+            self.update_status(f"Card effects need sampled hands; simulating with the {engine} engine.")
+        try:
+            precision_text = self.target_precision_var.get().strip()
+            target_precision = float(precision_text) / 100 if precision_text else None
+            if target_precision is not None and target_precision <= 0: raise ValueError("Precision must be positive.")
+        except ValueError as e:
+            self.update_status(f"Invalid precision target: {e}", True); messagebox.showerror("Input Error", "Enter a positive precision in percent (e.g. 0.1), or leave it blank.", parent=self.root); self.validate_decks_for_submission(); return
+        try:
+            seed_text = self.seed_var.get().strip()
+            seed = int(seed_text) if seed_text else None
+            if seed is not None and seed < 0: raise ValueError("Seed must not be negative.")
+        except ValueError as e:
+            self.update_status(f"Invalid seed: {e}", True); messagebox.showerror("Input Error", "Enter a non-negative whole number as the seed, or leave it blank for a random one.", parent=self.root); self.validate_decks_for_submission(); return
+        sim_options = {"engine": engine, "workers": workers, "use_cache": self.use_result_cache.get(), "card_types": self.card_types.copy(), "target_precision": target_precision, "paired": self.paired_comparison.get(), "reuse_hands": self.reuse_hands.get(),
+                       "draw_schedule": analysis_engine.normalize_draw_schedule({"opening_hand": 6 if self.going_second.get() else 5, "turns": self.num_turns.get()}), "card_effects": card_effects, "seed": seed, "resume": self.resume_checkpoint.get(), "output": self.report_output.get()}
+        self.simulation_control = sim_options["control"] = analysis_engine.SimulationControl()
+        self.pause_simulation_button.config(state="normal", text="Pause"); self.cancel_simulation_button.config(state="normal")
+        sim_thread = threading.Thread(target=self._run_simulation_task, args=(num_sim, is_comp_to_sim, deck_a_to_sim, deck_b_to_sim, name_a_to_sim, name_b_to_sim, stats_a_to_sim, stats_b_to_sim, cats_copy, all_combos_to_pass, combo_map_to_pass, sim_options), daemon=True); sim_thread.start()
+
+    def toggle_pause_simulation(self):
+        """Pauses the running simulation at its next batch boundary, or resumes it."""
+        control = self.simulation_control
+        if not control or control.cancelled: return
+        if control.paused: control.resume(); self.pause_simulation_button.config(text="Pause"); self.update_status("Simulation resumed.")
+        else: control.pause(); self.pause_simulation_button.config(text="Resume"); self.update_status("Simulation paused. Resume or Cancel to continue.")
+
+    def cancel_simulation(self):
+        """Stops the running simulation at its next batch boundary; a report is still built from the hands completed so far."""
+        control = self.simulation_control
+        if not control or control.cancelled: return
+        control.cancel(); self.pause_simulation_button.config(state="disabled", text="Pause"); self.cancel_simulation_button.config(state="disabled")
+        self.update_status("Cancelling simulation... a partial report will be generated.")
+
+    def _on_close(self):
+        """Window close: cancels a running simulation and stops the report workers without waiting for queued reports."""
+        self._closing = True
+        if self.simulation_control: self.simulation_control.cancel()
+        self.report_renderer.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
+    def _simulation_finished(self):
+        """Resets the Pause/Cancel controls once the simulation thread is done."""
+        self.simulation_control = None
+        self.pause_simulation_button.config(state="disabled", text="Pause"); self.cancel_simulation_button.config(state="disabled")
+        self.validate_decks_for_submission()
 
-    def _run_simulation_task(self, num_sim, is_comp, deck_a, deck_b, name_a, name_b, stats_a, stats_b, card_categories, card_combos, combo_card_map):
+    def _simulate_deck(self, num_sim, deck, label, card_combos, card_categories, sim_options):
+        """
+        Simulates one deck, serving the result from the on-disk cache when an
+        identical run is stored. A run without a seed draws a fresh one, so it
+        is never served from the cache, but its result is stored under the
+        seed it used. Reuse Hands runs bypass the cache: their result depends
+        on the stored hand record, not only on the run settings.
+        """
+        engine = sim_options.get("engine", analysis_engine.DEFAULT_ENGINE)
+        reuse_hands = sim_options.get("reuse_hands") and self._plain_hands(sim_options)
+        if reuse_hands and (engine not in ("numpy", "python") or sim_options.get("target_precision")):
+            self.simulation_queue.put(("status", f"Deck {label}: Reuse Hands only covers fixed-size numpy/python runs; running a regular {engine} simulation.")); reuse_hands = False
+        if reuse_hands: return self._simulate_deck_from_record(num_sim, deck, label, card_combos, card_categories, sim_options)
+        cache_options = {"target_precision": sim_options.get("target_precision")}
+        if sim_options.get("draw_schedule"): cache_options["draw_schedule"] = sim_options["draw_schedule"]
+        if sim_options.get("card_effects"): cache_options["card_effects"] = sim_options["card_effects"]
+        seed = sim_options.get("seed")
+        fresh_seed = seed is None and engine != "exact" # The exact engine ignores the seed
+        if fresh_seed and not sim_options.get("resume"): seed = analysis_engine.new_seed() # A resume takes the checkpoint's seed instead
+        if sim_options.get("use_cache") and not fresh_seed:
+            cached = result_cache.load_cached_results(result_cache.make_cache_key(deck, sim_options.get("card_types", {}), card_combos, card_categories, num_sim, seed, engine, cache_options))
+            if cached: self.simulation_queue.put(("status", f"Deck {label}: using cached results.")); return cached
+        # Checkpoints are keyed without the seed, so a resume finds the run and reuses the seed stored in it
+        checkpoint_key = result_cache.make_cache_key(deck, sim_options.get("card_types", {}), card_combos, card_categories, num_sim, None, engine, cache_options)
+        checkpoint = os.path.join(result_cache.CACHE_DIR, "checkpoints", f"{checkpoint_key}.json") if checkpoint_key else None
+        results = analysis_engine.run_simulation(num_sim, deck, label, card_combos, card_categories, self.simulation_queue, engine=engine, workers=sim_options.get("workers", 1), seed=seed, target_precision=sim_options.get("target_precision"),
+                                                 draw_schedule=sim_options.get("draw_schedule"), card_effects=sim_options.get("card_effects"), card_types=sim_options.get("card_types"), control=sim_options.get("control"),
+                                                 checkpoint=checkpoint, resume=sim_options.get("resume", False))
+        if results and sim_options.get("use_cache") and not results.get("partial"):
+            result_cache.store_cached_results(result_cache.make_cache_key(deck, sim_options.get("card_types", {}), card_combos, card_categories, num_sim, results.get("seed", seed), engine, cache_options), results)
+        return results
+
+    @staticmethod
+    def _plain_hands(sim_options):
+        """True when a run only needs plain 5-card opening hands (no draw schedule or card effects), which Paired (CRN) and Reuse Hands require."""
+        return not sim_options.get("draw_schedule") and not sim_options.get("card_effects")
+
+    def _simulate_deck_from_record(self, num_sim, deck, label, card_combos, card_categories, sim_options):
+        """
+        Re-evaluates only the hands affected by deck edits since the last
+        recorded run of this deck slot; falls back to a new recorded run. Runs
+        in one process (workers is ignored); a cancelled run is not recorded.
+        """
+        record_path = os.path.join(result_cache.CACHE_DIR, "hand_records", f"deck_{label}.npz")
+        record = analysis_engine.load_hand_record(record_path)
+        card_types, seed, control = sim_options.get("card_types"), sim_options.get("seed"), sim_options.get("control")
+        results = None
+        if record and record["results"]["total_simulations"] == num_sim:
+            results, new_record = analysis_engine.resimulate_from_record(record, deck, label, card_combos, card_categories, self.simulation_queue, seed=seed, card_types=card_types, control=control)
+        if results is None: results, new_record = analysis_engine.run_recorded_simulation(num_sim, deck, label, card_combos, card_categories, self.simulation_queue, seed=seed, card_types=card_types, control=control)
+        if results and not results.get("partial"):
+            try: os.makedirs(os.path.dirname(record_path), exist_ok=True); analysis_engine.save_hand_record(new_record, record_path)
+            except (OSError, TypeError, ValueError) as e: print(f"Warning: Could not save hand record for Deck {label}: {e}")
+        return results
+
+    def _run_simulation_task(self, num_sim, is_comp, deck_a, deck_b, name_a, name_b, stats_a, stats_b, card_categories, card_combos, combo_card_map, sim_options=None):
         """The actual simulation logic executed in a separate thread."""
-        # (Identical to Part 1)
+        sim_options = sim_options or {}
         try:
-            self.simulation_queue.put(("status", f"Simulating Deck A ('{name_a}')...")); results_a = analysis_engine.run_simulation(num_sim, deck_a, "A", card_combos, card_categories, self.simulation_queue)
-            if not results_a: return
-            results_b = None
-            if is_comp: self.simulation_queue.put(("status", f"Simulating Deck B ('{name_b}')...")); results_b = analysis_engine.run_simulation(num_sim, deck_b, "B", card_combos, card_categories, self.simulation_queue) # Continue even if B fails
-            self.simulation_queue.put(("status", "Analyzing results and generating PDF report..."))
-            pdf_filename = analysis_engine.analyze_and_generate_pdf(results_a, results_b, deck_a, deck_b, name_a, name_b, is_comp, card_combos, combo_card_map, card_categories, self.simulation_queue, stats_a, stats_b)
-            if pdf_filename: self.simulation_queue.put(("pdf_ready", pdf_filename))
-            else: self.simulation_queue.put(("error", "PDF generation failed."))
+            if not self._plain_hands(sim_options) and (sim_options.get("paired") or sim_options.get("reuse_hands")):
+                self.simulation_queue.put(("status", "Paired (CRN) and Reuse Hands only cover plain 5-card opening hands; running regular simulations for this draw schedule / card effects."))
+            if is_comp and sim_options.get("paired") and self._plain_hands(sim_options):
+                overridden = ([f"engine '{sim_options['engine']}'"] if sim_options.get("engine", "numpy") != "numpy" else []) + ([f"{sim_options['workers']} workers"] if sim_options.get("workers", 1) > 1 else []) + (["Target Precision"] if sim_options.get("target_precision") else [])
+                note = f" (paired runs are fixed-size single-process numpy; ignoring {', '.join(overridden)})" if overridden else ""
+                self.simulation_queue.put(("status", f"Simulating '{name_a}' and '{name_b}' from common random numbers{note}..."))
+                results_a, results_b = analysis_engine.run_paired_simulation(num_sim, deck_a, deck_b, card_combos, card_categories, self.simulation_queue, seed=sim_options.get("seed"), card_types=sim_options.get("card_types"), control=sim_options.get("control"))
+            else: results_a, results_b = self._simulate_decks(num_sim, is_comp, deck_a, deck_b, name_a, name_b, card_categories, card_combos, sim_options)
+            if not results_a or self._closing: return
+            if is_comp and not results_b and sim_options.get("control") and sim_options["control"].cancelled:
+                is_comp = False; self.simulation_queue.put(("status", "Cancelled before Deck B was simulated; reporting Deck A only."))
+            report_kind, export_format = REPORT_OUTPUTS.get(sim_options.get("output"), REPORT_OUTPUTS["PDF"])
+            record = result_export.build_run_record(results_a, results_b, deck_a, deck_b, name_a, name_b, is_comp, card_combos, combo_card_map, card_categories, stats_a, stats_b,
+                                                    {"engine": "numpy" if results_a.get("paired") else sim_options.get("engine"), "draw_schedule": sim_options.get("draw_schedule"), "paired": bool(results_a.get("paired"))})
+            export_filename = None
+            if export_format:
+                try:
+                    export_filename = result_export.export_run(record, export_format)
+                    self.simulation_queue.put(("status", f"Results saved: {os.path.basename(export_filename)}") if report_kind else ("export_ready", export_filename))
+                except (OSError, TypeError, ValueError, RuntimeError) as e: self.simulation_queue.put(("error", f"Saving results failed: {e}"))
+            if report_kind == "pdf": self._queue_report(record, export_filename, results_a, results_b, deck_a, deck_b, name_a, name_b, is_comp, card_combos, combo_card_map, card_categories, stats_a, stats_b)
+            elif report_kind == "html": # Fast enough to write here, no worker process needed
+                html_filename = html_report.generate_html_report(results_a, results_b, deck_a, deck_b, name_a, name_b, is_comp, card_combos, combo_card_map, card_categories, self.simulation_queue, stats_a, stats_b)
+                if html_filename: self.simulation_queue.put(("html_ready", html_filename))
         except Exception as e: import traceback; traceback.print_exc(); self.simulation_queue.put(("error", f"Simulation task failed: {e}"))
         finally: self.simulation_queue.put(("simulation_complete", None))
 
+    def _queue_report(self, record, run_filename, *pdf_args):
+        """
+        Hands the PDF to the report worker processes via a run file (the
+        exported one, else a spooled JSON copy), so the next simulation can
+        start while it renders. Builds it here if the run file can't be written.
+        """
+        remove_after = run_filename is None
+        if remove_after:
+            try:
+                run_filename = analysis_engine.get_unique_filename(os.path.join(result_cache.CACHE_DIR, "pending_reports", "run.json"))
+                result_export.write_run_file(record, run_filename)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Warning: Could not spool run file, rendering the report here: {e}"); run_filename = None
+        if run_filename:
+            self.report_renderer.submit(run_filename, remove_after=remove_after)
+            self.simulation_queue.put(("status", "Simulation done; the PDF report is rendering in the background.")); return
+        self.simulation_queue.put(("status", "Analyzing results and generating PDF report..."))
+        results_a, results_b, deck_a, deck_b, name_a, name_b, is_comp, card_combos, combo_card_map, card_categories, stats_a, stats_b = pdf_args
+        pdf_filename = analysis_engine.analyze_and_generate_pdf(results_a, results_b, deck_a, deck_b, name_a, name_b, is_comp, card_combos, combo_card_map, card_categories, self.simulation_queue, stats_a, stats_b)
+        if pdf_filename: self.simulation_queue.put(("pdf_ready", pdf_filename))
+        else: self.simulation_queue.put(("error", "PDF generation failed."))
+
+    def _simulate_decks(self, num_sim, is_comp, deck_a, deck_b, name_a, name_b, card_categories, card_combos, sim_options):
+        """Simulates Deck A and (in comparison mode) Deck B independently. Returns (results_a, results_b)."""
+        self.simulation_queue.put(("status", f"Simulating Deck A ('{name_a}')...")); results_a = self._simulate_deck(num_sim, deck_a, "A", card_combos, card_categories, sim_options)
+        if not results_a: return None, None
+        results_b = None
+        if sim_options.get("control") and sim_options["control"].cancelled: return results_a, None
+        if is_comp: self.simulation_queue.put(("status", f"Simulating Deck B ('{name_b}')...")); results_b = self._simulate_deck(num_sim, deck_b, "B", card_combos, card_categories, sim_options) # Continue even if B fails
+        return results_a, results_b
+
     def _check_simulation_queue(self):
-        """Periodically checks the queue for messages from the simulation thread."""
-        # (Identical to Part 1)
+        """
+        Periodically checks the queue for messages from the simulation thread.
+        Runs of status messages are coalesced: only the latest one of each
+        run is rendered, so a backlog never costs more than one label update.
+        """
+        pending_status = None
         try:
             while True:
                 msg_type, msg_data = self.simulation_queue.get_nowait()
-                if msg_type == "status": self.update_status(msg_data)
-                elif msg_type == "error": self.update_status(msg_data, error=True); self.validate_decks_for_submission(); self._unbind_pdf_prompt_keys()
+                self.simulation_queue.task_done()
+                if msg_type == "status": pending_status = msg_data; continue
+                if pending_status is not None: self.update_status(pending_status); pending_status = None
+                if msg_type == "error": self.update_status(msg_data, error=True); self.validate_decks_for_submission(); self._unbind_pdf_prompt_keys()
                 elif msg_type == "pdf_ready":
                     pdf_path = msg_data; self.last_pdf_path = pdf_path; base_filename = os.path.basename(pdf_path)
                     status_msg = f"PDF Ready: {base_filename}. Space=Open Folder, X=Dismiss."; self.update_status(status_msg); self._bind_pdf_prompt_keys(); self.validate_decks_for_submission()
-                elif msg_type == "simulation_complete": self.validate_decks_for_submission()
-                self.simulation_queue.task_done()
-        except queue.Empty: self.root.after(100, self._check_simulation_queue)
+                elif msg_type == "html_ready":
+                    self.last_pdf_path = msg_data; self.update_status(f"HTML Ready: {os.path.basename(msg_data)}. Space=Open Folder, X=Dismiss."); self._bind_pdf_prompt_keys(); self.validate_decks_for_submission()
+                elif msg_type == "export_ready":
+                    self.last_pdf_path = msg_data; self.update_status(f"Results saved: {os.path.basename(msg_data)}. Space=Open Folder, X=Dismiss."); self._bind_pdf_prompt_keys(); self.validate_decks_for_submission()
+                elif msg_type == "simulation_complete": self._simulation_finished()
+        except queue.Empty:
+            if pending_status is not None: self.update_status(pending_status)
+            self.root.after(100, self._check_simulation_queue)
         except Exception as e: print(f"Error processing simulation queue: {e}"); import traceback; traceback.print_exc(); self.update_status(f"Queue processing error: {e}", True); self.root.after(100, self._check_simulation_queue)
 
+    def render_report_from_file(self):
+        """Asks for a saved run file (JSON/CSV/NPZ) and queues its PDF report on the report worker processes."""
+        path = filedialog.askopenfilename(parent=self.root, title="Render Report from Results File", initialdir=analysis_engine.REPORT_DIR if os.path.isdir(analysis_engine.REPORT_DIR) else os.getcwd(),
+                                          filetypes=[("Run files", "*.json *.csv *.npz"), ("All files", "*.*")])
+        if not path: return
+        self.update_status(f"Rendering report for {os.path.basename(path)}...")
+        self.report_renderer.submit(path)
+
     # --- PDF Prompt Handlers ---
     def _bind_pdf_prompt_keys(self):
         """Binds Space and X keys for the PDF ready prompt."""
@@ -2429,6 +2907,17 @@ class DeckSimulatorApp:
             else: print(f"Info: Custom combo file '{CUSTOM_COMBO_FILE}' not found."); return {}
         except (json.JSONDecodeError, Exception) as e: print(f"ERROR loading custom combos: {e}"); return {}
 
+    def _load_card_effects(self):
+        """Returns analysis_engine.DEFAULT_CARD_EFFECTS updated with the definitions in CARD_EFFECTS_FILE."""
+        card_effects = dict(analysis_engine.DEFAULT_CARD_EFFECTS)
+        try:
+            if os.path.exists(CARD_EFFECTS_FILE):
+                with open(CARD_EFFECTS_FILE, 'r') as f: data = json.load(f)
+                if isinstance(data, dict): card_effects.update(data); print(f"Loaded {len(data)} card effects.")
+                else: print(f"Warning: {CARD_EFFECTS_FILE} invalid format.")
+        except (json.JSONDecodeError, Exception) as e: print(f"ERROR loading card effects: {e}")
+        return card_effects
+
     def load_custom_combos(self):
         """Reloads custom combos."""
         # (Identical to Part 1)
@@ -2456,6 +2945,18 @@ class DeckSimulatorApp:
         if not saved_decks: messagebox.showwarning("No Saved Decks", "Card Evaluation Test requires saved decks. Please save a deck first.", parent=self.root); return
         self._ab_test_window = ABTestWindow(self, saved_decks)
 
+    def _open_sweep_window(self):
+        """Opens the Toplevel window for ratio sweeps around Deck A."""
+        if hasattr(self, '_sweep_window') and self._sweep_window and self._sweep_window.winfo_exists(): self._sweep_window.lift(); return
+        if not self.deck_list_a: messagebox.showwarning("No Deck", "Load or build Deck A first; the sweep varies its card counts.", parent=self.root); return
+        self._sweep_window = RatioSweepWindow(self, self.deck_list_a)
+
+    def _open_optimizer_window(self):
+        """Opens the Toplevel window for the ratio optimizer, starting from Deck A."""
+        if hasattr(self, '_optimizer_window') and self._optimizer_window and self._optimizer_window.winfo_exists(): self._optimizer_window.lift(); return
+        if not self.deck_list_a: messagebox.showwarning("No Deck", "Load or build Deck A first; the optimizer starts from it.", parent=self.root); return
+        self._optimizer_window = RatioOptimizerWindow(self, self.deck_list_a)
+
 # --- End of DeckSimulatorApp Class ---
 
 
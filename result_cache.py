@@ -0,0 +1,91 @@
+# result_cache.py
+# On-disk cache of simulation results, keyed by everything that determines them.
+
+import os
+import json
+import hashlib
+
+import analysis_engine
+
+CACHE_DIR = "simulation_cache"
+MAX_CACHE_BYTES = 200 * 1024 * 1024 # Least recently used entries are evicted past this size
+CACHE_FORMAT_VERSION = 1
+
+def make_cache_key(deck_list, card_types, card_combos, card_categories, num_simulations, seed=None, engine=None, options=None):
+    """
+    Returns a canonical hash of the inputs of one simulation run, or None if
+    they cannot be hashed canonically (e.g. a combo defined as a callable).
+    Types and categories are restricted to the cards in the deck so unrelated
+    database edits don't invalidate the entry. options holds any other
+    JSON-serializable run settings that change the result.
+    """
+    if any(callable(definition) for definition in card_combos.values()):
+        return None
+    if engine == "exact": num_simulations, seed = None, None # Exact results don't depend on either
+    deck = {card: quantity for card, quantity in deck_list.items() if quantity > 0}
+    payload = {
+        "version": CACHE_FORMAT_VERSION,
+        "deck": deck,
+        "types": {card: card_types.get(card, "UNKNOWN") for card in deck},
+        "combos": card_combos,
+        "categories": {card: sorted(card_categories.get(card, [])) for card in deck if card_categories.get(card)},
+        "simulations": num_simulations,
+        "seed": seed,
+        "engine": engine,
+        "options": options or {},
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json")
+
+def load_cached_results(key, cache_dir=CACHE_DIR):
+    """Returns the cached result dict for key (Counters restored), or None on a miss."""
+    if not key: return None
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, 'r') as f: data = json.load(f)
+        os.utime(path) # Mark as recently used for LRU eviction
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: Ignoring unreadable cache entry '{path}': {e}")
+        return None
+    return analysis_engine.restore_result_counters(data)
+
+def store_cached_results(key, results, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Writes results under key atomically, then evicts least recently used entries beyond max_bytes."""
+    if not key or not results: return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _entry_path(key, cache_dir); temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f: json.dump(results, f)
+        os.replace(temp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Warning: Could not write cache entry: {e}")
+        return
+    _evict_to_size(cache_dir, max_bytes)
+
+def _evict_to_size(cache_dir, max_bytes):
+    """Deletes the least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"): continue
+        path = os.path.join(cache_dir, name)
+        try: stat = os.stat(path)
+        except OSError: continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes: break
+        try: os.remove(path); total -= size
+        except OSError as e: print(f"Warning: Could not evict cache entry '{path}': {e}")
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Removes every cache entry."""
+    if not os.path.isdir(cache_dir): return
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json"):
+            try: os.remove(os.path.join(cache_dir, name))
+            except OSError as e: print(f"Warning: Could not remove cache entry '{name}': {e}")
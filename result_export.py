@@ -0,0 +1,210 @@
+# result_export.py
+# Machine-readable run files: aggregated results, deck lists, combo definitions and run metadata as JSON, CSV or columnar .npz.
+
+import os
+import csv
+import json
+import queue
+import datetime
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Optional: NumPy writes the columnar (.npz) format
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import analysis_engine
+
+EXPORT_FORMATS = ("json", "csv", "npz")
+EXPORT_FORMAT_VERSION = 1
+EXPORT_COUNTER_KEYS = analysis_engine.RESULT_COUNTER_KEYS + ("effect_counts",)
+REPORT_WORKERS = 2 # Reports rendered concurrently by a ReportRenderer
+
+def build_run_record(results_a, results_b, deck_list_a, deck_list_b, submitted_name_a, submitted_name_b, is_comparison,
+                     card_combos, combo_card_map, card_categories, deck_stats_a, deck_stats_b, metadata=None):
+    """
+    Bundles a finished run into one JSON-serializable dict: the arguments of
+    analyze_and_generate_pdf (so the report can be rendered later from the
+    file, see report_arguments) plus run metadata. Results and decks are
+    keyed by deck label ("A", "B"). metadata adds or overrides entries, e.g.
+    the engine. Legacy callable combos can't be stored and are left out.
+    """
+    results = {"A": results_a}; decks = {"A": dict(deck_list_a)}; stats = {"A": deck_stats_a or {}}
+    if is_comparison and results_b: results["B"] = results_b; decks["B"] = dict(deck_list_b); stats["B"] = deck_stats_b or {}
+    run_metadata = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "is_comparison": bool(is_comparison and results_b),
+        "names": {"A": submitted_name_a, "B": submitted_name_b if is_comparison else ""},
+        "total_simulations": {label: result.get("total_simulations", 0) for label, result in results.items()},
+        "seeds": {label: result.get("seed") for label, result in results.items()},
+        "exact": bool(results_a.get("exact")),
+        "partial": any(result.get("partial") for result in results.values()),
+    }
+    run_metadata.update(metadata or {})
+    return {
+        "format_version": EXPORT_FORMAT_VERSION, "metadata": run_metadata,
+        "decks": decks, "deck_stats": stats,
+        "card_combos": {name: definition for name, definition in card_combos.items() if not callable(definition)},
+        "combo_card_map": {name: sorted(cards) for name, cards in (combo_card_map or {}).items()},
+        "card_categories": card_categories,
+        "results": results,
+    }
+
+def report_arguments(record, simulation_queue):
+    """The positional arguments of analyze_and_generate_pdf for a run record (as returned by read_run_file)."""
+    metadata = record["metadata"]; is_comparison = metadata["is_comparison"]
+    return (record["results"]["A"], record["results"].get("B"), record["decks"]["A"], record["decks"].get("B", {}),
+            metadata["names"]["A"], metadata["names"].get("B", ""), is_comparison,
+            record["card_combos"], record["combo_card_map"], record["card_categories"], simulation_queue,
+            record["deck_stats"]["A"], record["deck_stats"].get("B"))
+
+def render_report(path, simulation_queue):
+    """Builds the PDF report of a saved run file. Returns the PDF filename, or None on failure (reported on simulation_queue)."""
+    try: record = read_run_file(path)
+    except (OSError, ValueError, KeyError) as e:
+        simulation_queue.put(("error", f"Could not read run file '{path}': {e}")); return None
+    return analysis_engine.analyze_and_generate_pdf(*report_arguments(record, simulation_queue))
+
+def _render_in_worker(path):
+    """Process pool entry point: renders path's report and returns (PDF filename or None, messages posted while rendering)."""
+    messages = queue.Queue()
+    pdf_filename = render_report(path, messages)
+    return pdf_filename, [messages.get() for _ in range(messages.qsize())]
+
+class ReportRenderer:
+    """
+    Renders PDF reports from saved run files in worker processes, so a
+    simulation only has to write its run file before the next one can start,
+    and up to max_workers reports build concurrently. Outcomes are posted on
+    message_queue like a simulation's: ("pdf_ready", filename) or ("error", text).
+    The pool starts on the first submit.
+    """
+    def __init__(self, message_queue, max_workers=REPORT_WORKERS):
+        self.message_queue, self.max_workers = message_queue, max_workers
+        self._pool = None; self._lock = threading.Lock(); self._pending = set()
+
+    def submit(self, path, remove_after=False):
+        """Queues path's report; remove_after deletes the run file once it is rendered (for temporary spool files)."""
+        with self._lock:
+            if self._pool is None: self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            future = self._pool.submit(_render_in_worker, path); self._pending.add(future)
+        future.add_done_callback(lambda done: self._finished(done, path, remove_after))
+        return future
+
+    def _finished(self, future, path, remove_after):
+        with self._lock: self._pending.discard(future)
+        try:
+            if not future.cancelled(): # Cancelled reports (see shutdown) are dropped silently
+                pdf_filename, messages = future.result()
+                for message in messages: self.message_queue.put(message)
+                if pdf_filename: self.message_queue.put(("pdf_ready", pdf_filename))
+                else: self.message_queue.put(("error", f"PDF generation failed for '{os.path.basename(path)}'."))
+        except Exception as e: self.message_queue.put(("error", f"Report worker failed for '{os.path.basename(path)}': {e}"))
+        if remove_after:
+            try: os.remove(path)
+            except OSError as e: print(f"Warning: Could not remove spooled run file '{path}': {e}")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Stops the worker processes, by default after the queued reports are rendered; cancel_futures drops the reports not started yet (e.g. on exit)."""
+        if cancel_futures: # Cancelled here: the pool only cancels them itself while something still references it
+            with self._lock: pending = list(self._pending)
+            for future in pending: future.cancel()
+        with self._lock:
+            if self._pool is not None: self._pool.shutdown(wait=wait, cancel_futures=cancel_futures); self._pool = None
+
+def export_run(record, export_format, output_dir=analysis_engine.REPORT_DIR):
+    """Writes record next to the PDF reports under the report's file name stem; returns the path written."""
+    if export_format not in EXPORT_FORMATS: raise ValueError(f"Unknown export format '{export_format}'.")
+    metadata = record["metadata"]
+    base_filename = analysis_engine.report_base_name(metadata["names"]["A"], metadata["names"].get("B", ""), metadata["is_comparison"], metadata["partial"])
+    path = analysis_engine.get_unique_filename(os.path.join(output_dir, f"{base_filename}.{export_format}"))
+    write_run_file(record, path)
+    return path
+
+def write_run_file(record, path):
+    """
+    Writes a run record in the format given by path's extension, atomically:
+    .json holds the record as is; .csv is a long table of (deck, section,
+    key, value) rows, one per counter entry, with every other field stored
+    as JSON text in a "json" section; .npz stores each counter as a pair of
+    key/count columns plus the rest of the record as JSON (needs numpy).
+    """
+    export_format = os.path.splitext(path)[1].lstrip(".").lower()
+    directory = os.path.dirname(path)
+    if directory: os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp.{export_format}"
+    if export_format == "json":
+        with open(temp_path, 'w') as f: json.dump(record, f)
+    elif export_format == "csv":
+        counters, rest = _split_counters(record)
+        with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f); writer.writerow(("deck", "section", "key", "value"))
+            for (label, key), counter in counters.items():
+                writer.writerows((label, key, name, count) for name, count in sorted(counter.items(), key=lambda item: -item[1]))
+            writer.writerows(_json_rows(rest))
+    elif export_format == "npz":
+        if np is None: raise RuntimeError("The columnar (.npz) export requires numpy ('pip install numpy').")
+        counters, rest = _split_counters(record)
+        columns = {}
+        for (label, key), counter in counters.items():
+            columns[f"{label}.{key}.keys"] = np.array(list(counter), dtype=str)
+            columns[f"{label}.{key}.counts"] = np.array(list(counter.values()), dtype=np.int64)
+        np.savez_compressed(temp_path, meta=np.array(json.dumps(rest)), **columns)
+    else: raise ValueError(f"Unknown export format '{export_format}' (use one of {', '.join(EXPORT_FORMATS)}).")
+    os.replace(temp_path, path)
+
+def read_run_file(path):
+    """Reads a run file written by write_run_file (any format) back into a run record with Counters restored."""
+    export_format = os.path.splitext(path)[1].lstrip(".").lower()
+    if export_format == "json":
+        with open(path, 'r') as f: record = json.load(f)
+    elif export_format == "csv":
+        counters, fields = {}, {}
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row["section"] == "json": fields[(row["deck"], row["key"])] = json.loads(row["value"])
+                else: counters.setdefault((row["deck"], row["section"]), {})[row["key"]] = int(row["value"])
+        record = _join_counters(counters, fields)
+    elif export_format == "npz":
+        if np is None: raise RuntimeError("Reading columnar (.npz) run files requires numpy ('pip install numpy').")
+        with np.load(path, allow_pickle=False) as data:
+            record = json.loads(str(data["meta"]))
+            for name in data.files:
+                if not name.endswith(".keys"): continue
+                label, key, _ = name.rsplit(".", 2)
+                record["results"][label][key] = dict(zip(data[name].tolist(), data[f"{label}.{key}.counts"].tolist()))
+    else: raise ValueError(f"Unknown run file format '{export_format}'.")
+    if record.get("format_version") != EXPORT_FORMAT_VERSION: raise ValueError(f"Unsupported run file version {record.get('format_version')}.")
+    for results in record["results"].values(): analysis_engine.restore_result_counters(results)
+    record["combo_card_map"] = {name: set(cards) for name, cards in record["combo_card_map"].items()}
+    return record
+
+def _split_counters(record):
+    """Splits a record into ({(deck label, counter key): Counter}, the record without those counters)."""
+    counters = {}
+    rest = dict(record); rest["results"] = {}
+    for label, results in record["results"].items():
+        rest["results"][label] = {key: value for key, value in results.items() if key not in EXPORT_COUNTER_KEYS}
+        for key in EXPORT_COUNTER_KEYS:
+            if key in results: counters[(label, key)] = Counter(results[key])
+    return counters, rest
+
+def _json_rows(rest):
+    """CSV rows storing every non-counter field as JSON text: per-deck result fields under their deck label, the rest under an empty one."""
+    for key, value in rest.items():
+        if key == "results": continue
+        yield ("", "json", key, json.dumps(value))
+    for label, results in rest["results"].items():
+        for key, value in results.items(): yield (label, "json", key, json.dumps(value))
+
+def _join_counters(counters, fields):
+    """Inverse of _split_counters for rows read back from CSV."""
+    record = {key: value for (label, key), value in fields.items() if not label}
+    record["results"] = {}
+    for (label, key), value in fields.items():
+        if label: record["results"].setdefault(label, {})[key] = value
+    for (label, key), counter in counters.items(): record["results"].setdefault(label, {})[key] = counter
+    return record
@@ -0,0 +1,167 @@
+# test_engines.py
+# Deterministic checks of the numeric engines against brute force. Run with 'python test_engines.py' (pytest collects them too).
+
+import queue
+import itertools
+from collections import Counter
+
+import analysis_engine
+import deck_tuning
+
+POOL = analysis_engine.CARD_POOL
+SMALL_DECK = {POOL[0]: 3, POOL[1]: 2, POOL[2]: 2, POOL[3]: 1, POOL[4]: 1, POOL[5]: 1, POOL[6]: 1, POOL[7]: 1} # 12 cards: every hand can be listed
+SMALL_CATEGORIES = {POOL[0]: ["Starter"], POOL[1]: ["Starter", "Extender"], POOL[2]: ["Extender"], POOL[5]: ["Trap"]}
+SMALL_COMBOS = {
+    "Pair": {"must_have": [POOL[0], POOL[1]], "need_one_groups": []},
+    "Starter + Follow-up": {"must_have": [POOL[0]], "need_one_groups": [[POOL[2], POOL[3]], [POOL[4], POOL[5], POOL[6]]]},
+    "Overlapping Groups": {"must_have": [], "need_one_groups": [[POOL[1], POOL[2]], [POOL[2], POOL[7]]]},
+    "Missing Card": {"must_have": [POOL[10]], "need_one_groups": []},
+}
+
+def brute_force_counts(deck_list, card_combos, card_categories, hand_size, card_types=analysis_engine.CARD_TYPES):
+    """Tallies every hand_size-card subset of the deck (copies distinct), with the engines' counter keys and labels."""
+    slots = [card for card in sorted(deck_list) for _ in range(deck_list[card])]
+    counts = {key: Counter() for key in analysis_engine.RESULT_COUNTER_KEYS}
+    total = 0
+    for hand in itertools.combinations(slots, hand_size):
+        total += 1; hand_counts = Counter(hand); hand_set = set(hand)
+        counts["card_counts"].update(hand)
+        counts["duplicate_counts"].update(card for card, count in hand_counts.items() if count > 1)
+        for combo_name, definition in card_combos.items():
+            if (definition(hand_set) if callable(definition) else analysis_engine.evaluate_custom_combo(hand_set, definition)): counts["combo_counts"][combo_name] += 1
+        types = Counter(card_types.get(card, "UNKNOWN") for card in hand)
+        counts["hand_composition_counts"][f"M:{types['MONSTER']} S:{types['SPELL']} T:{types['TRAP']}"] += 1
+        categories = Counter(category for card in hand for category in card_categories.get(card, []))
+        counts["category_counts"].update(categories)
+        uncategorized = sum(1 for card in hand if not card_categories.get(card))
+        parts = [f"{category}:{count}" for category, count in sorted(categories.items())] + ([f"Uncategorized:{uncategorized}"] if uncategorized else [])
+        counts["hand_category_composition_counts"][", ".join(parts) if parts else "Uncategorized Hand"] += 1
+    return counts, total
+
+def _assert_counters_equal(results, expected, keys=analysis_engine.RESULT_COUNTER_KEYS):
+    for key in keys:
+        assert +Counter(results[key]) == +expected[key], f"{key}: {dict(results[key])} != {dict(expected[key])}"
+
+def test_exact_matches_brute_force():
+    """Every counter of the exact engine equals a pass over all C(12, 5) hands, including a legacy callable combo."""
+    combos = dict(SMALL_COMBOS); combos["Legacy Callable"] = lambda hand: len(hand) >= 4
+    results = analysis_engine._run_exact_analysis(SMALL_DECK, "A", combos, SMALL_CATEGORIES, queue.Queue())
+    expected, total = brute_force_counts(SMALL_DECK, combos, SMALL_CATEGORIES, 5)
+    assert results["total_simulations"] == total == 792
+    _assert_counters_equal(results, expected)
+
+def test_exact_draw_schedule_matches_brute_force():
+    """A 6-card opening hand and the per-turn closed forms match brute force over the first k cards."""
+    schedule = analysis_engine.normalize_draw_schedule({"opening_hand": 6, "turns": 3})
+    results = analysis_engine._run_exact_analysis(SMALL_DECK, "A", SMALL_COMBOS, SMALL_CATEGORIES, queue.Queue(), schedule)
+    expected, total = brute_force_counts(SMALL_DECK, SMALL_COMBOS, SMALL_CATEGORIES, 6)
+    assert results["total_simulations"] == total
+    _assert_counters_equal(results, expected)
+    turns = results["turns"]; slots = [card for card in sorted(SMALL_DECK) for _ in range(SMALL_DECK[card])]
+    for turn, cards_seen in enumerate(turns["cards_seen"]):
+        seen, seen_total = brute_force_counts(SMALL_DECK, SMALL_COMBOS, {}, cards_seen)
+        assert turns["totals"][turn] == seen_total
+        assert +Counter(turns["combo_counts"][turn]) == +seen["combo_counts"]
+        assert +Counter(turns["card_counts"][turn]) == Counter(card for hand in itertools.combinations(slots, cards_seen) for card in set(hand))
+
+def test_duplicate_categories_match_brute_force():
+    """A card listing a category twice counts twice: exactly, in the numpy tally of every C(12, 5) hand, and in a python run."""
+    categories = dict(SMALL_CATEGORIES); categories[POOL[3]] = ["Starter", "Starter"]
+    expected, total = brute_force_counts(SMALL_DECK, SMALL_COMBOS, categories, 5)
+    keys = ("category_counts", "hand_category_composition_counts")
+    _assert_counters_equal(analysis_engine._run_exact_analysis(SMALL_DECK, "A", SMALL_COMBOS, categories, queue.Queue()), expected, keys)
+    names = sorted(SMALL_DECK); tables = analysis_engine._numpy_deck_tables(names, SMALL_COMBOS, categories)
+    slots = [names.index(card) for card in names for _ in range(SMALL_DECK[card])]
+    totals = analysis_engine._new_numpy_totals(tables)
+    analysis_engine._tally_batch_numpy(tables, analysis_engine.np.array(list(itertools.combinations(slots, 5))), totals)
+    results = analysis_engine._numpy_totals_to_results(tables, totals)
+    assert results["total_simulations"] == total
+    _assert_counters_equal(results, expected)
+    sampled = analysis_engine._run_simulation_python(3000, [card for card in names for _ in range(SMALL_DECK[card])], "A", SMALL_COMBOS, categories, queue.Queue(), 11, lambda done: None, 0)
+    assert set(sampled["hand_category_composition_counts"]) <= set(expected["hand_category_composition_counts"])
+    assert sampled["category_counts"]["Starter"] == sum(sampled["card_counts"][card] * categories[card].count("Starter") for card in categories)
+
+def test_exact_sample_deck_totals():
+    """On a 40-card deck the exact engine covers all C(40, 5) hands and each table sums to the hands (or cards) it counts."""
+    deck = {card: 2 for card in POOL[:20]}
+    results = analysis_engine.run_simulation(0, deck, "A", analysis_engine._define_combos(), {}, queue.Queue(), engine="exact")
+    assert results["total_simulations"] == 658008 and results["exact"]
+    assert sum(results["hand_composition_counts"].values()) == 658008
+    assert sum(results["hand_category_composition_counts"].values()) == 658008
+    assert sum(results["card_counts"].values()) == 5 * 658008
+
+def _sample_deck():
+    return {card: 2 for card in POOL[:20]}
+
+def test_seeded_runs_match_across_workers():
+    """A seeded numpy run gives identical counters on 1 and 3 workers, fixed-size and precision-targeted alike."""
+    combos = analysis_engine._define_combos()
+    for options in ({}, {"target_precision": 0.01}):
+        single = analysis_engine.run_simulation(120000, _sample_deck(), "A", combos, {}, queue.Queue(), engine="numpy", workers=1, seed=1234, **options)
+        pooled = analysis_engine.run_simulation(120000, _sample_deck(), "A", combos, {}, queue.Queue(), engine="numpy", workers=3, seed=1234, **options)
+        assert single["total_simulations"] == pooled["total_simulations"]
+        _assert_counters_equal(pooled, single)
+
+def test_adaptive_run_meets_target():
+    """A precision-targeted run stops once every tracked Wilson interval is within the target, and reports intervals that match its counts."""
+    target = 0.005
+    results = analysis_engine.run_simulation(2000000, _sample_deck(), "A", analysis_engine._define_combos(), {}, queue.Queue(), engine="numpy", seed=99, target_precision=target)
+    precision = results["precision"]; trials = results["total_simulations"]
+    assert precision["converged"] and precision["widest"] <= target and precision["hands_used"] == trials < 2000000
+    for key in analysis_engine.PRECISION_METRIC_KEYS:
+        for name, (low, high) in precision["intervals"][key].items():
+            assert (high - low) / 2 <= target
+            assert (low, high) == analysis_engine.wilson_interval(results[key].get(name, 0), trials)
+    capped = analysis_engine.run_simulation(20000, _sample_deck(), "A", analysis_engine._define_combos(), {}, queue.Queue(), engine="numpy", seed=99, target_precision=0.0001)
+    assert capped["total_simulations"] == 20000 and not capped["precision"]["converged"]
+
+def test_paired_difference_equals_marginal_difference():
+    """In a paired run, A-only minus B-only hands equals count A minus count B for every tracked metric, so the paired mean is pA - pB."""
+    deck_b = _sample_deck(); deck_b[POOL[0]] = 3; deck_b[POOL[1]] = 1
+    results_a, results_b = analysis_engine.run_paired_simulation(100000, _sample_deck(), deck_b, analysis_engine._define_combos(), {}, queue.Queue(), seed=7)
+    trials = results_a["total_simulations"]; paired = results_a["paired"]
+    assert paired["hands"] == trials == results_b["total_simulations"]
+    for key in analysis_engine.PRECISION_METRIC_KEYS:
+        for name in set(results_a[key]) | set(results_b[key]):
+            a_only, b_only = paired[key].get(name, (0, 0))
+            assert a_only - b_only == results_a[key].get(name, 0) - results_b[key].get(name, 0), (key, name)
+            difference, _ = analysis_engine.paired_difference(a_only, b_only, trials)
+            assert abs(difference - (results_a[key].get(name, 0) - results_b[key].get(name, 0)) / trials) < 1e-12
+    assert any(paired["combo_counts"].values()) # The decks differ, so some hands must disagree
+
+def test_paired_run_matches_common_run():
+    """Identical decks never disagree, and a paired run deals the same hands as run_common_simulation with the same seed."""
+    results_a, results_b = analysis_engine.run_paired_simulation(60000, _sample_deck(), _sample_deck(), analysis_engine._define_combos(), {}, queue.Queue(), seed=3)
+    assert not any(results_a["paired"][key] for key in analysis_engine.PRECISION_METRIC_KEYS)
+    _assert_counters_equal(results_b, results_a)
+    deck_b = _sample_deck(); deck_b[POOL[2]] = 3
+    paired_a, paired_b = analysis_engine.run_paired_simulation(60000, _sample_deck(), deck_b, analysis_engine._define_combos(), {}, queue.Queue(), seed=3)
+    common_a, common_b = analysis_engine.run_common_simulation(60000, [_sample_deck(), deck_b], analysis_engine._define_combos(), {}, queue.Queue(), seed=3)
+    _assert_counters_equal(common_a, paired_a); _assert_counters_equal(common_b, paired_b)
+
+def test_optimizer_probabilities_match_brute_force():
+    """The optimizer's closed-form combo probabilities equal brute-force hit rates, for several copy counts of the same cards."""
+    cards = sorted({card for definition in SMALL_COMBOS.values() for card in definition["must_have"] + [card for group in definition["need_one_groups"] for card in group]})
+    compiled = deck_tuning.compile_combo_probabilities(SMALL_COMBOS, cards)
+    for changes in ({}, {POOL[0]: 1, POOL[7]: 3}, {POOL[2]: 0, POOL[3]: 3, POOL[8]: 2}):
+        deck = dict(SMALL_DECK); deck.update(changes); deck = {card: quantity for card, quantity in deck.items() if quantity}
+        expected, total = brute_force_counts(deck, SMALL_COMBOS, {}, 5)
+        probabilities = deck_tuning.combo_probabilities(compiled, [deck.get(card, 0) for card in cards], sum(deck.values()))
+        for combo_name, probability in zip(compiled[0], probabilities):
+            assert abs(probability - expected["combo_counts"][combo_name] / total) < 1e-12, (changes, combo_name)
+
+def test_optimizer_result_is_consistent():
+    """The optimized deck is legal, scores at least as well as the base deck, and its reported probabilities match the exact engine."""
+    combos = analysis_engine._define_combos(); weights = {combo_name: 1.0 for combo_name in combos}
+    result = deck_tuning.optimize_deck(POOL, combos, weights, queue.Queue(), base_deck=_sample_deck(), iterations=3000, seed=5)
+    deck = result["deck"]
+    assert result["open_slots"] == 0 and analysis_engine.MIN_DECK_SIZE <= sum(deck.values()) <= analysis_engine.MAX_DECK_SIZE
+    assert max(deck.values()) <= analysis_engine.MAX_CARD_COPIES
+    assert result["score"] >= sum(result["base_probabilities"].values()) - 1e-12
+    exact = analysis_engine.run_simulation(0, deck, "A", combos, {}, queue.Queue(), engine="exact")
+    for combo_name, probability in result["probabilities"].items():
+        assert abs(probability - exact["combo_counts"].get(combo_name, 0) / exact["total_simulations"]) < 1e-12, combo_name
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check): check(); print(f"OK  {name}")